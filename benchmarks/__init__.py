@@ -0,0 +1,2 @@
+# Offline benchmarks for the NeuroNote pipeline. Run from the project root, e.g.:
+#   python -m benchmarks.bench_chunked_transcription
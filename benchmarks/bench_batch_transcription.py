@@ -0,0 +1,56 @@
+"""
+Compares per-file transcription with batched Whisper decoding.
+
+Transcribes --files copies of meeting.wav one at a time (as sequential /recorded-audio
+uploads would) and then in one transcribe_batch call, and reports files per minute for
+both. Gemini is not involved; insight calls are fanned out separately by run_batch.
+
+    python -m benchmarks.bench_batch_transcription --files 16 --batch-size 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default="meeting.wav")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.batch_size:
+        os.environ["BATCH_DECODE_SIZE"] = str(args.batch_size)
+
+    from services import batch
+    from services.model_registry import model_registry
+
+    model_name, model = model_registry.get_whisper()
+    paths = [args.audio] * args.files
+
+    start = time.perf_counter()
+    for path in paths:
+        model.transcribe(path)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch.transcribe_batch(paths)
+    batched = time.perf_counter() - start
+
+    print(json.dumps({
+        "benchmark": "batch_transcription",
+        "model": model_name,
+        "files": args.files,
+        "batch_size": batch.BATCH_DECODE_SIZE,
+        "sequential_files_per_minute": round(args.files / sequential * 60, 2),
+        "batched_files_per_minute": round(args.files / batched * 60, 2),
+        "speedup": round(sequential / batched, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
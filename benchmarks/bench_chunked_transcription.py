@@ -0,0 +1,85 @@
+"""
+Compares single-call Whisper transcription with chunked parallel transcription.
+
+meeting.wav is short, so it is tiled --repeat times into a longer synthetic recording
+before timing. Pool start-up (spawning workers and loading their models) is measured
+separately, since in the server it is paid once per process, not per request.
+
+    python -m benchmarks.bench_chunked_transcription --repeat 20 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_tiled_wav(source_path, repeat, output_path):
+    """Writes source_path repeated `repeat` times as 16 kHz mono PCM16 and returns its duration."""
+    import whisper
+    audio = np.tile(whisper.load_audio(source_path), repeat)
+    with wave.open(output_path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return len(audio) / 16000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default="meeting.wav")
+    parser.add_argument("--repeat", type=int, default=20, help="How many times to tile the audio")
+    parser.add_argument("--chunk-seconds", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ["TRANSCRIBE_WORKERS"] = str(args.workers)
+
+    from services import transcription
+    from services.model_registry import model_registry
+
+    fd, tiled_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        duration = write_tiled_wav(args.audio, args.repeat, tiled_path)
+
+        _, model = model_registry.get_whisper()
+        start = time.perf_counter()
+        model.transcribe(tiled_path)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pool = transcription._get_chunk_pool()
+        # Force every worker to start and load its model before timing.
+        list(pool.map(os.getpid, range(transcription.TRANSCRIBE_WORKERS * 4)))
+        pool_startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        transcription.transcribe_audio_chunked(tiled_path, chunk_seconds=args.chunk_seconds)
+        chunked = time.perf_counter() - start
+    finally:
+        os.remove(tiled_path)
+
+    print(json.dumps({
+        "benchmark": "chunked_transcription",
+        "model": transcription.WHISPER_MODEL_NAME,
+        "audio_seconds": round(duration, 2),
+        "workers": transcription.TRANSCRIBE_WORKERS,
+        "chunk_seconds": args.chunk_seconds or transcription.TRANSCRIBE_CHUNK_SECONDS,
+        "sequential_seconds": round(sequential, 3),
+        "chunked_seconds": round(chunked, 3),
+        "pool_startup_seconds": round(pool_startup, 3),
+        "speedup": round(sequential / chunked, 2) if chunked else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
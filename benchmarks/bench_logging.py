@@ -0,0 +1,173 @@
+"""
+Measures what logging costs a request thread.
+
+Replays the log calls of one /recorded-audio request (INFO lines plus DEBUG snippet lines
+that are disabled at the default level) against a log file, for:
+
+    sync_fstring   the old setup: handler writes on the request thread, eager f-strings
+    sync_lazy      handler writes on the request thread, %-style arguments
+    async_text     QueueHandler + listener thread (LOG_ASYNC), text format
+    async_json     as above with LOG_FORMAT=json
+
+"caller" is the time spent in the request thread; "drain" is how long the listener then
+needs to write the queued records. Also reports the cost of a disabled DEBUG call.
+--write-latency-us simulates a slow log sink (a blocked terminal or log pipe), which is
+where moving I/O off the request thread matters most.
+
+    python -m benchmarks.bench_logging --requests 2000
+    python -m benchmarks.bench_logging --requests 500 --write-latency-us 200
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import tempfile
+import statistics
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TRANSCRIPT = "we agreed to ship the release on friday and john will follow up with legal " * 200
+MEETING_ID = "meeting_20250101_120000_000000"
+
+
+def request_fstring(log):
+    """The log calls of one /recorded-audio request, written as f-strings."""
+    log.info(f"Received request for /recorded-audio from {'127.0.0.1'}")
+    log.info(f"Received upload '{'meeting.wav'}' ({812345} bytes) for meeting_id: {MEETING_ID}")
+    log.info(f"Starting audio processing for meeting_id: {MEETING_ID} (source: {'meeting.wav'})...")
+    log.info(f"Decoded upload for meeting_id {MEETING_ID} in memory in {12.345:.1f} ms.")
+    log.info(f"Starting transcription for audio: {'in-memory audio'} using model: {'base'}")
+    log.info(f"Transcription completed for {'in-memory audio'}. Transcript length: {len(TRANSCRIPT)} chars.")
+    log.debug(f"Transcript snippet: {TRANSCRIPT[:100]}...")
+    log.debug(f"Stored {'transcript'} cache entry {'0123456789abcdef'[:12]}...")
+    log.info(f"Generating insights using Gemini model: {'gemini'} for transcript of length {len(TRANSCRIPT)} chars.")
+    log.debug(f"Transcript snippet for Gemini: {TRANSCRIPT[:100]}...")
+    log.info(f"Gemini call [{'insights'}]: prompt_tokens={4321} output_tokens={654} total_tokens={4975} (estimated prompt: {4300}).")
+    log.debug(f"Gemini response snippet: {TRANSCRIPT[:100]}...")
+    for kind in ("transcript", "insights"):
+        log.debug(f"Ensured directory exists: output/meetings/{MEETING_ID}")
+        log.info(f"Successfully saved content to output/meetings/{MEETING_ID}/{MEETING_ID}_{kind}.txt")
+    log.info(f"Successfully processed audio and generated insights for meeting_id: {MEETING_ID}.")
+
+
+def request_lazy(log):
+    """The same calls with %-style arguments, as the services now log."""
+    log.info("Received request for /recorded-audio from %s", "127.0.0.1")
+    log.info("Received upload '%s' (%s bytes) for meeting_id: %s", "meeting.wav", 812345, MEETING_ID)
+    log.info("Starting audio processing for meeting_id: %s (source: %s)...", MEETING_ID, "meeting.wav")
+    log.info("Decoded upload for meeting_id %s in memory in %.1f ms.", MEETING_ID, 12.345)
+    log.info("Starting transcription for audio: %s using model: %s", "in-memory audio", "base")
+    log.info("Transcription completed for %s. Transcript length: %s chars.", "in-memory audio", len(TRANSCRIPT))
+    log.debug("Transcript snippet: %s...", TRANSCRIPT[:100])
+    log.debug("Stored %s cache entry %s...", "transcript", "0123456789abcdef"[:12])
+    log.info("Generating insights using Gemini model: %s for transcript of length %s chars.", "gemini", len(TRANSCRIPT))
+    log.debug("Transcript snippet for Gemini: %s...", TRANSCRIPT[:100])
+    log.info("Gemini call [%s]: prompt_tokens=%s output_tokens=%s total_tokens=%s (estimated prompt: %s).", "insights", 4321, 654, 4975, 4300)
+    log.debug("Gemini response snippet: %s...", TRANSCRIPT[:100])
+    for kind in ("transcript", "insights"):
+        log.debug("Ensured directory exists: output/meetings/%s", MEETING_ID)
+        log.info("Successfully saved content to output/meetings/%s/%s_%s.txt", MEETING_ID, MEETING_ID, kind)
+    log.info("Successfully processed audio and generated insights for meeting_id: %s.", MEETING_ID)
+
+
+class SlowFileHandler(logging.FileHandler):
+    """FileHandler whose writes take an extra fixed time, like a sink that applies back-pressure."""
+
+    def __init__(self, path, write_latency):
+        super().__init__(path)
+        self.write_latency = write_latency
+
+    def emit(self, record):
+        super().emit(record)
+        if self.write_latency:
+            time.sleep(self.write_latency)
+
+
+def build_logger(name, path, mode, log_format, write_latency):
+    """Returns (logger, listener or None) writing to path like utils.logger would."""
+    from utils.logger import ContextFilter, JsonFormatter, LazyQueueHandler, TEXT_FORMAT
+    log = logging.getLogger(f"bench_logging.{name}")
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    handler = SlowFileHandler(path, write_latency)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    if mode == "sync":
+        handler.addFilter(ContextFilter())
+        log.addHandler(handler)
+        return log, None
+    queue_handler = LazyQueueHandler(queue.Queue(1_000_000))
+    queue_handler.addFilter(ContextFilter())
+    log.addHandler(queue_handler)
+    listener = QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    return log, listener
+
+
+def measure(name, mode, log_format, replay, requests, directory, write_latency):
+    path = os.path.join(directory, f"{name}.log")
+    log, listener = build_logger(name, path, mode, log_format, write_latency)
+    timings = []
+    start_all = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        replay(log)
+        timings.append(time.perf_counter() - start)
+    caller_total = time.perf_counter() - start_all
+    drain_start = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    drain = time.perf_counter() - drain_start
+    for handler in log.handlers:
+        handler.close()
+    ordered = sorted(timings)
+    return {
+        "caller_median_us_per_request": round(statistics.median(ordered) * 1e6, 1),
+        "caller_p95_us_per_request": round(ordered[int(len(ordered) * 0.95) - 1] * 1e6, 1),
+        "caller_mean_us_per_request": round(caller_total / requests * 1e6, 1),
+        "drain_seconds": round(drain, 3),
+        "log_bytes": os.path.getsize(path),
+    }
+
+
+def disabled_debug_cost(runs):
+    log = logging.getLogger("bench_logging.disabled")
+    log.setLevel(logging.INFO)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return round((time.perf_counter() - start) / runs * 1e9, 1)
+
+    return {
+        "fstring_ns_per_call": timed(lambda: log.debug(f"Transcript snippet: {TRANSCRIPT[:100]}... ({len(TRANSCRIPT)} chars, {1.2345:.2f}s)")),
+        "lazy_ns_per_call": timed(lambda: log.debug("Transcript snippet: %s... (%s chars, %.2fs)", TRANSCRIPT[:100], len(TRANSCRIPT), 1.2345)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--write-latency-us", type=float, default=0, help="Extra time each log write takes")
+    args = parser.parse_args()
+
+    from utils.logger import log_context
+    results = {"requests": args.requests, "write_latency_us": args.write_latency_us, "configurations": {}}
+    with tempfile.TemporaryDirectory() as directory, log_context(MEETING_ID):
+        for name, mode, log_format, replay in (
+            ("sync_fstring", "sync", "text", request_fstring),
+            ("sync_lazy", "sync", "text", request_lazy),
+            ("async_text", "async", "text", request_lazy),
+            ("async_json", "async", "json", request_lazy),
+        ):
+            results["configurations"][name] = measure(name, mode, log_format, replay, args.requests, directory, args.write_latency_us / 1e6)
+    results["disabled_debug"] = disabled_debug_cost(args.requests * 50)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures start-up time and per-worker memory with lazy loading and preload-before-fork.
+
+Each scenario runs in a fresh interpreter: it imports the app, optionally preloads the
+default Whisper model, then forks --workers children that each run one transcription of
+meeting.wav (as gunicorn workers would). Per-child private memory is read from
+/proc/<pid>/smaps_rollup, so the numbers are Linux-only.
+
+    python -m benchmarks.bench_model_registry --workers 4
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIO = r"""
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-unused")
+start = time.perf_counter()
+import neuronote
+from services.model_registry import model_registry
+import_seconds = time.perf_counter() - start
+preload_seconds = 0.0
+if {preload!r}:
+    start = time.perf_counter()
+    model_registry.preload()
+    preload_seconds = time.perf_counter() - start
+    import gc; gc.freeze()
+
+def private_kb():
+    fields = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].endswith(":") and len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), fields.get("Rss", 0)
+
+children = []
+for _ in range({workers}):
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        start = time.perf_counter()
+        _, model = model_registry.get_whisper()
+        model.transcribe({audio!r})
+        first_request = time.perf_counter() - start
+        private, rss = private_kb()
+        os.write(w, json.dumps({{"first_request_seconds": first_request, "private_kb": private, "rss_kb": rss}}).encode())
+        os._exit(0)
+    os.close(w)
+    children.append((pid, r))
+
+results = []
+for pid, r in children:
+    with os.fdopen(r) as f:
+        results.append(json.loads(f.read()))
+    os.waitpid(pid, 0)
+print(json.dumps({{"import_seconds": import_seconds, "preload_seconds": preload_seconds, "workers": results}}))
+"""
+
+
+def run_scenario(preload, workers, audio):
+    code = SCENARIO.format(root=ROOT, preload=preload, workers=workers, audio=audio)
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    worker_results = result.pop("workers")
+    result["mean_first_request_seconds"] = round(sum(w["first_request_seconds"] for w in worker_results) / workers, 3)
+    result["mean_worker_private_mb"] = round(sum(w["private_kb"] for w in worker_results) / workers / 1024, 1)
+    result["mean_worker_rss_mb"] = round(sum(w["rss_kb"] for w in worker_results) / workers / 1024, 1)
+    result["import_seconds"] = round(result["import_seconds"], 3)
+    result["preload_seconds"] = round(result["preload_seconds"], 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=os.path.join(ROOT, "meeting.wav"))
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "benchmark": "model_registry",
+        "workers": args.workers,
+        "lazy": run_scenario(False, args.workers, args.audio),
+        "preload_before_fork": run_scenario(True, args.workers, args.audio),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compares the fp32 Whisper backend with the int8 quantized one ("<size>-int8") on meeting.wav:
+word error rate, load time, transcription latency and memory.
+
+Each backend runs in a fresh interpreter so RSS is not shared between them. The int8
+model is measured twice: a cold start that converts and caches the model, then a warm
+start that loads the cached file. WER is reported against the fp32 transcript, and also
+against --reference (a text file with the true transcript) if one is given.
+
+    python -m benchmarks.bench_quantized_whisper --model base --runs 3
+    python -m benchmarks.bench_quantized_whisper --model small --reference meeting_reference.txt
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIO = r"""
+import os, sys, json, time, resource
+sys.path.insert(0, {root!r})
+import torch
+torch.set_num_threads({threads})
+import whisper
+from services.model_registry import model_registry
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+audio = whisper.load_audio({audio!r})
+baseline_rss = rss_mb()
+start = time.perf_counter()
+_, model = model_registry.get_whisper({model!r})
+load_seconds = time.perf_counter() - start
+loaded_rss = rss_mb()
+
+timings = []
+for _ in range({runs}):
+    start = time.perf_counter()
+    text = model.transcribe(audio, temperature=0.0, fp16=False)["text"]
+    timings.append(time.perf_counter() - start)
+print(json.dumps({{
+    "load_seconds": load_seconds,
+    "transcribe_seconds": timings,
+    "audio_seconds": len(audio) / 16000,
+    "model_rss_mb": loaded_rss - baseline_rss,
+    "rss_mb": loaded_rss,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "transcript": text,
+}}))
+"""
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, by word-level edit distance."""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def run_backend(model, audio, runs, threads, quantized_dir):
+    code = SCENARIO.format(root=ROOT, model=model, audio=audio, runs=runs, threads=threads)
+    env = {**os.environ, "WHISPER_QUANTIZED_DIR": quantized_dir, "WHISPER_ALLOWED_MODELS": model, "LOG_LEVEL": "WARNING"}
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    timings = sorted(result.pop("transcribe_seconds"))
+    result["median_transcribe_seconds"] = round(timings[len(timings) // 2], 3)
+    result["rtf"] = round(result["median_transcribe_seconds"] / result["audio_seconds"], 4)
+    for key in ("load_seconds", "model_rss_mb", "rss_mb", "peak_rss_mb"):
+        result[key] = round(result[key], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=os.path.join(ROOT, "meeting.wav"))
+    parser.add_argument("--model", default="base", help="fp32 model size; compared with <size>-int8")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--reference", help="Text file with the reference transcript")
+    args = parser.parse_args()
+
+    audio = os.path.abspath(args.audio)
+    with tempfile.TemporaryDirectory() as quantized_dir:
+        fp32 = run_backend(args.model, audio, args.runs, args.threads, quantized_dir)
+        int8_cold = run_backend(f"{args.model}-int8", audio, args.runs, args.threads, quantized_dir)
+        int8_warm = run_backend(f"{args.model}-int8", audio, args.runs, args.threads, quantized_dir)
+        cached_files = os.listdir(quantized_dir)
+        cached_mb = sum(os.path.getsize(os.path.join(quantized_dir, f)) for f in cached_files) / 1024 / 1024
+
+    results = {
+        "benchmark": "quantized_whisper",
+        "model": args.model,
+        "threads": args.threads,
+        "quantized_file_mb": round(cached_mb, 1),
+        "fp32": fp32,
+        "int8_first_start": int8_cold,
+        "int8_cached_start": int8_warm,
+        "int8_wer_vs_fp32": round(word_error_rate(fp32["transcript"], int8_warm["transcript"]), 4),
+        "speedup": round(fp32["median_transcribe_seconds"] / int8_warm["median_transcribe_seconds"], 2),
+        "model_memory_saved_mb": round(fp32["model_rss_mb"] - int8_warm["model_rss_mb"], 1),
+    }
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = f.read()
+        results["wer_vs_reference"] = {
+            "fp32": round(word_error_rate(reference, fp32["transcript"]), 4),
+            "int8": round(word_error_rate(reference, int8_warm["transcript"]), 4),
+        }
+    for result in (fp32, int8_cold, int8_warm):
+        result["transcript"] = result["transcript"][:200]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
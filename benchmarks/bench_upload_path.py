@@ -0,0 +1,101 @@
+"""
+Compares the old upload path (save to ./<id>_uploaded_audio.wav, then whisper.load_audio
+starts ffmpeg on the file) with the in-memory path used by /recorded-audio now.
+
+Two inputs are measured: the bundled meeting.wav, which is really a WebM/Opus file as
+produced by the browser recorder and so goes through the ffmpeg pipe, and a PCM WAV
+rendered from it (--wav-rate / --wav-channels), which takes the native NumPy fast path.
+Transcription is excluded because it is the same for both paths.
+
+    python -m benchmarks.bench_upload_path --runs 20
+"""
+import io
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def render_wav(samples, rate, channels):
+    """Renders 16 kHz mono samples as PCM16 WAV bytes at the given rate/channels."""
+    from services.audio_io import resample
+    resampled = resample(samples, 16000, rate) if rate < 16000 else np.interp(
+        np.arange(int(len(samples) * rate / 16000)) * 16000 / rate, np.arange(len(samples)), samples)
+    pcm = (np.clip(resampled, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(pcm, channels).tobytes())
+    return buffer.getvalue()
+
+
+def old_path(data):
+    import whisper
+    path = "./bench_uploaded_audio.wav"
+    with open(path, "wb") as f: # What file.save() did
+        f.write(data)
+    try:
+        return whisper.load_audio(path), len(data)
+    finally:
+        os.remove(path)
+
+
+def new_path(data):
+    from services.audio_io import decode_audio_bytes
+    return decode_audio_bytes(data), 0
+
+
+def measure(fn, data, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        samples, disk_bytes = fn(data)
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1] * 1000, 2),
+        "disk_bytes_written_per_request": disk_bytes,
+        "audio_seconds": round(len(samples) / 16000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default="meeting.wav")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--wav-rate", type=int, default=48000)
+    parser.add_argument("--wav-channels", type=int, default=2)
+    args = parser.parse_args()
+
+    import whisper
+    with open(args.audio, "rb") as f:
+        original = f.read()
+    pcm_wav = render_wav(whisper.load_audio(args.audio), args.wav_rate, args.wav_channels)
+
+    print(json.dumps({
+        "benchmark": "upload_path",
+        "runs": args.runs,
+        "bundled_recording": {
+            "bytes": len(original),
+            "old_file_plus_ffmpeg": measure(old_path, original, args.runs),
+            "new_in_memory": measure(new_path, original, args.runs),
+        },
+        f"pcm_wav_{args.wav_rate}hz_{args.wav_channels}ch": {
+            "bytes": len(pcm_wav),
+            "old_file_plus_ffmpeg": measure(old_path, pcm_wav, args.runs),
+            "new_in_memory": measure(new_path, pcm_wav, args.runs),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,511 @@
+"""
+Offline end-to-end and per-stage benchmark suite.
+
+Everything runs locally. Whisper transcribes the bundled meeting.wav and synthetic
+recordings made by tiling it to 1-60 minutes. Gemini is replaced by the deterministic stub
+server (services.gemini_stub), so runs are repeatable and cost nothing. All files are
+written to a temporary workspace, never to ./output. Measured:
+
+    transcription   transcribe_audio real-time factor per recording length and speed profile
+    vad             voice-activity trimming cost, and transcription with and without it on a
+                    recording that is 40% dead air
+    prompts         prompt building / token estimation / transcript splitting overhead
+    insights        generate_insights against the stub (client + map-reduce overhead)
+    flask           request overhead through the Flask test client (cache-hit uploads,
+                    meeting lookup, search, a trivial endpoint)
+    storage         save_transcript/save_insights latency (sync vs write-behind, gzip)
+    throughput      concurrent clients uploading to wsgi:app (gunicorn if installed,
+                    otherwise a threaded WSGI server)
+
+Results are printed as JSON (or written with --output). Compare a run against a saved
+baseline; the exit status is 1 if any metric regressed by more than --tolerance:
+
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --tolerance 0.2
+    python -m benchmarks.suite --only prompts,storage,flask --quick
+"""
+import io
+import os
+import sys
+import json
+import time
+import wave
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import statistics
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_RATE = 16000
+WORDS_PER_MINUTE = 150 # Typical speaking rate, for synthetic transcripts
+ALL_BENCHMARKS = ("transcription", "vad", "prompts", "insights", "flask", "storage", "throughput")
+# Metric name suffixes where larger is better; every other timing metric is lower-is-better.
+HIGHER_IS_BETTER = ("_per_second", "_per_minute")
+LOWER_IS_BETTER = ("_ms", "_seconds", "rtf")
+
+
+# --- Inputs ---
+
+def synthetic_recording(base, minutes, seed=0):
+    """Tiles base audio to `minutes` and adds faint noise, so every recording hashes differently."""
+    samples = int(minutes * 60 * SAMPLE_RATE)
+    audio = np.resize(base, samples).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    return audio + rng.normal(0, 1e-4, samples).astype(np.float32)
+
+
+def with_dead_air(base, minutes, silence_fraction=0.4, seed=0):
+    """Alternates 20-second speech clips with faint-noise gaps, silence_fraction of the total."""
+    rng = np.random.default_rng(seed)
+    speech = synthetic_recording(base, minutes * (1 - silence_fraction), seed=seed)
+    clip = 20 * SAMPLE_RATE
+    gap = int(clip * silence_fraction / (1 - silence_fraction))
+    parts = []
+    for start in range(0, len(speech), clip):
+        parts.append(speech[start:start + clip])
+        parts.append((rng.standard_normal(gap) * 1e-3).astype(np.float32))
+    return np.concatenate(parts)
+
+
+def to_wav_bytes(audio):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def synthetic_transcript(minutes, seed=0):
+    """Deterministic meeting-like text of about WORDS_PER_MINUTE * minutes words."""
+    rng = random.Random(seed)
+    vocabulary = ("we need to ship the release by friday and acme wants a budget review "
+                  "john will follow up with legal on the contract next sprint roadmap "
+                  "customer feedback pricing decision agreed action item question").split()
+    sentences = []
+    words = 0
+    while words < minutes * WORDS_PER_MINUTE:
+        length = rng.randint(6, 18)
+        sentence = " ".join(rng.choice(vocabulary) for _ in range(length))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", "?"]))
+        words += length
+    return " ".join(sentences)
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def time_runs(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+# --- Benchmarks ---
+
+def bench_transcription(base, durations, model_name):
+    from services.transcription import transcribe_audio
+    from services.model_registry import model_registry
+
+    load_start = time.perf_counter()
+    model_registry.get_whisper(model_name)
+    results = {"model": model_name, "model_load_seconds": round(time.perf_counter() - load_start, 2)}
+
+    recordings = [("meeting_wav", base)] + [(f"synthetic_{m:g}min", synthetic_recording(base, m, seed=i)) for i, m in enumerate(durations)]
+    for name, audio in recordings:
+        audio_seconds = len(audio) / SAMPLE_RATE
+        start = time.perf_counter()
+        transcript = transcribe_audio(audio, model_name=model_name)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "audio_seconds": round(audio_seconds, 1),
+            "transcribe_seconds": round(elapsed, 2),
+            "rtf": round(elapsed / audio_seconds, 4),
+            "transcript_chars": len(transcript),
+        }
+
+    # Speed profiles on meeting.wav (each profile may use its own model size)
+    from services.speed_profiles import SPEED_PROFILES
+    audio_seconds = len(base) / SAMPLE_RATE
+    results["profiles"] = {}
+    for profile in SPEED_PROFILES:
+        transcribe_audio(base[:SAMPLE_RATE], profile=profile) # Load the profile's model first
+        start = time.perf_counter()
+        transcribe_audio(base, profile=profile)
+        elapsed = time.perf_counter() - start
+        results["profiles"][profile] = {"transcribe_seconds": round(elapsed, 2), "rtf": round(elapsed / audio_seconds, 4)}
+    return results
+
+
+def bench_vad(base, minutes, model_name, runs):
+    import services.transcription as transcription
+    from services.voice_activity import trim_silence
+
+    audio = with_dead_air(base, minutes)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    trimmed, regions = trim_silence(audio)
+    results = {
+        "audio_seconds": round(audio_seconds, 1),
+        "speech_kept_fraction": round(len(trimmed) / len(audio), 3),
+        "regions": len(regions),
+        "trim": time_runs(lambda: trim_silence(audio), runs),
+    }
+    results["trim"]["audio_minutes_per_second"] = round(audio_seconds / 60 / (results["trim"]["median_ms"] / 1000), 1)
+
+    enabled = transcription.ENABLE_VAD_TRIM
+    try:
+        for name, trim in (("untrimmed", False), ("trimmed", True)):
+            transcription.ENABLE_VAD_TRIM = trim
+            start = time.perf_counter()
+            transcript = transcription.transcribe_audio(audio, model_name=model_name)
+            elapsed = time.perf_counter() - start
+            results[name] = {"transcribe_seconds": round(elapsed, 2), "rtf": round(elapsed / audio_seconds, 4), "transcript_chars": len(transcript)}
+    finally:
+        transcription.ENABLE_VAD_TRIM = enabled
+    results["speedup"] = round(results["untrimmed"]["transcribe_seconds"] / results["trimmed"]["transcribe_seconds"], 2)
+    return results
+
+
+def bench_prompts(durations, runs):
+    from services import gemini
+    from services.prompts import build_insights_prompt, estimate_tokens, split_transcript, transcript_token_budget
+
+    budget = transcript_token_budget(gemini.INSIGHTS_TOKEN_BUDGET)
+    results = {"transcript_token_budget": budget}
+    for minutes in durations:
+        transcript = synthetic_transcript(minutes)
+        results[f"transcript_{minutes:g}min"] = {
+            "chars": len(transcript),
+            "estimated_tokens": estimate_tokens(transcript),
+            "map_reduce_parts": len(split_transcript(transcript, budget)) if estimate_tokens(transcript) > budget else 1,
+            "build_prompt": time_runs(lambda: build_insights_prompt(transcript), runs),
+            "split_transcript": time_runs(lambda: split_transcript(transcript, budget), runs),
+        }
+    return results
+
+
+def bench_insights(durations, runs, stub_latency):
+    from services.gemini import generate_insights
+
+    results = {"stub_latency_seconds": stub_latency}
+    for minutes in durations:
+        transcript = synthetic_transcript(minutes)
+        summary = time_runs(lambda: generate_insights(transcript), runs)
+        # Time not spent waiting on the (simulated) model, per call
+        summary["client_overhead_ms"] = round(max(0.0, summary["median_ms"] - stub_latency * 1000), 3)
+        results[f"transcript_{minutes:g}min"] = summary
+    return results
+
+
+def bench_flask(wav_bytes, runs):
+    from neuronote import app
+
+    client = app.test_client()
+
+    def upload():
+        response = client.post("/recorded-audio", data={"file": (io.BytesIO(wav_bytes), "meeting.wav")}, content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()
+
+    first_start = time.perf_counter()
+    meeting_id = upload()["meetingId"] # Fills the transcript and insights caches
+    results = {"first_upload_seconds": round(time.perf_counter() - first_start, 2)}
+    results["cached_upload"] = time_runs(upload, runs)
+    results["get_meeting"] = time_runs(lambda: client.get(f"/meetings/{meeting_id}"), runs)
+    results["list_meetings"] = time_runs(lambda: client.get("/meetings?limit=50"), runs)
+    results["search"] = time_runs(lambda: client.get("/search?q=budget%20review"), runs)
+    results["admission_endpoint"] = time_runs(lambda: client.get("/admission"), runs)
+    return results
+
+
+def bench_storage(runs, minutes=30):
+    from services import storage_service as storage
+
+    transcript = synthetic_transcript(minutes)
+    insights = synthetic_transcript(1)
+    results = {"transcript_chars": len(transcript)}
+    original = (storage.STORAGE_WRITE_BEHIND, storage.TRANSCRIPT_COMPRESSION)
+    try:
+        for write_behind in (False, True):
+            for compression in (None, "gzip"):
+                storage.STORAGE_WRITE_BEHIND = write_behind
+                storage.TRANSCRIPT_COMPRESSION = compression
+                counter = iter(range(10 ** 9))
+                label = f"{'write_behind' if write_behind else 'sync'}_{compression or 'plain'}"
+
+                def save():
+                    meeting_id = f"bench_storage_{label}_{next(counter)}"
+                    storage.save_transcript(transcript, meeting_id)
+                    storage.save_insights(insights, meeting_id)
+                    return meeting_id
+
+                summary = time_runs(save, runs)
+                drain_start = time.perf_counter()
+                storage.write_behind.flush()
+                summary["drain_ms"] = round((time.perf_counter() - drain_start) * 1000, 3)
+                path = os.path.join(storage.OUTPUT_BASE_DIR, f"bench_storage_{label}_0", f"bench_storage_{label}_0_transcript.txt")
+                summary["transcript_bytes_on_disk"] = os.path.getsize(path)
+                results[label] = summary
+    finally:
+        storage.STORAGE_WRITE_BEHIND, storage.TRANSCRIPT_COMPRESSION = original
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _multipart(wav_bytes):
+    boundary = "neuronotebenchmarkboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"clip.wav\"\r\n"
+            f"Content-Type: audio/wav\r\n\r\n").encode() + wav_bytes + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _start_server(workspace, env, use_gunicorn):
+    """Starts wsgi:app; returns (port, stop function, server kind)."""
+    port = _free_port()
+    if use_gunicorn and shutil.which("gunicorn"):
+        process = subprocess.Popen(
+            ["gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "wsgi:app"],
+            cwd=workspace, env={**env, "PORT": str(port), "PYTHONPATH": ROOT},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 300 # Model preload happens before the port opens
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    break
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError("gunicorn exited during start-up")
+                time.sleep(0.5)
+
+        def stop():
+            process.terminate()
+            process.wait(30)
+        return port, stop, f"gunicorn ({env.get('GUNICORN_WORKERS', 2)} workers)"
+
+    from werkzeug.serving import make_server
+    from wsgi import app
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port, server.shutdown, "werkzeug threaded server (gunicorn not installed)"
+
+
+def bench_throughput(base, workspace, env, clients, requests, clip_seconds, use_gunicorn):
+    port, stop, server_kind = _start_server(workspace, env, use_gunicorn)
+    # Distinct clips, so each request really transcribes instead of hitting the cache.
+    bodies = [_multipart(to_wav_bytes(synthetic_recording(base, clip_seconds / 60, seed=1000 + i))) for i in range(requests)]
+
+    def send(index):
+        body, content_type = bodies[index]
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/recorded-audio", body=body, headers={"Content-Type": content_type})
+            response = connection.getresponse()
+            response.read()
+            return response.status, time.perf_counter() - start
+        finally:
+            connection.close()
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            outcomes = list(pool.map(send, range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        stop()
+
+    statuses = {}
+    for status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    succeeded = [latency for status, latency in outcomes if status == 200]
+    return {
+        "server": server_kind,
+        "clients": clients,
+        "requests": requests,
+        "clip_seconds": clip_seconds,
+        "statuses": statuses,
+        "elapsed_seconds": round(elapsed, 2),
+        "requests_per_second": round(len(succeeded) / elapsed, 3),
+        "audio_seconds_per_second": round(len(succeeded) * clip_seconds / elapsed, 2),
+        "latency": summarize(succeeded) if succeeded else None,
+    }
+
+
+# --- Baseline comparison ---
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Returns (regressions, improvements) for timing metrics present in both runs."""
+    current = flatten(results["benchmarks"])
+    previous = flatten(baseline["benchmarks"])
+    regressions = []
+    improvements = []
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        if not old or name.endswith(".runs"):
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (old - value) / old # Positive = worse
+        elif name.endswith(LOWER_IS_BETTER):
+            change = (value - old) / old
+        else:
+            continue
+        entry = {"metric": name, "baseline": old, "current": value, "change": round(change, 3)}
+        if change > tolerance:
+            regressions.append(entry)
+        elif change < -tolerance:
+            improvements.append(entry)
+    return regressions, improvements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=os.path.join(ROOT, "meeting.wav"))
+    parser.add_argument("--only", default=",".join(ALL_BENCHMARKS), help="Comma-separated subset of: " + ", ".join(ALL_BENCHMARKS))
+    parser.add_argument("--durations", default="1,5,15,60", help="Synthetic recording lengths in minutes")
+    parser.add_argument("--quick", action="store_true", help="Short run: 1-minute recordings and fewer repetitions")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions for the fast (millisecond) benchmarks")
+    parser.add_argument("--model", default=None, help="Whisper model (default: the configured one)")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Seconds the Gemini stub takes per call")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=12)
+    parser.add_argument("--clip-seconds", type=float, default=30)
+    parser.add_argument("--no-gunicorn", action="store_true", help="Use a threaded WSGI server even if gunicorn is installed")
+    parser.add_argument("--output", help="Write results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a metric counts as regressed")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(ALL_BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    durations = [1.0] if args.quick else [float(m) for m in args.durations.split(",")]
+    runs = 5 if args.quick else args.runs
+    audio_path = os.path.abspath(args.audio)
+
+    # Isolated workspace: outputs, caches and indexes are relative to the working directory.
+    workspace = tempfile.mkdtemp(prefix="neuronote_bench_")
+    stub = None
+    try:
+        from services.gemini_stub import serve
+        stub = serve(port=0, latency=args.stub_latency)
+        env = {
+            **os.environ,
+            "GEMINI_STUB_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+            # Measure local overhead, not the production rate limit.
+            "GEMINI_RATE_LIMIT_PER_MINUTE": "1000000",
+            "GEMINI_BURST": "1000000",
+            "MEETING_INDEX_PATH": os.path.join(workspace, "output", "meeting_index.sqlite3"),
+            "SEARCH_INDEX_DIR": os.path.join(workspace, "output", "search_index"),
+            "PRELOAD_MODELS": "false",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        }
+        os.environ.update(env)
+        os.chdir(workspace)
+
+        import whisper
+        base = whisper.load_audio(audio_path)
+        from services.model_registry import WHISPER_MODEL_NAME
+        model_name = args.model or WHISPER_MODEL_NAME
+
+        results = {
+            "suite": "neuronote",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "whisper_model": model_name,
+            },
+            "benchmarks": {},
+        }
+        benchmarks = results["benchmarks"]
+        if "prompts" in selected:
+            benchmarks["prompts"] = bench_prompts(durations, runs)
+        if "insights" in selected:
+            benchmarks["insights"] = bench_insights(durations, max(3, runs // 4), args.stub_latency)
+        if "storage" in selected:
+            benchmarks["storage"] = bench_storage(runs)
+        if "flask" in selected:
+            benchmarks["flask"] = bench_flask(to_wav_bytes(base), runs)
+        if "transcription" in selected:
+            benchmarks["transcription"] = bench_transcription(base, durations, model_name)
+        if "vad" in selected:
+            benchmarks["vad"] = bench_vad(base, min(durations[-1], 5.0), model_name, runs)
+        if "throughput" in selected:
+            benchmarks["throughput"] = bench_throughput(
+                base, workspace, env, args.clients, 4 if args.quick else args.requests, args.clip_seconds, not args.no_gunicorn)
+    finally:
+        os.chdir(ROOT)
+        if stub is not None:
+            stub.shutdown()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, improvements = compare(results, baseline, args.tolerance)
+        results["comparison"] = {
+            "baseline": args.baseline,
+            "baseline_timestamp": baseline.get("timestamp"),
+            "tolerance": args.tolerance,
+            "regressions": regressions,
+            "improvements": improvements,
+        }
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
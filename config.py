@@ -2,3 +2,103 @@ DEFAULT_WHISPER_MODEL = 'base'
 DEFAULT_GEMINI_MODEL = 'models/gemini-1.5-flash-latest'
 GEMINI_API_KEY = None  # Should be loaded from environment
 DEBUG = True
+
+# Background job queue for asynchronous /recorded-audio processing
+JOB_WORKERS = 2  # Number of pipeline runs executing at the same time
+JOB_QUEUE_MAX = 16  # Maximum number of queued + running jobs before new submissions are rejected
+JOB_HISTORY_MAX = 256  # Finished job records kept in memory per worker; older ones are read from output/jobs
+
+# Content-addressed result caches under output/cache (LRU-evicted by total size)
+ENABLE_RESULT_CACHE = True
+TRANSCRIPT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+INSIGHTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Chunked transcription: split long recordings at silences and transcribe chunks in parallel processes
+CHUNKED_TRANSCRIPTION = False
+TRANSCRIBE_CHUNK_SECONDS = 120  # Target chunk length; cuts are moved to the nearest pause
+TRANSCRIBE_CHUNK_OVERLAP_SECONDS = 2  # Audio shared by neighbouring chunks, de-duplicated when stitching
+TRANSCRIBE_WORKERS = 0  # Worker processes (each loads its own model); 0 = half the CPU cores
+
+# Insight generation: transcripts whose prompt would exceed the budget are summarized with map-reduce
+INSIGHTS_TOKEN_BUDGET = 30000  # Estimated prompt tokens allowed in one Gemini call
+INSIGHTS_MAP_WORKERS = 4  # Concurrent Gemini calls for the map step
+
+# Model registry: models are loaded on first use and shared across requests
+WHISPER_ALLOWED_MODELS = "tiny,base,small"  # Comma-separated sizes a request may choose with ?model=
+WHISPER_MAX_LOADED_MODELS = 2  # Whisper models kept in memory at once (least recently used is evicted)
+PRELOAD_MODELS = True  # Load the default Whisper model when wsgi.py is imported (before gunicorn forks with --preload)
+WHISPER_QUANTIZED_DIR = None  # Where "<size>-int8" models (e.g. WHISPER_MODEL=base-int8) are cached after conversion; None = ~/.cache/whisper
+
+# Live streaming transcription (/recorded-audio/stream)
+LIVE_STEP_SECONDS = 5  # Transcribe the rolling buffer after this much new audio
+LIVE_HOLDBACK_SECONDS = 2  # Segments ending this close to the buffer end stay tentative
+LIVE_SESSION_TIMEOUT_SECONDS = 600  # Idle live sessions are dropped after this long
+
+# Batch ingestion (/recorded-audio/batch)
+BATCH_DECODE_SIZE = 8  # 30-second mel windows decoded per Whisper forward pass
+BATCH_GEMINI_WORKERS = 4  # Concurrent insight generations per batch
+BATCH_MAX_ITEMS = 500  # Maximum recordings per batch request
+BATCH_MANIFEST_ROOT = None  # Directory that manifest paths must live under; None disables manifests
+
+# Gemini client: rate limiting, concurrency and retries for all insight calls
+GEMINI_RATE_LIMIT_PER_MINUTE = 60  # Token-bucket refill rate (requests per minute)
+GEMINI_BURST = 10  # Requests allowed in a burst before the rate limit applies
+GEMINI_MAX_CONCURRENCY = 8  # Gemini calls in flight at once per process
+GEMINI_MAX_RETRIES = 4  # Retries on 429/5xx, with exponential backoff and jitter
+GEMINI_BACKOFF_BASE_SECONDS = 1.0
+GEMINI_BACKOFF_MAX_SECONDS = 30.0
+GEMINI_TIMEOUT_SECONDS = 120  # Per-attempt timeout
+GEMINI_DEADLINE_SECONDS = 300  # Total time budget for one call, including retries
+
+# Meeting index: SQLite (WAL) catalogue of stored meetings, used by GET /meetings
+MEETING_INDEX_PATH = "output/meeting_index.sqlite3"  # Rebuild from output/meetings with: python -m services.meeting_index reindex
+
+# Full-text search (GET /search): segment files under output/search_index, updated in the background
+ENABLE_SEARCH_INDEX = True
+SEARCH_INDEX_DIR = "output/search_index"  # Rebuild from output/meetings with: python -m services.search_index rebuild
+SEARCH_MAX_SEGMENTS = 8  # Segments allowed before the smallest are merged regardless of tier
+SEARCH_MERGE_FACTOR = 4  # Segments of one size tier merged at once; also the size ratio between tiers
+
+# Storage of meeting outputs
+STORAGE_WRITE_BEHIND = False  # Write output files on a background thread instead of the request thread
+TRANSCRIPT_COMPRESSION = None  # None, "gzip" or "zstd" (needs the zstandard package); reads detect the format
+
+# Admission control: bound concurrent transcriptions so overload is rejected instead of thrashing
+MAX_CONCURRENT_TRANSCRIPTIONS = 2  # Transcriptions running at once on the machine, across all worker processes
+MAX_BACKGROUND_TRANSCRIPTIONS = 0  # Slots async jobs may use; 0 = all but one, kept free for interactive requests
+ADMISSION_LOCK_DIR = "output/admission"  # Slot lock files shared by the worker processes
+TRANSCRIPTION_QUEUE_MAX = 8  # Requests allowed to wait for a slot; more get 503 with Retry-After at once
+TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS = 30  # Longest wait for a slot before answering 503
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024  # Largest accepted upload per recording (0 = unlimited)
+MAX_AUDIO_SECONDS = 4 * 3600  # Longest accepted recording (0 = unlimited)
+
+# Metrics (Prometheus text format at /metrics)
+ENABLE_METRICS = True
+METRICS_MULTIPROCESS_DIR = None  # Shared directory so /metrics sums all gunicorn workers; None = per-process metrics
+
+# Logging (LOG_LEVEL and ENABLE_FILE_LOGGING are set through the environment)
+LOG_FORMAT = "text"  # "text" or "json" (one object per line, with meetingId when known)
+LOG_ASYNC = True  # Write log records on a background thread instead of the request thread
+LOG_QUEUE_MAX = 10000  # Records buffered for that thread; when full, new records are dropped and counted
+LOG_DEBUG_RATE_PER_SECOND = 5  # DEBUG records allowed per second from each logging call site (0 = unlimited)
+
+# Transcription speed profiles (?profile=fast|balanced|accurate on /recorded-audio)
+DEFAULT_SPEED_PROFILE = "balanced"  # Whisper's default decoding with WHISPER_MODEL
+BACKGROUND_SPEED_PROFILE = None  # Profile for ?async=true jobs without ?profile=, e.g. "accurate"; None = DEFAULT_SPEED_PROFILE
+SPEED_PROFILE_FAST_MODEL = "tiny"  # Greedy, no temperature fallback
+SPEED_PROFILE_ACCURATE_MODEL = "small"  # Beam search (5) with temperature fallback
+TRANSCRIPTION_LANGUAGE = None  # e.g. "en" to skip language detection; None = detect per recording
+TORCH_THREADS = 0  # Torch intra-op threads per transcription, set once per worker; 0 = CPU cores / MAX_CONCURRENT_TRANSCRIPTIONS
+
+# Local insights: short or low-content transcripts are summarized offline instead of by Gemini
+ENABLE_LOCAL_INSIGHTS = True
+LOCAL_INSIGHTS_MAX_WORDS = 75  # Transcripts with fewer words use the local engine
+LOCAL_INSIGHTS_MIN_CONTENT_WORDS = 10  # ...as do transcripts with fewer distinct content (non-filler) words
+
+# Voice-activity trimming: long non-speech spans (dead air, noise, hold music) are cut before Whisper
+ENABLE_VAD_TRIM = True
+VAD_MIN_SILENCE_SECONDS = 2.0  # Only non-speech runs at least this long are cut
+VAD_PADDING_SECONDS = 0.3  # Audio kept on each side of detected speech
+VAD_ENERGY_MARGIN_DB = 10.0  # Speech must be this much louder than the recording's noise floor
+VAD_MIN_MODULATION_DB = 1.5  # Steadier sound (tones, hum, sustained music) is not speech
+VAD_MIN_KEPT_FRACTION = 0.05  # Keeping less of an audible recording than this means detection failed; use it untrimmed
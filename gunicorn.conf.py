@@ -0,0 +1,21 @@
+# Gunicorn settings for NeuroNote. Usage: gunicorn -c gunicorn.conf.py wsgi:app
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300)) # Whisper on long recordings is slow
+# Sync workers serve one request each. MAX_CONCURRENT_TRANSCRIPTIONS is enforced across
+# all of them with lock files (services/admission.py), so a request that finds every slot
+# taken waits or gets 503 no matter which worker it reached.
+
+# Import wsgi.py (and preload the Whisper model) in the master before forking workers,
+# so the model weights are shared copy-on-write instead of loaded once per worker.
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything allocated so far into the permanent GC generation. Otherwise the
+    # first collection in each worker touches every object header and un-shares the pages.
+    gc.freeze()
+    server.log.info("Froze preloaded objects for copy-on-write sharing across workers.")
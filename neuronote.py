@@ -1,10 +1,14 @@
 import os
+import time
+import tempfile
 import datetime # For generating a unique meeting ID
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 
 # Logger first
-from utils.logger import logger
+from utils.logger import logger, set_log_context
+from utils.metrics import metrics, stage_timer, REQUEST_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # Attempt to import config, with fallbacks for DEBUG
 try:
@@ -14,9 +18,18 @@ except ImportError:
     DEBUG = True
 
 # Import services
-from services.transcription import transcribe_audio
-from services.gemini import generate_insights
-from services.storage_service import save_transcript, save_insights, OUTPUT_BASE_DIR # Modified import
+from services.pipeline import run_pipeline, run_insights_stage, stream_pipeline
+from services.live_transcription import live_sessions
+from services.batch import run_batch, resolve_manifest_path, BATCH_MAX_ITEMS
+from services.audio_chunking import SAMPLE_RATE
+from services.audio_io import UploadedAudio
+from services.model_registry import model_registry
+from services.speed_profiles import resolve_speed_profile, validate_language
+from services.job_queue import job_queue, JOB_QUEUED, JOB_RUNNING
+from services.admission import transcription_admission, check_upload_size
+from services.storage_service import load_meeting, is_valid_meeting_id, OUTPUT_BASE_DIR
+from services.meeting_index import meeting_index
+from services.search_index import search_index, FIELDS as SEARCH_FIELDS
 
 # Import error handlers and custom exceptions
 from utils.error_handlers import (
@@ -29,6 +42,8 @@ from utils.error_handlers import (
     handle_not_found_error
 )
 
+UPLOAD_BLOCK_BYTES = 1024 * 1024 # Batch uploads are copied to temporary files in blocks of this size
+
 app = Flask(__name__)
 CORS(app)
 logger.info("Flask app initialized with CORS.")
@@ -36,9 +51,9 @@ logger.info("Flask app initialized with CORS.")
 # Ensure base output directory exists at startup
 try:
     os.makedirs(OUTPUT_BASE_DIR, exist_ok=True)
-    logger.info(f"Ensured base output directory exists: {OUTPUT_BASE_DIR}")
+    logger.info("Ensured base output directory exists: %s", OUTPUT_BASE_DIR)
 except OSError as e:
-    logger.error(f"Could not create base output directory {OUTPUT_BASE_DIR} at startup: {e}", exc_info=True)
+    logger.error("Could not create base output directory %s at startup: %s", OUTPUT_BASE_DIR, e, exc_info=True)
     # Depending on how critical this is, you might want to exit or raise an error.
     # For now, just logging, as individual save calls will also try to create dirs.
 
@@ -51,9 +66,125 @@ app.register_error_handler(Exception, handle_generic_error)
 logger.info("Registered generic Exception handler.")
 
 
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.ensure_flusher()
+    # Routes addressing a meeting tag their log records with it; new meetings set it once created.
+    set_log_context((request.view_args or {}).get("meeting_id"))
+
+
+@app.after_request
+def _record_request_latency(response):
+    """Records request latency by route template (not raw path, to keep label cardinality bounded)."""
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    return response
+
+
+@app.teardown_request
+def _clear_log_context(exc):
+    set_log_context(None) # Worker threads are reused across requests
+
+
+def _new_meeting_id():
+    """Generates a unique, timestamped meeting ID used for file naming and directory creation."""
+    return f"meeting_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+
+def _requested_whisper_model():
+    """Returns the optional ?model= / form 'model' value after checking it is allowed."""
+    whisper_model = request.args.get('model', request.form.get('model')) or None
+    if whisper_model is not None:
+        try:
+            model_registry.resolve_whisper_name(whisper_model)
+        except ValueError as e:
+            logger.warning("Rejected request for Whisper model '%s': %s", whisper_model, e)
+            raise AppError(str(e), status_code=400)
+    return whisper_model
+
+
+def _requested_speed_profile(background=False):
+    """Returns the ?profile= / form 'profile' speed profile, or the default for this kind of request."""
+    try:
+        return resolve_speed_profile(request.args.get('profile', request.form.get('profile')) or None, background=background)
+    except ValueError as e:
+        raise AppError(str(e), status_code=400)
+
+
+def _requested_language():
+    """Returns the optional ?language= / form 'language' as a Whisper language code."""
+    language = request.args.get('language', request.form.get('language')) or None
+    if language is None:
+        return None
+    try:
+        return validate_language(language)
+    except ValueError as e:
+        raise AppError(str(e), status_code=400)
+
+
+def _spool_upload(file, meeting_id):
+    """
+    Copies one uploaded file to a temporary file, UPLOAD_BLOCK_BYTES at a time, and returns
+    its path. Stops with 413 as soon as the upload exceeds MAX_UPLOAD_BYTES.
+    """
+    check_upload_size(file.content_length or None) # Declared part length, when the client sends one
+    fd, path = tempfile.mkstemp(prefix=f"neuronote_{meeting_id}_", suffix=".upload")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for block in iter(lambda: file.stream.read(UPLOAD_BLOCK_BYTES), b""):
+                size += len(block)
+                check_upload_size(size)
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _is_truthy(value):
+    """Interprets a query/form flag such as ?async=true."""
+    return value is not None and value.lower() in ['true', '1', 't', 'yes']
+
+
+def _sse(event, data):
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_pipeline_response(audio, meeting_id, whisper_model, speed_profile, language):
+    """
+    Returns a text/event-stream response that runs the pipeline while streaming:
+    a "transcript" event, then "insights" chunks, then "done" (or "error").
+    """
+    def events():
+        pipeline = stream_pipeline(audio, meeting_id, whisper_model, speed_profile, language)
+        try:
+            for event, data in pipeline:
+                yield _sse(event, data)
+        except AppError as e:
+            logger.error("AppError during streamed processing for meeting_id %s: %s", meeting_id, e.message, exc_info=True)
+            yield _sse("error", e.to_dict())
+        except Exception as e:
+            logger.error("Unexpected error during streamed processing for meeting_id %s: %s", meeting_id, e, exc_info=True)
+            yield _sse("error", {"status": "error", "message": "An unexpected internal server error occurred."})
+        finally:
+            pipeline.close() # On client disconnect, lets the pipeline finish saving
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Stop nginx-style proxies from buffering the stream
+    return response
+
+
 @app.route('/recorded-audio', methods=['POST'])
 def handle_audio():
-    logger.info(f"Received request for /recorded-audio from {request.remote_addr}")
+    logger.info("Received request for /recorded-audio from %s", request.remote_addr)
+    # Reject oversized uploads from the declared length, before the body is read.
+    check_upload_size(request.content_length)
 
     if 'file' not in request.files:
         logger.warning("No file part in the request.")
@@ -65,74 +196,281 @@ def handle_audio():
         raise AppError("No selected file.", status_code=400)
 
     # Generate a unique meeting ID for this session for file naming and directory creation
-    meeting_id = f"meeting_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    meeting_id = _new_meeting_id()
+    set_log_context(meeting_id)
 
-    # Temporary path for the uploaded audio file.
-    # Using a temporary directory or a dedicated uploads directory might be better in a real scenario.
-    temp_audio_file_path = f'./{meeting_id}_uploaded_audio.wav' # Stored in root for now
-    logger.debug(f"Attempting to save uploaded file '{file.filename}' temporarily to '{temp_audio_file_path}'")
+    # Optional per-request Whisper model size, limited to WHISPER_ALLOWED_MODELS
+    whisper_model = _requested_whisper_model()
 
-    try:
-        file.save(temp_audio_file_path)
-        logger.info(f"File '{file.filename}' saved successfully to temporary path '{temp_audio_file_path}'")
+    # Async mode: enqueue the pipeline and answer 202 immediately instead of holding the worker.
+    run_async = _is_truthy(request.args.get('async', request.form.get('async')))
+    # Streaming mode: answer with server-sent events as transcript and insight chunks become ready.
+    stream_events = _is_truthy(request.args.get('stream', request.form.get('stream')))
+    # Speed profile (fast/balanced/accurate); background jobs default to BACKGROUND_SPEED_PROFILE.
+    speed_profile = _requested_speed_profile(background=run_async)
+    language = _requested_language()
 
-        logger.info(f"Starting audio processing for meeting_id: {meeting_id} (source file: {temp_audio_file_path})...")
-        transcript = transcribe_audio(temp_audio_file_path)
+    try:
+        # Keep the upload in memory: WAV is decoded natively and other formats are piped
+        # through ffmpeg, so nothing is written to disk before transcription.
+        with stage_timer("upload_read"):
+            audio = UploadedAudio(file.read(), file.filename)
+        check_upload_size(len(audio.data))
+        logger.info("Received upload '%s' (%s bytes) for meeting_id: %s", file.filename, len(audio.data), meeting_id)
 
-        logger.info(f"Starting insight generation for meeting_id: {meeting_id}...")
-        insights = generate_insights(transcript)
+        if run_async:
+            job = job_queue.submit(meeting_id, run_pipeline, audio, meeting_id, whisper_model, speed_profile, language)
+            response = jsonify({
+                "status": "accepted",
+                "meetingId": meeting_id,
+                "jobStatus": job["status"],
+                "jobUrl": f"/jobs/{meeting_id}",
+                "meetingUrl": f"/meetings/{meeting_id}",
+                "speedProfile": speed_profile,
+            })
+            response.status_code = 202
+            return response
 
-        logger.info(f"Successfully processed audio and generated insights for meeting_id: {meeting_id}.")
+        if stream_events:
+            return _stream_pipeline_response(audio, meeting_id, whisper_model, speed_profile, language)
 
-        # Save transcript and insights using the storage service
-        try:
-            logger.info(f"Attempting to save transcript for meeting_id: {meeting_id}")
-            transcript_path = save_transcript(transcript, meeting_id)
-            logger.info(f"Transcript for meeting_id {meeting_id} saved to: {transcript_path}")
-
-            logger.info(f"Attempting to save insights for meeting_id: {meeting_id}")
-            insights_path = save_insights(insights, meeting_id)
-            logger.info(f"Insights for meeting_id {meeting_id} saved to: {insights_path}")
-        except FileStorageError as fse:
-            logger.error(f"File storage error when saving outputs for meeting_id {meeting_id}: {fse.message}", exc_info=True)
-            # Not re-raising, as successful processing but failed saving might still be a partial success for the user.
-            # The main response with insights will still be returned.
-        except Exception as e_save:
-            logger.error(f"Unexpected error during saving transcript/insights for meeting_id {meeting_id}: {e_save}", exc_info=True)
-            # Also not re-raising this for now.
-
-        return jsonify({
-            "status" : "success",
-            "text" : insights,
-            "meetingId": meeting_id, # Return the meeting_id
-            "transcriptPath": transcript_path if 'transcript_path' in locals() else None, # Return paths if saved
-            "insightsPath": insights_path if 'insights_path' in locals() else None
-        })
+        return jsonify(run_pipeline(audio, meeting_id, whisper_model, speed_profile, language))
 
     except TranscriptionError as e:
-        logger.error(f"TranscriptionError caught in handle_audio for meeting_id {meeting_id} (file: {file.filename}): {e.message}", exc_info=True)
+        logger.error("TranscriptionError caught in handle_audio for meeting_id %s (file: %s): %s", meeting_id, file.filename, e.message, exc_info=True)
         raise e
     except GeminiError as e:
-        logger.error(f"GeminiError caught in handle_audio for meeting_id {meeting_id} (file: {file.filename}): {e.message}", exc_info=True)
+        logger.error("GeminiError caught in handle_audio for meeting_id %s (file: %s): %s", meeting_id, file.filename, e.message, exc_info=True)
+        raise e
+    except FileStorageError as e:
+        logger.error("FileStorageError caught in handle_audio for meeting_id %s (file: %s): %s", meeting_id, file.filename, e.message, exc_info=True)
         raise e
-    except FileStorageError as e: # If file.save() itself fails, for instance.
-        logger.error(f"FileStorageError (e.g., initial save) caught in handle_audio for meeting_id {meeting_id} (file: {file.filename}): {e.message}", exc_info=True)
-        raise e # This is likely critical if we can't even save the upload.
     except AppError as e:
-        logger.error(f"Unhandled AppError caught in handle_audio for meeting_id {meeting_id} (file: {file.filename}): {e.message}", exc_info=True)
+        logger.error("Unhandled AppError caught in handle_audio for meeting_id %s (file: %s): %s", meeting_id, file.filename, e.message, exc_info=True)
         raise e
     except Exception as e:
-        logger.error(f"An unexpected non-AppError exception occurred in handle_audio for meeting_id {meeting_id} (file: {file.filename}): {str(e)}", exc_info=True)
+        logger.error("An unexpected non-AppError exception occurred in handle_audio for meeting_id %s (file: %s): %s", meeting_id, file.filename, str(e), exc_info=True)
         raise AppError(f"An unexpected server error occurred processing file '{file.filename}'.", status_code=500)
 
+
+@app.route('/recorded-audio/batch', methods=['POST'])
+def handle_audio_batch():
+    """
+    Processes many recordings in one request: uploaded `files`, or a JSON manifest
+    {"paths": [...]} of files under BATCH_MANIFEST_ROOT. Returns per-item status.
+    """
+    logger.info("Received request for /recorded-audio/batch from %s", request.remote_addr)
+    # Reject oversized batches from the declared length, before the body is read.
+    check_upload_size(request.content_length, recordings=BATCH_MAX_ITEMS)
+    whisper_model = _requested_whisper_model()
+    run_async = _is_truthy(request.args.get('async', request.form.get('async')))
+
+    items = []
+    temp_paths = []
+    manifest = request.get_json(silent=True) if request.is_json else None
+    if manifest is not None:
+        paths = manifest.get("paths") if isinstance(manifest, dict) else None
+        if not isinstance(paths, list) or not paths:
+            raise AppError("Manifest must be a JSON object with a non-empty 'paths' list.", status_code=400)
+        if len(paths) > BATCH_MAX_ITEMS:
+            raise AppError(f"Batch is limited to {BATCH_MAX_ITEMS} items.", status_code=400)
+        for path in paths:
+            items.append({"name": path, "path": resolve_manifest_path(str(path)), "meetingId": _new_meeting_id()})
+    else:
+        files = [f for f in request.files.getlist('files') if f.filename]
+        if not files:
+            logger.warning("Batch request without files or manifest.")
+            raise AppError("Send audio files in the 'files' field or a JSON manifest of paths.", status_code=400)
+        if len(files) > BATCH_MAX_ITEMS:
+            raise AppError(f"Batch is limited to {BATCH_MAX_ITEMS} items.", status_code=400)
+
+    batch_id = f"batch_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    handed_off_to_job = False
+    try:
+        if manifest is None:
+            for file in files:
+                meeting_id = _new_meeting_id()
+                temp_audio_file_path = _spool_upload(file, meeting_id)
+                temp_paths.append(temp_audio_file_path)
+                items.append({"name": file.filename, "path": temp_audio_file_path, "meetingId": meeting_id})
+            logger.info("Saved %s uploaded files for %s.", len(items), batch_id)
+
+        if run_async:
+            job = job_queue.submit(batch_id, run_batch, items, whisper_model, cleanup_paths=temp_paths, keep_result=True)
+            handed_off_to_job = True
+            response = jsonify({
+                "status": "accepted",
+                "batchId": batch_id,
+                "jobStatus": job["status"],
+                "jobUrl": f"/jobs/{batch_id}",
+                "meetingIds": [item["meetingId"] for item in items]
+            })
+            response.status_code = 202
+            return response
+
+        summary = run_batch(items, whisper_model)
+        summary["batchId"] = batch_id
+        return jsonify(summary)
+    finally:
+        if not handed_off_to_job:
+            for temp_audio_file_path in temp_paths:
+                try:
+                    os.remove(temp_audio_file_path)
+                except OSError as e_cleanup:
+                    logger.error("Error deleting temporary audio file %s: %s", temp_audio_file_path, e_cleanup, exc_info=True)
+
+
+@app.route('/recorded-audio/stream', methods=['POST'])
+def start_live_stream():
+    """Opens a live session; the client then posts raw 16 kHz mono PCM16 frames to it."""
+    logger.info("Received request to start a live stream from %s", request.remote_addr)
+    whisper_model = _requested_whisper_model()
+    meeting_id = _new_meeting_id()
+    set_log_context(meeting_id)
+    live_sessions.create(meeting_id, whisper_model)
+    response = jsonify({
+        "status": "streaming",
+        "meetingId": meeting_id,
+        "framesUrl": f"/recorded-audio/stream/{meeting_id}",
+        "closeUrl": f"/recorded-audio/stream/{meeting_id}/close",
+        "sampleRate": SAMPLE_RATE,
+        "encoding": "pcm_s16le"
+    })
+    response.status_code = 201
+    return response
+
+
+@app.route('/recorded-audio/stream/<meeting_id>', methods=['POST'])
+def add_live_frames(meeting_id):
+    """Appends audio frames (request body) and returns any newly transcribed segments."""
+    session = live_sessions.get(meeting_id)
+    frame_bytes = request.get_data(cache=False)
+    if not frame_bytes:
+        raise AppError("Empty audio frame.", status_code=400)
+
+    segments, partial = session.add_frames(frame_bytes)
+    return jsonify({
+        "status": "streaming",
+        "meetingId": meeting_id,
+        "segments": segments,
+        "partial": partial
+    })
+
+
+@app.route('/recorded-audio/stream/<meeting_id>/close', methods=['POST'])
+def close_live_stream(meeting_id):
+    """Ends a live session: transcribes the buffered tail, then runs insights on the transcript."""
+    session = live_sessions.get(meeting_id)
+    logger.info("Closing live stream for meeting_id: %s", meeting_id)
+    try:
+        transcript = session.finish()
+        return jsonify(run_insights_stage(transcript, meeting_id))
     finally:
-        if os.path.exists(temp_audio_file_path):
-            try:
-                logger.debug(f"Attempting to delete temporary uploaded audio file: {temp_audio_file_path}")
-                os.remove(temp_audio_file_path)
-                logger.info(f"Cleaned up temporary uploaded audio file: {temp_audio_file_path}")
-            except Exception as e_cleanup:
-                logger.error(f"Error deleting temporary audio file {temp_audio_file_path}: {e_cleanup}", exc_info=True)
+        live_sessions.remove(meeting_id)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: stage latencies, real-time factor, audio seconds, tokens."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/admission', methods=['GET'])
+def get_admission_stats():
+    """
+    Load of this worker process: running and waiting transcriptions, rejections, queue
+    wait percentiles and background job queue depth. Each gunicorn worker answers for itself.
+    """
+    stats = transcription_admission.stats()
+    stats["jobQueue"] = job_queue.stats()
+    return jsonify(stats)
+
+
+@app.route('/jobs/<meeting_id>', methods=['GET'])
+def get_job(meeting_id):
+    logger.info("Received job status request for meeting_id: %s", meeting_id)
+    if not is_valid_meeting_id(meeting_id):
+        raise AppError("Invalid job id.", status_code=400)
+
+    job = job_queue.get(meeting_id)
+    if job is None:
+        raise AppError(f"No job found with id '{meeting_id}'.", status_code=404)
+
+    job["meetingUrl"] = f"/meetings/{meeting_id}"
+    return jsonify(job)
+
+
+@app.route('/meetings', methods=['GET'])
+def list_meetings():
+    """
+    Lists indexed meetings, newest first. Query parameters: limit (1-200, default 50),
+    cursor (nextCursor from the previous page), status, model (Whisper model) and
+    since/until (ISO 8601 creation times).
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        raise AppError("limit must be an integer.", status_code=400)
+    if not 1 <= limit <= 200:
+        raise AppError("limit must be between 1 and 200.", status_code=400)
+
+    try:
+        meetings, next_cursor = meeting_index.list_meetings(
+            limit=limit,
+            cursor=request.args.get('cursor') or None,
+            status=request.args.get('status') or None,
+            whisper_model=request.args.get('model') or None,
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+        )
+    except ValueError:
+        raise AppError("Invalid cursor, or since/until is not an ISO 8601 date or time.", status_code=400)
+    return jsonify({"meetings": meetings, "nextCursor": next_cursor})
+
+
+@app.route('/search', methods=['GET'])
+def search_meetings():
+    """
+    Full-text search over stored transcripts and insights, ranked with BM25.
+    Query parameters: q (words and "quoted phrases"), limit (1-100, default 10) and
+    field (transcript or insights) to search only one kind of document.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise AppError("Query parameter 'q' is required.", status_code=400)
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        raise AppError("limit must be an integer.", status_code=400)
+    if not 1 <= limit <= 100:
+        raise AppError("limit must be between 1 and 100.", status_code=400)
+    field = request.args.get('field') or None
+    if field is not None and field not in SEARCH_FIELDS:
+        raise AppError(f"field must be one of: {', '.join(SEARCH_FIELDS)}.", status_code=400)
+
+    logger.info("Received search request (limit %s, field %s)", limit, field)
+    with stage_timer("search"):
+        return jsonify(search_index.search(query, limit=limit, field=field))
+
+
+@app.route('/meetings/<meeting_id>', methods=['GET'])
+def get_meeting(meeting_id):
+    logger.info("Received meeting results request for meeting_id: %s", meeting_id)
+    if not is_valid_meeting_id(meeting_id):
+        raise AppError("Invalid meeting id.", status_code=400)
+
+    meeting = load_meeting(meeting_id)
+    if meeting is None:
+        job = job_queue.get(meeting_id)
+        if job is not None:
+            # Known job whose results are not written yet (or which failed).
+            response = jsonify({"status": job["status"], "meetingId": meeting_id, "error": job.get("error")})
+            response.status_code = 202 if job["status"] in (JOB_QUEUED, JOB_RUNNING) else 200
+            return response
+        raise AppError(f"No meeting found with id '{meeting_id}'.", status_code=404)
+
+    meeting["status"] = "success"
+    return jsonify(meeting)
 
 
 if __name__ == "__main__":
@@ -143,10 +481,10 @@ if __name__ == "__main__":
         effective_debug = flask_debug_env.lower() in ['true', '1', 't']
     else:
         effective_debug = DEBUG
-    logger.info(f"Flask effective debug mode: {effective_debug}")
+    logger.info("Flask effective debug mode: %s", effective_debug)
 
     host = os.environ.get("FLASK_RUN_HOST", '0.0.0.0')
     port = int(os.environ.get("FLASK_RUN_PORT", os.environ.get("PORT", 5000)))
 
-    logger.info(f"Attempting to start Flask app on {host}:{port}")
+    logger.info("Attempting to start Flask app on %s:%s", host, port)
     app.run(debug=effective_debug, host=host, port=port)
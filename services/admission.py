@@ -0,0 +1,260 @@
+import os
+import math
+import time
+import threading
+try:
+    import fcntl
+except ImportError: # Not on POSIX: slots are counted per process only
+    fcntl = None
+from collections import deque
+from contextlib import contextmanager
+
+from utils.logger import logger
+from utils.error_handlers import AppError, OverloadedError
+from utils.metrics import metrics, STAGE_SECONDS
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        MAX_CONCURRENT_TRANSCRIPTIONS as DEFAULT_MAX_CONCURRENT_TRANSCRIPTIONS,
+        TRANSCRIPTION_QUEUE_MAX as DEFAULT_TRANSCRIPTION_QUEUE_MAX,
+        TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS as DEFAULT_TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS,
+        MAX_UPLOAD_BYTES as DEFAULT_MAX_UPLOAD_BYTES,
+        MAX_AUDIO_SECONDS as DEFAULT_MAX_AUDIO_SECONDS,
+        MAX_BACKGROUND_TRANSCRIPTIONS as DEFAULT_MAX_BACKGROUND_TRANSCRIPTIONS,
+        ADMISSION_LOCK_DIR as DEFAULT_ADMISSION_LOCK_DIR,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default admission control settings.")
+    DEFAULT_MAX_CONCURRENT_TRANSCRIPTIONS = 2
+    DEFAULT_TRANSCRIPTION_QUEUE_MAX = 8
+    DEFAULT_TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS = 30
+    DEFAULT_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+    DEFAULT_MAX_AUDIO_SECONDS = 4 * 3600
+    DEFAULT_MAX_BACKGROUND_TRANSCRIPTIONS = 0
+    DEFAULT_ADMISSION_LOCK_DIR = os.path.join("output", "admission")
+
+MAX_CONCURRENT_TRANSCRIPTIONS = max(1, int(os.environ.get("MAX_CONCURRENT_TRANSCRIPTIONS", DEFAULT_MAX_CONCURRENT_TRANSCRIPTIONS)))
+TRANSCRIPTION_QUEUE_MAX = max(0, int(os.environ.get("TRANSCRIPTION_QUEUE_MAX", DEFAULT_TRANSCRIPTION_QUEUE_MAX)))
+TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS", DEFAULT_TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES)) # 0 = unlimited
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", DEFAULT_MAX_AUDIO_SECONDS)) # 0 = unlimited
+# Slots background work may use; 0 keeps one slot free for interactive requests
+MAX_BACKGROUND_TRANSCRIPTIONS = int(os.environ.get("MAX_BACKGROUND_TRANSCRIPTIONS", DEFAULT_MAX_BACKGROUND_TRANSCRIPTIONS)) or max(
+    1, MAX_CONCURRENT_TRANSCRIPTIONS - 1)
+# Slot lock files shared by all worker processes on the machine
+ADMISSION_LOCK_DIR = os.environ.get("ADMISSION_LOCK_DIR", DEFAULT_ADMISSION_LOCK_DIR)
+
+WAIT_SAMPLES = 1000 # Recent queue waits kept for the percentiles in stats()
+POLL_SECONDS = 0.05 # How often a waiter retries the slot locks; other processes cannot notify it
+
+REJECTIONS = metrics.counter(
+    "neuronote_transcription_rejections_total", "Transcriptions answered with 503, by reason (queue_full or timeout).", labels=("reason",))
+
+
+def check_upload_size(num_bytes, recordings=1):
+    """Raises AppError(413) if an upload of up to `recordings` recordings exceeds MAX_UPLOAD_BYTES each."""
+    limit = MAX_UPLOAD_BYTES * recordings
+    if limit and num_bytes is not None and num_bytes > limit:
+        raise AppError(f"Upload is {num_bytes} bytes; the limit is {limit} bytes.", status_code=413)
+
+
+def check_audio_duration(seconds):
+    """Raises AppError(413) if a recording is longer than MAX_AUDIO_SECONDS."""
+    if MAX_AUDIO_SECONDS and seconds > MAX_AUDIO_SECONDS:
+        raise AppError(f"Recording is {seconds:.0f}s long; the limit is {MAX_AUDIO_SECONDS:.0f}s.", status_code=413)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class AdmissionController:
+    """
+    Limits how many transcriptions run at once on this machine.
+
+    Slots are lock files (slot-0.lock ... ) under lock_dir, held with fcntl.flock, so the
+    limit covers every gunicorn worker process; a slot is released when its holder
+    finishes or dies. Callers past the limit wait in this process's queue of at most
+    max_waiting entries for up to wait_timeout seconds. A full queue or an expired wait
+    raises OverloadedError (503 with Retry-After) instead of adding another CPU-bound
+    transcription to an overloaded machine.
+
+    Background work (job queue threads) is a lower priority class: interactive callers
+    are queued ahead of it, it may only take the first max_background slots (so the rest
+    stay free for interactive requests), and it waits without a deadline and is not
+    counted against max_waiting, since its client is not holding a connection open.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_TRANSCRIPTIONS, max_waiting=TRANSCRIPTION_QUEUE_MAX,
+                 wait_timeout=TRANSCRIPTION_QUEUE_TIMEOUT_SECONDS, max_background=MAX_BACKGROUND_TRANSCRIPTIONS,
+                 lock_dir=ADMISSION_LOCK_DIR):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.max_background = max(1, min(max_background, max_concurrent))
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self._condition = threading.Condition()
+        self._queue = deque() # Tickets of waiting callers: interactive ones first, each class in arrival order
+        self._held = {} # Slot index -> lock file descriptor (or None without fcntl), for this process
+        self._background_waiting = 0
+        self._local = threading.local()
+        self._service_seconds = None # Moving average of how long a slot is held
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {"admitted": 0, "rejected": 0, "timedOut": 0}
+        self._total_wait_seconds = 0.0
+
+    @property
+    def _running(self):
+        return len(self._held)
+
+    @contextmanager
+    def background(self):
+        """Marks the current thread's work as background for slot() (see class docstring)."""
+        previous = getattr(self._local, "background", False)
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = previous
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: the estimated time to drain the current queue."""
+        service = self._service_seconds or 30.0
+        backlog = len(self._queue) + self._running
+        return max(1, math.ceil(service * backlog / self.max_concurrent))
+
+    def _try_acquire(self, background):
+        """Takes a free slot for this caller and returns its index, or None. Call with the condition held."""
+        for index in range(self.max_background if background else self.max_concurrent):
+            if index in self._held:
+                continue
+            if self.lock_dir is None:
+                self._held[index] = None
+                return index
+            os.makedirs(self.lock_dir, exist_ok=True)
+            fd = os.open(os.path.join(self.lock_dir, f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError: # Held by another process
+                os.close(fd)
+                continue
+            self._held[index] = fd
+            return index
+        return None
+
+    def _release(self, index):
+        fd = self._held.pop(index)
+        if fd is not None:
+            os.close(fd) # Closing the descriptor drops the flock
+
+    def _enqueue(self, ticket, background):
+        if background:
+            self._queue.append(ticket)
+            self._background_waiting += 1
+        else: # Ahead of every waiting background ticket
+            self._queue.insert(len(self._queue) - self._background_waiting, ticket)
+
+    @contextmanager
+    def slot(self, label=""):
+        """Holds one transcription slot for the duration of the with block."""
+        background = getattr(self._local, "background", False)
+        ticket = object()
+        start = time.monotonic()
+        with self._condition:
+            ahead = len(self._queue) if background else len(self._queue) - self._background_waiting
+            index = None if ahead else self._try_acquire(background)
+            if index is None:
+                if not background and ahead >= self.max_waiting:
+                    self._counters["rejected"] += 1
+                    REJECTIONS.inc(1, "queue_full")
+                    retry_after = self.retry_after()
+                    logger.warning("Transcription queue full (%s waiting, %s running here); rejecting %s.", len(self._queue), self._running, label)
+                    raise OverloadedError("Server is busy transcribing other recordings. Please retry later.", retry_after=retry_after)
+                self._enqueue(ticket, background)
+                deadline = None if background else start + self.wait_timeout
+                try:
+                    while self._queue[0] is not ticket or (index := self._try_acquire(background)) is None:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self._counters["timedOut"] += 1
+                            REJECTIONS.inc(1, "timeout")
+                            retry_after = self.retry_after()
+                            logger.warning("Gave up waiting for a transcription slot after %.0fs for %s.", self.wait_timeout, label)
+                            raise OverloadedError("Timed out waiting for a transcription slot. Please retry later.", retry_after=retry_after)
+                        # Slots freed by other processes are only noticed by polling
+                        self._condition.wait(POLL_SECONDS if remaining is None else min(remaining, POLL_SECONDS))
+                finally:
+                    self._queue.remove(ticket)
+                    if background:
+                        self._background_waiting -= 1
+                    self._condition.notify_all() # The next ticket may now be at the head
+            waited = time.monotonic() - start
+            self._counters["admitted"] += 1
+            self._total_wait_seconds += waited
+            self._waits.append(waited)
+        STAGE_SECONDS.observe(waited, "queue_wait", "")
+        if waited >= 0.001:
+            logger.info("Waited %.2fs for a transcription slot for %s.", waited, label)
+
+        held_from = time.monotonic()
+        try:
+            yield waited
+        finally:
+            held = time.monotonic() - held_from
+            with self._condition:
+                self._release(index)
+                self._service_seconds = held if self._service_seconds is None else 0.8 * self._service_seconds + 0.2 * held
+                self._condition.notify_all()
+
+    @contextmanager
+    def extra_slots(self, count):
+        """
+        For a caller that already holds a slot and can spread its work (chunked transcription):
+        takes up to count more slots that are free right now, without waiting and never while
+        others are queued. Yields how many were taken; they are released when the block exits.
+        """
+        background = getattr(self._local, "background", False)
+        taken = []
+        with self._condition:
+            while not self._queue and len(taken) < count and (index := self._try_acquire(background)) is not None:
+                taken.append(index)
+        try:
+            yield len(taken)
+        finally:
+            with self._condition:
+                for index in taken:
+                    self._release(index)
+                self._condition.notify_all()
+
+    def stats(self):
+        """Current load and queue wait statistics for this process (the slot limit is machine-wide)."""
+        with self._condition:
+            waits = sorted(self._waits)
+            admitted = self._counters["admitted"]
+            return {
+                "pid": os.getpid(),
+                "maxConcurrent": self.max_concurrent,
+                "maxBackground": self.max_background,
+                "machineWide": self.lock_dir is not None,
+                "maxWaiting": self.max_waiting,
+                "waitTimeoutSeconds": self.wait_timeout,
+                "running": self._running,
+                "waiting": len(self._queue),
+                **self._counters,
+                "averageWaitSeconds": round(self._total_wait_seconds / admitted, 3) if admitted else 0.0,
+                "p50WaitSeconds": round(_percentile(waits, 0.5), 3),
+                "p95WaitSeconds": round(_percentile(waits, 0.95), 3),
+                "averageServiceSeconds": round(self._service_seconds, 3) if self._service_seconds is not None else None,
+                "retryAfterSeconds": self.retry_after(),
+                "maxUploadBytes": MAX_UPLOAD_BYTES,
+                "maxAudioSeconds": MAX_AUDIO_SECONDS,
+            }
+
+
+transcription_admission = AdmissionController()
+
+metrics.gauge("neuronote_transcriptions_running", "Transcriptions holding a slot in this process.", lambda: transcription_admission._running)
+metrics.gauge("neuronote_transcriptions_waiting", "Requests waiting for a transcription slot in this process.", lambda: len(transcription_admission._queue))
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+
+from utils.logger import logger
+
+SAMPLE_RATE = 16000 # Whisper works on 16 kHz mono audio
+FRAME_SECONDS = 0.03 # Energy frame size used to locate silences
+
+
+def find_quietest_sample(audio, center, search_samples, frame_samples):
+    """
+    Returns the sample index of the lowest-energy frame within +/- search_samples of center.
+    Used to move chunk boundaries into pauses so words are not cut in half.
+    """
+    lo = max(0, center - search_samples)
+    hi = min(len(audio), center + search_samples)
+    n_frames = (hi - lo) // frame_samples
+    if n_frames < 1:
+        return center
+    window = audio[lo:lo + n_frames * frame_samples].reshape(n_frames, frame_samples)
+    energy = np.einsum("ij,ij->i", window, window) # Per-frame sum of squares, vectorized
+    quietest = int(np.argmin(energy))
+    return lo + quietest * frame_samples + frame_samples // 2
+
+
+def plan_chunks(audio, chunk_seconds, overlap_seconds, search_seconds=None, sample_rate=SAMPLE_RATE):
+    """
+    Splits audio into overlapping windows whose cut points sit at silences.
+
+    Returns a list of dicts with the window bounds ("start", "end") that are sent to the
+    model and the region the chunk owns ("owned_start", "owned_end"), all in samples.
+    Owned regions tile the recording exactly, which is what stitching relies on.
+    """
+    total = len(audio)
+    chunk_samples = int(chunk_seconds * sample_rate)
+    overlap_samples = int(overlap_seconds * sample_rate)
+    search_samples = int((search_seconds if search_seconds is not None else chunk_seconds * 0.1) * sample_rate)
+    frame_samples = int(FRAME_SECONDS * sample_rate)
+
+    cuts = [0]
+    nominal = chunk_samples
+    while nominal < total - chunk_samples // 2: # Don't leave a tiny tail chunk
+        cut = find_quietest_sample(audio, nominal, search_samples, frame_samples)
+        cuts.append(max(cut, cuts[-1] + frame_samples))
+        nominal = cuts[-1] + chunk_samples
+    cuts.append(total)
+
+    chunks = []
+    for owned_start, owned_end in zip(cuts[:-1], cuts[1:]):
+        chunks.append({
+            "start": max(0, owned_start - overlap_samples),
+            "end": min(total, owned_end + overlap_samples),
+            "owned_start": owned_start,
+            "owned_end": owned_end,
+        })
+    return chunks
+
+
+def stitch_segments(chunk_results, sample_rate=SAMPLE_RATE):
+    """
+    Merges per-chunk Whisper segments into one list with global timestamps.
+
+    chunk_results is a list of (chunk, segments) pairs. Segment times are shifted by the
+    chunk's window start, and a segment is kept only if its midpoint falls in the region
+    the chunk owns, so text transcribed twice in an overlap appears once.
+    """
+    stitched = []
+    for chunk, segments in sorted(chunk_results, key=lambda item: item[0]["start"]):
+        offset = chunk["start"] / sample_rate
+        owned_start = chunk["owned_start"] / sample_rate
+        owned_end = chunk["owned_end"] / sample_rate
+        for segment in segments:
+            start = segment["start"] + offset
+            end = segment["end"] + offset
+            midpoint = (start + end) / 2
+            if owned_start <= midpoint < owned_end:
+                stitched.append({"start": start, "end": end, "text": segment["text"]})
+    return stitched
+
+
+def join_segments(segments):
+    """Joins segment texts the way Whisper builds result["text"]."""
+    return "".join(segment["text"] for segment in segments)
+
+
+# --- Process pool worker side ---
+# Each worker process has its own model registry (the module is re-imported after spawn),
+# so it keeps its own LRU of Whisper models.
+
+
+def init_worker(model_name, num_threads):
+    """ProcessPoolExecutor initializer: pins torch threads and preloads this worker's model."""
+    import torch
+    from services.model_registry import model_registry
+
+    torch.set_num_threads(max(1, num_threads))
+    model_registry.preload([model_name])
+    logger.info("Transcription worker %s loaded Whisper model '%s' with %s threads.", os.getpid(), model_name, num_threads)
+
+
+def transcribe_chunk(chunk, audio_window, model_name=None, transcribe_options=None):
+    """Transcribes one audio window in a worker process; returns (chunk, segments)."""
+    from services.model_registry import model_registry
+
+    _, model = model_registry.get_whisper(model_name)
+    result = model.transcribe(audio_window, **(transcribe_options or {}))
+    segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+    return chunk, segments
@@ -0,0 +1,217 @@
+import os
+import math
+import struct
+import hashlib
+import tempfile
+import subprocess
+
+import numpy as np
+
+from utils.logger import logger
+from utils.error_handlers import AppError, TranscriptionError
+from services.audio_chunking import SAMPLE_RATE
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+RESAMPLE_ZERO_CROSSINGS = 32 # Sinc lobes on each side of the filter center
+RESAMPLE_ROLLOFF = 0.9 # Filter cutoff (-6 dB) as a fraction of the lower Nyquist frequency
+RESAMPLE_KAISER_BETA = 9.0
+RESAMPLE_BLOCK = 16384 # Output samples computed per step
+
+
+class UploadedAudio:
+    """
+    An upload held in memory. Decoding to Whisper's float32 16 kHz mono input happens on
+    first use: PCM/float WAV is parsed natively with NumPy, other formats are piped
+    through ffmpeg. Neither path writes the upload to disk.
+    """
+
+    def __init__(self, data: bytes, filename: str = ""):
+        self.data = data
+        self.filename = filename
+        self._samples = None
+        self._sha256 = None
+
+    def sha256(self):
+        """Content hash of the raw upload; equals hash_file() of the same bytes on disk."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    def samples(self):
+        if self._samples is None:
+            self._samples = decode_audio_bytes(self.data)
+        return self._samples
+
+    def __str__(self):
+        return f"<in-memory upload '{self.filename}', {len(self.data)} bytes>"
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def _parse_wav(data: bytes):
+    """Returns (format_tag, channels, sample_rate, bits_per_sample, payload view) for a RIFF/WAVE buffer."""
+    fmt = None
+    payload = None
+    offset = 12
+    view = memoryview(data)
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if chunk_size < 16 or body + 16 > len(data):
+                raise ValueError("WAV fmt chunk is truncated.")
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40 and body + 26 <= len(data):
+                # The real format is the first two bytes of the SubFormat GUID.
+                (format_tag,) = struct.unpack_from("<H", data, body + 24)
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            # Recorders that stream WAV often leave the data size as 0 or 0xFFFFFFFF.
+            end = len(data) if chunk_size in (0, 0xFFFFFFFF) else min(len(data), body + chunk_size)
+            payload = view[body:end]
+            break
+        offset = body + chunk_size + (chunk_size & 1) # Chunks are word-aligned
+    if fmt is None or payload is None:
+        raise ValueError("WAV file is missing its fmt or data chunk.")
+    if not fmt[2]:
+        raise ValueError("WAV file has a sample rate of 0.")
+    if not len(payload):
+        raise ValueError("WAV file has no audio data.")
+    return fmt + (payload,)
+
+
+def _pcm_to_float32(payload, format_tag, bits):
+    if format_tag == WAVE_FORMAT_PCM:
+        if bits == 16:
+            return np.frombuffer(payload, dtype="<i2", count=len(payload) // 2).astype(np.float32) / 32768.0
+        if bits == 32:
+            return np.frombuffer(payload, dtype="<i4", count=len(payload) // 4).astype(np.float32) / 2147483648.0
+        if bits == 8:
+            return (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        if bits == 24:
+            raw = np.frombuffer(payload, dtype=np.uint8, count=len(payload) // 3 * 3).reshape(-1, 3)
+            # Place the 3 bytes in the top of an int32 so the sign bit lands correctly.
+            as_int32 = (raw[:, 0].astype(np.int32) << 8) | (raw[:, 1].astype(np.int32) << 16) | (raw[:, 2].astype(np.int32) << 24)
+            return as_int32.astype(np.float32) / 2147483648.0
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        if bits == 32:
+            return np.frombuffer(payload, dtype="<f4", count=len(payload) // 4).astype(np.float32)
+        if bits == 64:
+            return np.frombuffer(payload, dtype="<f8", count=len(payload) // 8).astype(np.float32)
+    return None
+
+
+def _lowpass_polyphase(up, down):
+    """
+    Kaiser-windowed sinc low-pass for resampling by up/down, split into its `up` phases.
+    Returns (filters, delay): row p holds the taps of phase p, ordered to match a window
+    of input samples oldest first, and delay is the filter's center on the upsampled grid.
+    """
+    ratio = max(up, down)
+    delay = RESAMPLE_ZERO_CROSSINGS * ratio
+    offsets = np.arange(-delay, delay + 1, dtype=np.float64)
+    cutoff = RESAMPLE_ROLLOFF / (2 * ratio) # Cycles per sample at the upsampled rate
+    taps = 2 * cutoff * np.sinc(2 * cutoff * offsets) * np.kaiser(len(offsets), RESAMPLE_KAISER_BETA) * up
+    n_taps = -(-len(taps) // up)
+    phases = np.zeros(n_taps * up)
+    phases[:len(taps)] = taps
+    return np.ascontiguousarray(phases.reshape(n_taps, up).T[:, ::-1], dtype=np.float32), delay
+
+
+def resample(audio, source_rate, target_rate=SAMPLE_RATE):
+    """
+    Polyphase resampling to target_rate by the reduced ratio up/down. The Kaiser-windowed
+    sinc low-pass is flat to about 85% of the lower Nyquist frequency and attenuates
+    everything above that Nyquist frequency by more than 90 dB, so nothing folds back into
+    the speech band. Each output sample is one dot product over a few dozen input samples,
+    computed phase by phase in blocks, so memory stays bounded for long recordings.
+    """
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    divisor = math.gcd(int(source_rate), int(target_rate))
+    up, down = int(target_rate) // divisor, int(source_rate) // divisor
+    filters, delay = _lowpass_polyphase(up, down)
+    n_taps = filters.shape[1]
+    padded = np.pad(np.asarray(audio, dtype=np.float32), (n_taps, n_taps + delay // up + 1))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, n_taps)
+
+    n_out = len(audio) * up // down
+    out = np.empty(n_out, dtype=np.float32)
+    for first in range(min(up, n_out)):
+        # Outputs first, first + up, ... share a filter phase and step `down` input samples apart
+        position = first * down + delay # On the upsampled grid
+        phase_out = out[first::up]
+        steps = np.arange(RESAMPLE_BLOCK, dtype=np.int64) * down
+        for start in range(0, len(phase_out), RESAMPLE_BLOCK):
+            count = min(RESAMPLE_BLOCK, len(phase_out) - start)
+            rows = position // up + 1 + start * down + steps[:count]
+            phase_out[start:start + count] = windows[rows] @ filters[position % up]
+    return out
+
+
+def decode_wav_bytes(data: bytes):
+    """
+    Decodes PCM (8/16/24/32-bit) or IEEE-float WAV bytes into float32 16 kHz mono.
+    Returns None if the WAV uses an encoding this fast path does not handle.
+    """
+    format_tag, channels, sample_rate, bits, payload = _parse_wav(data)
+    samples = _pcm_to_float32(payload, format_tag, bits)
+    if samples is None or channels < 1:
+        return None
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return resample(samples, sample_rate)
+
+
+def decode_with_ffmpeg(data: bytes):
+    """
+    Decodes any ffmpeg-supported format by piping the bytes through ffmpeg (stdin to
+    stdout), with the same output settings as whisper.load_audio. Containers that need
+    seeking (e.g. MP4 with the index at the end) cannot be read from a pipe; those fall
+    back to a temporary file.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0",
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1"]
+    process = subprocess.run(cmd, input=data, capture_output=True)
+    if process.returncode == 0 and process.stdout:
+        return np.frombuffer(process.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+    logger.warning("ffmpeg could not decode the upload from a pipe (%s); retrying via a temporary file.", process.stderr.decode(errors='replace')[-200:].strip())
+    fd, temp_path = tempfile.mkstemp(suffix=".audio")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        import whisper
+        return whisper.load_audio(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def decode_audio_bytes(data: bytes):
+    """
+    Decodes an uploaded recording into float32 16 kHz mono samples for Whisper. Raises
+    AppError(400) for a corrupt or truncated WAV file, TranscriptionError otherwise.
+    """
+    try:
+        if is_wav(data):
+            try:
+                samples = decode_wav_bytes(data)
+            except (ValueError, struct.error) as e:
+                logger.warning("Rejected corrupt WAV upload: %s", e)
+                raise AppError(f"Uploaded WAV file is corrupt or truncated: {e}", status_code=400)
+            if samples is not None:
+                logger.debug("Decoded WAV upload natively: %.1fs of audio.", len(samples) / SAMPLE_RATE)
+                return samples
+            logger.debug("WAV upload uses an encoding without a native fast path; using ffmpeg.")
+        return decode_with_ffmpeg(data)
+    except AppError:
+        raise
+    except Exception as e:
+        logger.error("Could not decode uploaded audio: %s", e, exc_info=True)
+        raise TranscriptionError(f"Could not decode uploaded audio: {e}")
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+import itertools
+
+from utils.logger import logger, log_context
+from utils.error_handlers import AppError, TranscriptionError
+from services.model_registry import model_registry
+from services.admission import transcription_admission, check_audio_duration
+from services.audio_chunking import SAMPLE_RATE
+from services.storage_service import index_meeting
+from utils.metrics import stage_timer, record_transcription
+from services.pipeline import run_insights_stage_async
+from services.result_cache import transcript_cache, hash_file, make_key
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        BATCH_DECODE_SIZE as DEFAULT_BATCH_DECODE_SIZE,
+        BATCH_GEMINI_WORKERS as DEFAULT_BATCH_GEMINI_WORKERS,
+        BATCH_MAX_ITEMS as DEFAULT_BATCH_MAX_ITEMS,
+        BATCH_MANIFEST_ROOT as DEFAULT_BATCH_MANIFEST_ROOT,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default batch settings.")
+    DEFAULT_BATCH_DECODE_SIZE = 8
+    DEFAULT_BATCH_GEMINI_WORKERS = 4
+    DEFAULT_BATCH_MAX_ITEMS = 500
+    DEFAULT_BATCH_MANIFEST_ROOT = None
+
+BATCH_DECODE_SIZE = int(os.environ.get("BATCH_DECODE_SIZE", DEFAULT_BATCH_DECODE_SIZE))
+BATCH_GEMINI_WORKERS = int(os.environ.get("BATCH_GEMINI_WORKERS", DEFAULT_BATCH_GEMINI_WORKERS))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
+# Manifests of local paths are only accepted when this is set, and only for files under it.
+BATCH_MANIFEST_ROOT = os.environ.get("BATCH_MANIFEST_ROOT", DEFAULT_BATCH_MANIFEST_ROOT)
+
+
+def resolve_manifest_path(path):
+    """Returns the absolute path for a manifest entry, refusing anything outside BATCH_MANIFEST_ROOT."""
+    if not BATCH_MANIFEST_ROOT:
+        raise AppError("Manifest ingestion is disabled. Set BATCH_MANIFEST_ROOT to enable it.", status_code=400)
+    root = os.path.realpath(BATCH_MANIFEST_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise AppError(f"Manifest path '{path}' is outside BATCH_MANIFEST_ROOT.", status_code=400)
+    return resolved
+
+
+def _windows(audio_paths, model, results, reports):
+    """
+    Yields (item index, window index, mel) for every 30-second window, one file at a time,
+    so only the current file's samples are held in memory. Files that cannot be decoded
+    or exceed MAX_AUDIO_SECONDS get their error in results instead.
+    """
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    for index, path in enumerate(audio_paths):
+        try:
+            with stage_timer("decode") as decode:
+                audio = whisper.load_audio(path)
+            check_audio_duration(len(audio) / SAMPLE_RATE)
+        except AppError as e:
+            results[index] = e
+            continue
+        except Exception as e:
+            logger.error("Could not decode batch item %s: %s", path, e, exc_info=True)
+            results[index] = TranscriptionError(f"Could not decode audio file {os.path.basename(path)}: {e}")
+            continue
+        reports[index] = {
+            "audioSeconds": round(len(audio) / SAMPLE_RATE, 3),
+            "timings": {"decodeSeconds": round(decode.seconds, 3), "queueWaitSeconds": 0.0, "transcribeSeconds": 0.0},
+        }
+        for window_index, start in enumerate(range(0, max(len(audio), 1), N_SAMPLES)):
+            segment = whisper.pad_or_trim(audio[start:start + N_SAMPLES])
+            yield index, window_index, whisper.log_mel_spectrogram(segment, n_mels=model.dims.n_mels)
+
+
+def transcribe_batch(audio_paths, model_name=None, reports=None):
+    """
+    Transcribes several files with batched Whisper decoding.
+
+    Every file is cut into fixed 30-second windows (Whisper's native input length) and the
+    log-mel spectrograms are decoded BATCH_DECODE_SIZE at a time, so one encoder/decoder
+    forward pass serves several inputs. Windows are built as the decode groups need them,
+    so memory stays at one file plus one group. Returns a list with a transcript string or
+    the exception raised for each path, in input order. If reports is a list, it receives
+    each decoded file's audioSeconds and timings (its share of each group it was part of).
+    """
+    import torch
+    import whisper
+
+    model_name, model = model_registry.get_whisper(model_name)
+    options = whisper.DecodingOptions(fp16=model.device.type == "cuda", without_timestamps=True)
+
+    results = [None] * len(audio_paths)
+    reports = reports if reports is not None else [None] * len(audio_paths)
+    window_texts = [{} for _ in audio_paths]
+    windows = _windows(audio_paths, model, results, reports)
+
+    logger.info("Batched transcription: %s files, batch size %s, model '%s'.", len(audio_paths), BATCH_DECODE_SIZE, model_name)
+    group_index = 0
+    while True:
+        batch = list(itertools.islice(windows, BATCH_DECODE_SIZE))
+        if not batch:
+            break
+        mel = torch.stack([mel for _, _, mel in batch]).to(model.device)
+        try:
+            # One slot per forward pass, so single uploads can interleave with a long batch.
+            with transcription_admission.slot(f"batch window group {group_index}") as waited, \
+                    stage_timer("batch_decode", model=model_name) as decode:
+                decoded = whisper.decode(model, mel, options)
+        except Exception as e:
+            # Only the files in this group fail; transcripts finished so far are kept.
+            logger.error("Batched Whisper decode failed: %s", e, exc_info=True)
+            error = e if isinstance(e, AppError) else TranscriptionError(f"Whisper transcription failed: {e}")
+            for index, _, _ in batch:
+                results[index] = error
+            continue
+        finally:
+            group_index += 1
+        for (index, window_index, _), result in zip(batch, decoded):
+            window_texts[index][window_index] = result.text
+            timings = reports[index]["timings"]
+            timings["queueWaitSeconds"] = round(timings["queueWaitSeconds"] + waited / len(batch), 3)
+            timings["transcribeSeconds"] = round(timings["transcribeSeconds"] + decode.seconds / len(batch), 3)
+
+    for index, texts in enumerate(window_texts):
+        if results[index] is None:
+            results[index] = " ".join(texts[i].strip() for i in sorted(texts) if texts[i].strip())
+    return results
+
+
+def _transcript_cache_key(audio_hash, model_name):
+    # Batch decoding (hard 30-second windows, no timestamps, conditioning, temperature
+    # fallback or voice-activity trimming) gives different text than a single upload.
+    return make_key(audio_hash, model_name, "batch")
+
+
+def run_batch(items, whisper_model=None):
+    """
+    Runs the pipeline for a batch of recordings.
+
+    items is a list of dicts with "name", "path" and "meetingId". Transcripts come from the
+    result cache when possible; the rest are transcribed together with transcribe_batch.
+    Insight generation and saving then run as asyncio tasks, BATCH_GEMINI_WORKERS at a time.
+    Returns a summary with per-item status and throughput.
+    """
+    start = time.perf_counter()
+    statuses = [{"name": item["name"], "meetingId": item["meetingId"], "status": "pending"} for item in items]
+
+    transcripts = [None] * len(items)
+    cache_keys = [None] * len(items)
+    model_name = model_registry.resolve_whisper_name(whisper_model)
+    for index, item in enumerate(items):
+        try:
+            cache_keys[index] = _transcript_cache_key(hash_file(item["path"]), model_name)
+        except OSError as e:
+            statuses[index].update(status="error", message=f"Could not read {item['name']}: {e}")
+            continue
+        transcripts[index] = transcript_cache.get(cache_keys[index])
+        statuses[index]["cache"] = {"transcript": "hit" if transcripts[index] is not None else "miss"}
+        if transcripts[index] is not None:
+            index_meeting(item["meetingId"], whisperModel=model_name)
+
+    to_transcribe = [i for i, item in enumerate(items) if transcripts[i] is None and statuses[i]["status"] == "pending"]
+    if to_transcribe:
+        transcribe_start = time.perf_counter()
+        reports = [None] * len(to_transcribe)
+        # Batches are bulk work: their decode groups queue behind interactive requests instead of being rejected.
+        with transcription_admission.background():
+            results = transcribe_batch([items[i]["path"] for i in to_transcribe], whisper_model, reports)
+        for index, result, report in zip(to_transcribe, results, reports):
+            if isinstance(result, Exception):
+                statuses[index].update(status="error", message=getattr(result, "message", str(result)))
+                index_meeting(items[index]["meetingId"], status="failed")
+            else:
+                transcripts[index] = result
+                transcript_cache.put(cache_keys[index], result)
+                record_transcription(model_name, report["audioSeconds"], report["timings"]["transcribeSeconds"])
+                index_meeting(items[index]["meetingId"], whisperModel=model_name, **report)
+        logger.info("Batch transcription of %s files took %.2fs.", len(to_transcribe), time.perf_counter() - transcribe_start)
+
+    async def insights_for(index, workers):
+        async with workers:
+            with log_context(items[index]["meetingId"]):
+                await _insights_for(index)
+
+    async def _insights_for(index):
+        try:
+            result = await run_insights_stage_async(transcripts[index], items[index]["meetingId"])
+            statuses[index].update(
+                status="success",
+                transcriptPath=result["transcriptPath"],
+                insightsPath=result["insightsPath"],
+            )
+            statuses[index]["cache"].update(result["cache"])
+        except AppError as e:
+            statuses[index].update(status="error", message=e.message)
+        except Exception as e:
+            logger.error("Unexpected error in batch item %s: %s", items[index]['name'], e, exc_info=True)
+            statuses[index].update(status="error", message="An unexpected server error occurred.")
+
+    async def all_insights(ready):
+        workers = asyncio.Semaphore(BATCH_GEMINI_WORKERS) # Created inside the loop it belongs to
+        await asyncio.gather(*(insights_for(index, workers) for index in ready))
+
+    ready = [i for i in range(len(items)) if transcripts[i] is not None and statuses[i]["status"] == "pending"]
+    if ready:
+        asyncio.run(all_insights(ready))
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for s in statuses if s["status"] == "success")
+    logger.info("Batch finished: %s/%s succeeded in %.2fs.", succeeded, len(items), elapsed)
+    return {
+        "status": "success" if succeeded == len(items) else ("partial" if succeeded else "error"),
+        "items": statuses,
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "elapsedSeconds": round(elapsed, 3),
+        "filesPerMinute": round(len(items) / elapsed * 60, 2) if elapsed else None,
+    }
@@ -1,124 +1,172 @@
-import google.generativeai as genai
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 # Attempt to import config, handle if it's not found
 try:
-    from config import DEFAULT_GEMINI_MODEL, GEMINI_API_KEY as CONFIG_GEMINI_API_KEY
+    from config import INSIGHTS_TOKEN_BUDGET as DEFAULT_INSIGHTS_TOKEN_BUDGET, INSIGHTS_MAP_WORKERS as DEFAULT_INSIGHTS_MAP_WORKERS
 except ImportError:
-    logger.warning("config.py not found, using default GEMINI_MODEL and no API key from config.")
-    DEFAULT_GEMINI_MODEL = "models/gemini-1.5-flash-latest"
-    CONFIG_GEMINI_API_KEY = None
+    DEFAULT_INSIGHTS_TOKEN_BUDGET = 30000
+    DEFAULT_INSIGHTS_MAP_WORKERS = 4
 
 # Import custom error and logger
 from utils.error_handlers import GeminiError
 from utils.logger import logger
-
-# --- Gemini Setup ---
-# Prioritize environment variable for API key, then config file
-api_key = os.environ.get("GEMINI_API_KEY")
-if not api_key:
-    logger.info("GEMINI_API_KEY not found in environment variables. Trying config.py.")
-    api_key = CONFIG_GEMINI_API_KEY
-    if api_key:
-        logger.info("Loaded GEMINI_API_KEY from config.py.")
-
-if not api_key:
-    logger.error("GEMINI_API_KEY not found in environment variables or config.py. This is a critical setup error.")
-    # This is a critical setup error, so raise EnvironmentError directly or a specific AppError.
-    raise GeminiError("GEMINI_API_KEY not found in environment variables or config.py. Please set it.", status_code=500)
-
-try:
-    genai.configure(api_key=api_key)
-    logger.info("Gemini API configured successfully.")
-except Exception as e:
-    logger.error(f"Failed to configure Gemini API with the provided key: {e}", exc_info=True)
-    raise GeminiError(f"Gemini API configuration failed: {e}", status_code=500)
-
-
-# Use environment variable for model name if set, otherwise use config default
-GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL", DEFAULT_GEMINI_MODEL)
-logger.info(f"Initializing Gemini model: {GEMINI_MODEL_NAME}")
-gemini_model = None
-try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-    logger.info(f"Gemini model '{GEMINI_MODEL_NAME}' loaded successfully.")
-except Exception as e:
-    logger.error(f"Failed to load Gemini model '{GEMINI_MODEL_NAME}': {e}. Check API key and model name.", exc_info=True)
-    # Fallback could be attempted if applicable, or just raise
-    # For now, if the primary model fails, we raise an error.
-    raise GeminiError(f"Could not initialize Gemini model '{GEMINI_MODEL_NAME}': {e}", status_code=500)
+from utils.metrics import GEMINI_TOKENS
+from services import model_registry as model_registry_module
+from services.insights_client import insights_client
+from services.local_insights import record_gemini_latency
+from services.prompts import (
+    PROMPT_VERSION, estimate_tokens, transcript_token_budget, split_transcript,
+    build_insights_prompt, build_map_prompt, build_reduce_prompt
+)
+
+# Maximum estimated prompt tokens for a single insights call; longer transcripts use map-reduce
+INSIGHTS_TOKEN_BUDGET = int(os.environ.get("INSIGHTS_TOKEN_BUDGET", DEFAULT_INSIGHTS_TOKEN_BUDGET))
+INSIGHTS_MAP_WORKERS = int(os.environ.get("INSIGHTS_MAP_WORKERS", DEFAULT_INSIGHTS_MAP_WORKERS))
+
+# The Gemini model itself is configured on first use by the shared model registry.
+GEMINI_MODEL_NAME = model_registry_module.GEMINI_MODEL_NAME
+
+
+def _log_usage(response, label: str, estimated_prompt_tokens: int):
+    """Logs the token counts Gemini reports for a call, for per-meeting cost tracking."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        logger.info("Gemini call [%s]: ~%s prompt tokens (estimated; no usage metadata returned).", label, estimated_prompt_tokens)
+        GEMINI_TOKENS.inc(estimated_prompt_tokens, GEMINI_MODEL_NAME, "prompt")
+        return {"promptTokens": estimated_prompt_tokens, "outputTokens": None}
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    GEMINI_TOKENS.inc(prompt_tokens or 0, GEMINI_MODEL_NAME, "prompt")
+    GEMINI_TOKENS.inc(output_tokens or 0, GEMINI_MODEL_NAME, "output")
+    logger.info("Gemini call [%s]: prompt_tokens=%s output_tokens=%s total_tokens=%s (estimated prompt: %s).",
+                label, prompt_tokens, output_tokens, getattr(usage, 'total_token_count', None), estimated_prompt_tokens)
+    return {"promptTokens": prompt_tokens, "outputTokens": output_tokens}
+
+
+def _response_text(response, label: str, estimated_prompt_tokens: int) -> tuple:
+    """Returns (text, usage) for a finished Gemini response."""
+    try:
+        text = response.text
+    except Exception as e: # .text raises when the response was blocked or empty
+        logger.error("Gemini call [%s] returned no usable text: %s", label, e, exc_info=True)
+        raise GeminiError(f"Gemini API call failed: {e}")
+    return text, _log_usage(response, label, estimated_prompt_tokens)
 
 
-def generate_insights(transcript: str) -> str:
-    """
-    Generates insights from a transcript using the configured Gemini model.
-    """
-    if not gemini_model:
-        logger.error("Gemini model is not available or failed to load prior to insight generation.")
-        raise GeminiError("Gemini model is not available or failed to load.", status_code=500)
+def _generate(prompt: str, label: str) -> tuple:
+    """Runs one Gemini call through the shared insights client and returns (text, usage)."""
+    return _response_text(insights_client.generate(prompt, label), label, estimate_tokens(prompt))
 
-    logger.info(f"Generating insights using Gemini model: {GEMINI_MODEL_NAME} for transcript of length {len(transcript)} chars.")
-    logger.debug(f"Transcript snippet for Gemini: {transcript[:100]}...")
 
-    prompt = f"""
-Here is a meeting transcript:
-{transcript}
+async def _generate_async(prompt: str, label: str) -> tuple:
+    """Async variant of _generate()."""
+    return _response_text(await insights_client.generate_async(prompt, label), label, estimate_tokens(prompt))
 
-Provide:
-1. A short summary.
-2. Action items with responsible people.
-3. Sentiment of the overall meeting.
-4. Key insights or decisions made during the meeting.
-5. Number of participants.
-6. Any follow-up questions or topics that need further discussion.
-Please ensure the response is concise and structured.
 
-Example response format:
-Generating insights from Gemini...
+def _log_map_usage(results: list):
+    total_prompt = sum(usage["promptTokens"] or 0 for _, usage in results)
+    total_output = sum(usage["outputTokens"] or 0 for _, usage in results)
+    logger.info("Map step used %s Gemini calls: %s prompt tokens, %s output tokens.", len(results), total_prompt, total_output)
 
-✅ Gemini Output:
 
-**1. Summary:** The meeting discussed YouTube's content recommendation algorithm.  The speaker argues that the algorithm reflects current global trends and individual user interests, aiming for diversity while prioritizing relevance.  A disagreement exists regarding the algorithm's transparency and control over content selection.
+def _map_transcript(transcript: str, part_token_budget: int) -> list:
+    """Map step: summarizes each part of an over-budget transcript concurrently; returns the notes."""
+    parts = split_transcript(transcript, part_token_budget)
+    logger.info("Transcript exceeds token budget; using map-reduce over %s parts.", len(parts))
 
-**2. Action Items:** None explicitly stated in the transcript.
+    # The insights client bounds how many of these calls are actually in flight.
+    with ThreadPoolExecutor(max_workers=min(INSIGHTS_MAP_WORKERS, len(parts)), thread_name_prefix="gemini-map") as executor:
+        futures = [
+            executor.submit(_generate, build_map_prompt(part, i, len(parts)), f"map {i}/{len(parts)}")
+            for i, part in enumerate(parts, start=1)
+        ]
+        results = [future.result() for future in futures]
+    _log_map_usage(results)
+    return [text for text, _ in results]
 
-**3. Sentiment:**  The overall sentiment is a mix of explanatory and slightly defensive regarding the YouTube algorithm.  There's an underlying tension between the algorithm's design goals and concerns about content control and transparency.
 
-**4. Key Insights/Decisions:** No concrete decisions were made. The key insight is the speaker's perspective on the algorithm's design philosophy: prioritizing relevance and reflecting real-world trends over strict content selection.
+def _generate_map_reduce(transcript: str, part_token_budget: int) -> str:
+    """
+    Generates insights for a transcript that does not fit the token budget: each part is
+    summarized concurrently (map), then one call merges the partial notes (reduce).
+    """
+    notes = _map_transcript(transcript, part_token_budget)
+    insights, _ = _generate(build_reduce_prompt(notes), "reduce")
+    return insights
 
-**5. Number of Participants:**  The transcript indicates at least two participants,  one speaking and at least one listening ("you can choose an additive...").  The exact number is unknown.
 
+def _stream(prompt: str, label: str):
+    """Runs one streaming Gemini call and yields text chunks as they arrive."""
+    estimated = estimate_tokens(prompt)
+    response = yield from insights_client.stream(prompt, label)
+    # Streaming responses carry usage metadata once fully consumed.
+    _log_usage(response, label, estimated)
 
-**6. Follow-up Questions/Topics:**
-* Clarification on the "additive" mentioned. What is it, and how does it relate to content creators seeing what should be shown?
-* Deeper discussion on balancing diversity and relevance in the algorithm.
-* Addressing concerns about the algorithm's lack of transparency and control for content creators.
-* Exploring methods to improve the algorithm's responsiveness to user feedback.
 
+def generate_insights_stream(transcript: str):
+    """
+    Streaming variant of generate_insights: yields the insights text in chunks as Gemini
+    generates them. For transcripts over the token budget, the map step runs first and
+    only the final reduce call is streamed.
+    """
+    logger.info("Streaming insights using Gemini model: %s for transcript of length %s chars.", GEMINI_MODEL_NAME, len(transcript))
 
-Processed audio and generated insights.
-**1. Summary:** The meeting discussed YouTube's content recommendation algorithm.  The speaker argues that the algorithm reflects current global trends and individual user interests, aiming for diversity while prioritizing relevance.  A disagreement exists regarding the algorithm's transparency and control over content selection.
+    start = time.perf_counter()
+    transcript_budget = transcript_token_budget(INSIGHTS_TOKEN_BUDGET)
+    if estimate_tokens(transcript) > transcript_budget:
+        notes = _map_transcript(transcript, transcript_budget)
+        yield from _stream(build_reduce_prompt(notes), "reduce (streamed)")
+    else:
+        yield from _stream(build_insights_prompt(transcript), "insights (streamed)")
+    record_gemini_latency(time.perf_counter() - start)
 
-**2. Action Items:** None explicitly stated in the transcript.
 
-**3. Sentiment:**  The overall sentiment is a mix of explanatory and slightly defensive regarding the YouTube algorithm.  There's an underlying tension between the algorithm's design goals and concerns about content control and transparency.
+def generate_insights(transcript: str) -> str:
+    """
+    Generates insights from a transcript using the configured Gemini model.
+    Transcripts larger than INSIGHTS_TOKEN_BUDGET are processed with map-reduce.
+    """
+    logger.info("Generating insights using Gemini model: %s for transcript of length %s chars.", GEMINI_MODEL_NAME, len(transcript))
+    logger.debug("Transcript snippet for Gemini: %s...", transcript[:100])
 
-**4. Key Insights/Decisions:** No concrete decisions were made. The key insight is the speaker's perspective on the algorithm's design philosophy: prioritizing relevance and reflecting real-world trends over strict content selection.
+    start = time.perf_counter()
+    transcript_budget = transcript_token_budget(INSIGHTS_TOKEN_BUDGET)
+    if estimate_tokens(transcript) > transcript_budget:
+        insights = _generate_map_reduce(transcript, transcript_budget)
+    else:
+        insights, _ = _generate(build_insights_prompt(transcript), "insights")
+    record_gemini_latency(time.perf_counter() - start) # Baseline for the latency the local engine saves
 
-**5. Number of Participants:**  The transcript indicates at least two participants,  one speaking and at least one listening ("you can choose an additive...").  The exact number is unknown.
+    logger.info("Gemini insights generated successfully.")
+    logger.debug("Gemini response snippet: %s...", insights[:100])
+    return insights
 
-**6. Follow-up Questions/Topics:**
-* Clarification on the "additive" mentioned. What is it, and how does it relate to content creators seeing what should be shown?
-* Deeper discussion on balancing diversity and relevance in the algorithm.
-* Addressing concerns about the algorithm's lack of transparency and control for content creators.
-* Exploring methods to improve the algorithm's responsiveness to user feedback.
 
-"""
-    try:
-        response = gemini_model.generate_content(prompt)
-        logger.info("Gemini insights generated successfully.")
-        logger.debug(f"Gemini response snippet: {response.text[:100]}...")
-        return response.text
-    except Exception as e:
-        logger.error(f"Error during Gemini insight generation: {e}", exc_info=True)
-        raise GeminiError(f"Gemini API call failed: {e}") # status_code defaults to 500
+async def generate_insights_async(transcript: str) -> str:
+    """
+    Async variant of generate_insights for asyncio callers such as batch jobs. Map calls
+    for over-budget transcripts are awaited together; the insights client bounds how many
+    are in flight.
+    """
+    logger.info("Generating insights using Gemini model: %s for transcript of length %s chars.", GEMINI_MODEL_NAME, len(transcript))
+
+    start = time.perf_counter()
+    transcript_budget = transcript_token_budget(INSIGHTS_TOKEN_BUDGET)
+    if estimate_tokens(transcript) > transcript_budget:
+        parts = split_transcript(transcript, transcript_budget)
+        logger.info("Transcript exceeds token budget; using map-reduce over %s parts.", len(parts))
+        results = await asyncio.gather(*(
+            _generate_async(build_map_prompt(part, i, len(parts)), f"map {i}/{len(parts)}")
+            for i, part in enumerate(parts, start=1)
+        ))
+        _log_map_usage(results)
+        insights, _ = await _generate_async(build_reduce_prompt([text for text, _ in results]), "reduce")
+    else:
+        insights, _ = await _generate_async(build_insights_prompt(transcript), "insights")
+    record_gemini_latency(time.perf_counter() - start)
+
+    logger.info("Gemini insights generated successfully.")
+    return insights
@@ -0,0 +1,198 @@
+"""
+Local stand-in for the Gemini API, for offline benchmarks and load tests.
+
+Run the server with:
+    python -m services.gemini_stub --port 8089 --latency 0.5 --throttle-rate 0.2
+
+and point the app at it with GEMINI_STUB_URL=http://127.0.0.1:8089. The model registry
+then hands out a StubGenerativeModel instead of configuring the real SDK. Responses are
+deterministic for a given prompt, so cached and uncached runs can be compared.
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CHARS_PER_TOKEN = 4
+
+
+class StubAPIError(Exception):
+    """Error returned by the stub server; .code carries the HTTP status like google.api_core errors."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+class StubUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = StubUsage(usage["promptTokens"], usage["outputTokens"])
+
+
+class StubStreamResponse:
+    """Iterable of per-section chunks, like the SDK's streaming response."""
+
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = StubUsage(usage["promptTokens"], usage["outputTokens"])
+        self._chunks = [StubResponse(part, {"promptTokens": 0, "outputTokens": 0}) for part in text.split("\n\n")]
+        for chunk in self._chunks[:-1]:
+            chunk.text += "\n\n"
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class StubGenerativeModel:
+    """
+    Minimal GenerativeModel look-alike that talks to the stub server. Keeps one
+    keep-alive HTTP connection per thread, mirroring the SDK's connection reuse.
+    """
+
+    def __init__(self, base_url, model_name="stub"):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.model_name = model_name
+        self._local = threading.local()
+
+    def _connection(self, timeout):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            self._local.connection = connection
+        connection.timeout = timeout
+        return connection
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout", 60)
+        body = json.dumps({"prompt": prompt, "model": self.model_name})
+        connection = self._connection(timeout)
+        try:
+            connection.request("POST", "/generate", body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            self._local.connection = None
+            if isinstance(e, OSError) and "timed out" in str(e):
+                raise TimeoutError(str(e))
+            raise ConnectionError(str(e))
+        if response.status != 200:
+            raise StubAPIError(response.status, payload.decode("utf-8", "replace"))
+        data = json.loads(payload)
+        if kwargs.get("stream"):
+            return StubStreamResponse(data["text"], data["usage"])
+        return StubResponse(data["text"], data["usage"])
+
+
+def stub_insights_text(prompt):
+    """Builds a deterministic six-section insights answer from the prompt."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    words = [w for w in prompt.split() if w.isalpha()][:12]
+    topic = " ".join(words) or "the meeting"
+    return (
+        f"**1. Summary:** Stub summary about {topic}.\n\n"
+        f"**2. Action Items:** None explicitly stated in the transcript.\n\n"
+        f"**3. Sentiment:** Neutral.\n\n"
+        f"**4. Key Insights/Decisions:** Stub insight {digest[:8]}.\n\n"
+        f"**5. Number of Participants:** {int(digest[:2], 16) % 5 + 1}\n\n"
+        f"**6. Follow-up Questions/Topics:**\n* Stub follow-up {digest[8:16]}.\n"
+    )
+
+
+def make_handler(latency, per_token_latency, throttle_rate, error_rate, max_concurrency, seed):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    in_flight = [0]
+    in_flight_lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive, so clients can reuse connections
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = request.get("prompt", "")
+
+            with rng_lock:
+                roll = rng.random()
+            with in_flight_lock:
+                over_capacity = max_concurrency and in_flight[0] >= max_concurrency
+                if not over_capacity:
+                    in_flight[0] += 1
+            if over_capacity:
+                return self._reply(429, {"error": "Resource has been exhausted (stub concurrency limit)."})
+            try:
+                if roll < throttle_rate:
+                    return self._reply(429, {"error": "Resource has been exhausted (stub throttling)."})
+                if roll < throttle_rate + error_rate:
+                    return self._reply(503, {"error": "Service unavailable (stub)."})
+                text = stub_insights_text(prompt)
+                prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+                output_tokens = len(text) // CHARS_PER_TOKEN
+                time.sleep(latency + output_tokens * per_token_latency)
+                self._reply(200, {"text": text, "usage": {"promptTokens": prompt_tokens, "outputTokens": output_tokens}})
+            finally:
+                with in_flight_lock:
+                    in_flight[0] -= 1
+
+    return StubHandler
+
+
+def serve(port=8089, latency=0.5, per_token_latency=0.0, throttle_rate=0.0, error_rate=0.0, max_concurrency=0, seed=0):
+    """Starts the stub server in a background thread and returns it (call .shutdown() to stop)."""
+    handler = make_handler(latency, per_token_latency, throttle_rate, error_rate, max_concurrency, seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fixed seconds per response")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="Extra seconds per output token")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Concurrent requests before 429s (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.per_token_latency, args.throttle_rate, args.error_rate, args.max_concurrency, args.seed)
+    print(f"Gemini stub listening on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import time
+import random
+import asyncio
+import threading
+
+from utils.logger import logger
+from utils.metrics import stage_timer
+from utils.error_handlers import GeminiError
+from services.model_registry import model_registry
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        GEMINI_RATE_LIMIT_PER_MINUTE as DEFAULT_GEMINI_RATE_LIMIT_PER_MINUTE,
+        GEMINI_BURST as DEFAULT_GEMINI_BURST,
+        GEMINI_MAX_CONCURRENCY as DEFAULT_GEMINI_MAX_CONCURRENCY,
+        GEMINI_MAX_RETRIES as DEFAULT_GEMINI_MAX_RETRIES,
+        GEMINI_BACKOFF_BASE_SECONDS as DEFAULT_GEMINI_BACKOFF_BASE_SECONDS,
+        GEMINI_BACKOFF_MAX_SECONDS as DEFAULT_GEMINI_BACKOFF_MAX_SECONDS,
+        GEMINI_TIMEOUT_SECONDS as DEFAULT_GEMINI_TIMEOUT_SECONDS,
+        GEMINI_DEADLINE_SECONDS as DEFAULT_GEMINI_DEADLINE_SECONDS,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default Gemini client settings.")
+    DEFAULT_GEMINI_RATE_LIMIT_PER_MINUTE = 60
+    DEFAULT_GEMINI_BURST = 10
+    DEFAULT_GEMINI_MAX_CONCURRENCY = 8
+    DEFAULT_GEMINI_MAX_RETRIES = 4
+    DEFAULT_GEMINI_BACKOFF_BASE_SECONDS = 1.0
+    DEFAULT_GEMINI_BACKOFF_MAX_SECONDS = 30.0
+    DEFAULT_GEMINI_TIMEOUT_SECONDS = 120
+    DEFAULT_GEMINI_DEADLINE_SECONDS = 300
+
+GEMINI_RATE_LIMIT_PER_MINUTE = float(os.environ.get("GEMINI_RATE_LIMIT_PER_MINUTE", DEFAULT_GEMINI_RATE_LIMIT_PER_MINUTE))
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", DEFAULT_GEMINI_BURST))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", DEFAULT_GEMINI_MAX_CONCURRENCY))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", DEFAULT_GEMINI_MAX_RETRIES))
+GEMINI_BACKOFF_BASE_SECONDS = float(os.environ.get("GEMINI_BACKOFF_BASE_SECONDS", DEFAULT_GEMINI_BACKOFF_BASE_SECONDS))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.environ.get("GEMINI_BACKOFF_MAX_SECONDS", DEFAULT_GEMINI_BACKOFF_MAX_SECONDS))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", DEFAULT_GEMINI_TIMEOUT_SECONDS))
+GEMINI_DEADLINE_SECONDS = float(os.environ.get("GEMINI_DEADLINE_SECONDS", DEFAULT_GEMINI_DEADLINE_SECONDS))
+
+# HTTP status codes worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """
+    Returns True for errors that a later attempt may not hit: 429/5xx responses from the
+    Gemini SDK (google.api_core exceptions carry the HTTP status in .code) or the local
+    stub, and network-level timeouts or connection failures.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Blocks until a token is available. Returns False if deadline (monotonic) passes first."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class InsightsClient:
+    """
+    Shared client for all Gemini calls.
+
+    Every call goes through one GenerativeModel from the model registry, so the SDK's
+    underlying connection is reused. Calls are admitted by a token-bucket rate limiter and
+    a concurrency semaphore, run with a per-attempt timeout, and retried with exponential
+    backoff and full jitter on 429/5xx until GEMINI_DEADLINE_SECONDS is used up.
+    Streaming calls (stream()) hold their semaphore slot until the response is read to
+    the end or closed; asyncio callers use generate_async().
+    """
+
+    def __init__(self, model_getter=model_registry.get_gemini,
+                 rate_per_minute=GEMINI_RATE_LIMIT_PER_MINUTE, burst=GEMINI_BURST,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY, max_retries=GEMINI_MAX_RETRIES,
+                 backoff_base=GEMINI_BACKOFF_BASE_SECONDS, backoff_max=GEMINI_BACKOFF_MAX_SECONDS,
+                 timeout=GEMINI_TIMEOUT_SECONDS, deadline=GEMINI_DEADLINE_SECONDS):
+        self._model_getter = model_getter
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.deadline = deadline
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_delay(self, error, label, attempt, deadline):
+        """Returns the backoff before retrying a failed attempt, or raises GeminiError if it must not be retried."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            logger.error("Gemini call [%s] failed after %s attempt(s): %s", label, attempt + 1, error, exc_info=True)
+            raise GeminiError(f"Gemini API call failed: {error}")
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            logger.error("Gemini call [%s] out of time after %s attempt(s): %s", label, attempt + 1, error)
+            raise GeminiError(f"Gemini API call did not succeed within {self.deadline:.0f}s: {error}")
+        logger.warning("Gemini call [%s] attempt %s failed with a retryable error (%s); retrying in %.2fs.", label, attempt + 1, error, delay)
+        return delay
+
+    def _schedule(self, label, deadline):
+        """Waits for the rate limiter and returns the per-attempt timeout."""
+        if not self._bucket.acquire(deadline):
+            raise GeminiError(f"Gemini call [{label}] could not be scheduled within {self.deadline:.0f}s (rate limit).")
+        return min(self.timeout, max(deadline - time.monotonic(), 1))
+
+    def generate(self, prompt, label="insights", **kwargs):
+        """
+        Runs generate_content(prompt) with rate limiting, bounded concurrency and retries.
+        Extra kwargs are passed to generate_content; use stream() for streaming. Raises
+        GeminiError when the call fails permanently or the deadline runs out.
+        """
+        model = self._model_getter()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            timeout = self._schedule(label, deadline)
+            try:
+                with self._semaphore, stage_timer("gemini_call", model=getattr(model, "model_name", "")):
+                    return model.generate_content(prompt, request_options={"timeout": timeout}, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, label, attempt, deadline)
+            attempt += 1
+            time.sleep(delay)
+
+    async def generate_async(self, prompt, label="insights", **kwargs):
+        """
+        Async variant of generate() for asyncio callers such as batch jobs. The blocking call
+        runs in a worker thread, under the same rate limiter, semaphore and retries.
+        """
+        return await asyncio.to_thread(self.generate, prompt, label, **kwargs)
+
+    def stream(self, prompt, label="insights"):
+        """
+        Streaming variant of generate(): a generator that yields the response text chunk
+        by chunk and returns the response (for its usage metadata) once it is exhausted.
+        The semaphore slot and the gemini_call timer cover the whole read. An attempt is
+        retried only if it fails before its first chunk; after that, retrying would repeat
+        text the caller already has, so the error is raised as GeminiError.
+        """
+        model = self._model_getter()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            timeout = self._schedule(label, deadline)
+            started = False
+            try:
+                with self._semaphore, stage_timer("gemini_call", model=getattr(model, "model_name", "")):
+                    response = model.generate_content(prompt, stream=True, request_options={"timeout": timeout})
+                    for chunk in response:
+                        text = chunk.text # Raises when the response was blocked
+                        if text:
+                            started = True
+                            yield text
+                    return response
+            except Exception as e:
+                if started:
+                    logger.error("Gemini stream [%s] failed mid-response: %s", label, e, exc_info=True)
+                    raise GeminiError(f"Gemini API call failed: {e}")
+                delay = self._retry_delay(e, label, attempt, deadline)
+            attempt += 1
+            time.sleep(delay)
+
+
+insights_client = InsightsClient()
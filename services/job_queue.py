@@ -0,0 +1,165 @@
+import os
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import logger, log_context
+from utils.error_handlers import AppError, FileStorageError, OverloadedError
+from services.storage_service import save_job_status, load_job_status
+from services.admission import transcription_admission
+from utils.metrics import metrics
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        JOB_WORKERS as DEFAULT_JOB_WORKERS,
+        JOB_QUEUE_MAX as DEFAULT_JOB_QUEUE_MAX,
+        JOB_HISTORY_MAX as DEFAULT_JOB_HISTORY_MAX,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default JOB_WORKERS=2, JOB_QUEUE_MAX=16 and JOB_HISTORY_MAX=256.")
+    DEFAULT_JOB_WORKERS = 2
+    DEFAULT_JOB_QUEUE_MAX = 16
+    DEFAULT_JOB_HISTORY_MAX = 256
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", DEFAULT_JOB_WORKERS))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", DEFAULT_JOB_QUEUE_MAX))
+JOB_HISTORY_MAX = max(0, int(os.environ.get("JOB_HISTORY_MAX", DEFAULT_JOB_HISTORY_MAX)))
+
+# Job states, in the order a job moves through them
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class JobQueue:
+    """
+    Bounded in-process worker pool for meeting pipeline jobs.
+
+    Jobs are keyed by meeting_id (or batch id). Status is kept in memory for fast polling
+    and mirrored to a job record file through the storage service, so a status request
+    served by a different gunicorn worker can still answer it. Queued and running jobs
+    stay in memory; of the finished ones, only the max_history most recent are kept, and
+    older ones are read back from their record files.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_pending=JOB_QUEUE_MAX, max_history=JOB_HISTORY_MAX):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="neuronote-job")
+        self._jobs = {}
+        self._finished = OrderedDict() # meeting_id -> status record, least recently finished first
+        self._lock = threading.Lock()
+        self._pending = 0
+        logger.info("Job queue initialized with %s workers and capacity %s.", max_workers, max_pending)
+
+    def submit(self, meeting_id, fn, *args, cleanup_paths=(), keep_result=False):
+        """
+        Enqueues fn(*args) as the job for meeting_id and returns its status record.
+        cleanup_paths are deleted once the job finishes (successfully or not). With
+        keep_result, fn's return value is stored in the status record under "result";
+        leave it off when the result is already saved elsewhere (e.g. meeting outputs).
+        Raises OverloadedError (503) when the queue is full.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.warning("Job queue full (%s/%s); rejecting meeting_id %s.", self._pending, self.max_pending, meeting_id)
+                raise OverloadedError("Server is busy processing other recordings. Please retry later.", retry_after=transcription_admission.retry_after())
+            self._pending += 1
+            job = {
+                "jobId": meeting_id,
+                "meetingId": meeting_id,
+                "status": JOB_QUEUED,
+                "submittedAt": _now(),
+                "startedAt": None,
+                "finishedAt": None,
+                "error": None,
+                "result": None,
+            }
+            self._finished.pop(meeting_id, None)
+            self._jobs[meeting_id] = job
+
+        self._persist(job)
+        self._executor.submit(self._run, meeting_id, fn, args, list(cleanup_paths), keep_result)
+        logger.info("Queued job for meeting_id: %s (%s pending).", meeting_id, self._pending)
+        return dict(job)
+
+    def get(self, meeting_id):
+        """Returns the status record for a job, or None if the job is unknown."""
+        with self._lock:
+            job = self._jobs.get(meeting_id) or self._finished.get(meeting_id)
+            if job is not None:
+                return dict(job)
+        # Not submitted through this process, or finished long ago; fall back to the persisted status.
+        return load_job_status(meeting_id)
+
+    def stats(self):
+        """Queue depth for monitoring: jobs queued or running, out of max_pending."""
+        with self._lock:
+            return {"workers": self.max_workers, "capacity": self.max_pending, "pending": self._pending}
+
+    def _update(self, meeting_id, **fields):
+        with self._lock:
+            job = self._jobs[meeting_id]
+            job.update(fields)
+            snapshot = dict(job)
+        self._persist(snapshot)
+        return snapshot
+
+    def _retire(self, meeting_id):
+        """Moves a finished job to the bounded history, dropping the oldest beyond max_history."""
+        with self._lock:
+            job = self._jobs.pop(meeting_id)
+            if self.max_history:
+                self._finished[meeting_id] = job
+                while len(self._finished) > self.max_history:
+                    self._finished.popitem(last=False)
+
+    def _persist(self, job):
+        try:
+            save_job_status(job, job["meetingId"])
+        except FileStorageError as e:
+            # In-memory status is still authoritative for this process.
+            logger.error("Could not persist job status for meeting_id %s: %s", job['meetingId'], e.message)
+
+    def _run(self, meeting_id, fn, args, cleanup_paths, keep_result):
+        with log_context(meeting_id):
+            self._run_job(meeting_id, fn, args, cleanup_paths, keep_result)
+
+    def _run_job(self, meeting_id, fn, args, cleanup_paths, keep_result):
+        self._update(meeting_id, status=JOB_RUNNING, startedAt=_now())
+        logger.info("Job started for meeting_id: %s", meeting_id)
+        try:
+            with transcription_admission.background():
+                result = fn(*args)
+            self._update(meeting_id, status=JOB_COMPLETED, finishedAt=_now(), result=result if keep_result else None)
+            logger.info("Job completed for meeting_id: %s", meeting_id)
+        except AppError as e:
+            logger.error("Job failed for meeting_id %s: %s", meeting_id, e.message, exc_info=True)
+            self._update(meeting_id, status=JOB_FAILED, finishedAt=_now(), error=e.message)
+        except Exception as e:
+            logger.error("Unexpected error in job for meeting_id %s: %s", meeting_id, e, exc_info=True)
+            self._update(meeting_id, status=JOB_FAILED, finishedAt=_now(), error="An unexpected server error occurred.")
+        finally:
+            self._retire(meeting_id)
+            with self._lock:
+                self._pending -= 1
+            for cleanup_path in cleanup_paths:
+                if os.path.exists(cleanup_path):
+                    try:
+                        os.remove(cleanup_path)
+                        logger.info("Cleaned up temporary uploaded audio file: %s", cleanup_path)
+                    except Exception as e_cleanup:
+                        logger.error("Error deleting temporary audio file %s: %s", cleanup_path, e_cleanup, exc_info=True)
+
+
+job_queue = JobQueue()
+
+metrics.gauge("neuronote_jobs_pending", "Background jobs queued or running in this process.", lambda: job_queue.stats()["pending"])
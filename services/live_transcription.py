@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+from utils.logger import logger
+from utils.error_handlers import AppError, TranscriptionError
+from services.audio_chunking import SAMPLE_RATE
+from services.model_registry import model_registry
+from utils.metrics import stage_timer, record_transcription
+from services.admission import transcription_admission, check_audio_duration
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        LIVE_STEP_SECONDS as DEFAULT_LIVE_STEP_SECONDS,
+        LIVE_HOLDBACK_SECONDS as DEFAULT_LIVE_HOLDBACK_SECONDS,
+        LIVE_SESSION_TIMEOUT_SECONDS as DEFAULT_LIVE_SESSION_TIMEOUT_SECONDS,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default live transcription settings.")
+    DEFAULT_LIVE_STEP_SECONDS = 5
+    DEFAULT_LIVE_HOLDBACK_SECONDS = 2
+    DEFAULT_LIVE_SESSION_TIMEOUT_SECONDS = 600
+
+LIVE_STEP_SECONDS = float(os.environ.get("LIVE_STEP_SECONDS", DEFAULT_LIVE_STEP_SECONDS))
+LIVE_HOLDBACK_SECONDS = float(os.environ.get("LIVE_HOLDBACK_SECONDS", DEFAULT_LIVE_HOLDBACK_SECONDS))
+LIVE_SESSION_TIMEOUT_SECONDS = float(os.environ.get("LIVE_SESSION_TIMEOUT_SECONDS", DEFAULT_LIVE_SESSION_TIMEOUT_SECONDS))
+
+# Whisper decodes 30-second windows; the rolling buffer never grows past one window.
+MAX_WINDOW_SECONDS = 30
+
+
+def pcm16_to_float32(frame_bytes):
+    """Converts little-endian 16-bit PCM bytes to float32 samples in [-1, 1]."""
+    if len(frame_bytes) % 2:
+        raise AppError("Audio frames must contain whole 16-bit samples.", status_code=400)
+    return np.frombuffer(frame_bytes, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class LiveSession:
+    """
+    Incremental transcription state for one in-progress meeting.
+
+    Incoming audio is appended to a rolling buffer of not-yet-committed audio. Every
+    LIVE_STEP_SECONDS of new audio the buffer is transcribed; segments that end more than
+    LIVE_HOLDBACK_SECONDS before the end of the buffer are committed (they won't change as
+    more audio arrives) and their audio is dropped from the buffer. The trailing segment
+    is re-transcribed with the next step, so a word cut by the frame boundary is completed.
+    """
+
+    def __init__(self, meeting_id, whisper_model=None):
+        self.meeting_id = meeting_id
+        self.whisper_model = whisper_model
+        self.segments = []
+        self.last_activity = time.monotonic()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_offset = 0.0 # Global start time (s) of the first sample in the buffer
+        self._samples_since_step = 0
+        self._stepping = False # One step at a time; frames keep arriving while it runs
+        self._lock = threading.Condition()
+
+    @property
+    def transcript(self):
+        return "".join(segment["text"] for segment in self.segments)
+
+    def add_frames(self, frame_bytes):
+        """Appends PCM16 audio; returns (newly committed segments, tentative text of the tail)."""
+        samples = pcm16_to_float32(frame_bytes)
+        with self._lock:
+            self.last_activity = time.monotonic()
+            check_audio_duration(self._buffer_offset + (len(self._buffer) + len(samples)) / SAMPLE_RATE)
+            self._buffer = np.concatenate([self._buffer, samples])
+            self._samples_since_step += len(samples)
+            if self._samples_since_step < LIVE_STEP_SECONDS * SAMPLE_RATE or self._stepping:
+                return [], None # A running step leaves this audio for the next one
+            self._samples_since_step = 0
+            self._stepping = True
+        return self._step(final=False)
+
+    def finish(self):
+        """Transcribes whatever audio is still buffered and returns the full transcript."""
+        with self._lock:
+            while self._stepping:
+                self._lock.wait()
+            if not len(self._buffer):
+                return self.transcript
+            self._stepping = True
+        self._step(final=True)
+        return self.transcript
+
+    def _step(self, final):
+        """
+        Transcribes the buffer as it is once a transcription slot is free. The session lock is
+        only held to take the buffer and to apply the result, so frames posted while the step
+        waits or runs are appended at once.
+        """
+        try:
+            model_name, model = model_registry.get_whisper(self.whisper_model)
+            with transcription_admission.slot(self.meeting_id):
+                with self._lock:
+                    buffer = self._buffer
+                    # Condition on the committed text so wording and casing stay consistent across steps.
+                    prompt = self.transcript[-200:] or None
+                with stage_timer("live_step", model=model_name) as step:
+                    result = model.transcribe(buffer, initial_prompt=prompt, condition_on_previous_text=False)
+            record_transcription(model_name, len(buffer) / SAMPLE_RATE, step.seconds)
+            with self._lock:
+                return self._commit(result["segments"], len(buffer), final)
+        except AppError:
+            raise
+        except Exception as e:
+            logger.error("Live transcription step failed for meeting_id %s: %s", self.meeting_id, e, exc_info=True)
+            raise TranscriptionError(f"Live transcription failed for {self.meeting_id}: {e}")
+        finally:
+            with self._lock:
+                self._stepping = False
+                self._lock.notify_all()
+
+    def _commit(self, segments, buffer_samples, final):
+        """Commits the settled segments of a step over the first buffer_samples of the buffer. Call with the lock held."""
+        buffer_seconds = buffer_samples / SAMPLE_RATE
+        if final:
+            cutoff = buffer_seconds
+        elif buffer_seconds >= MAX_WINDOW_SECONDS - LIVE_STEP_SECONDS:
+            # Buffer is about to exceed Whisper's window: commit everything but the last segment.
+            cutoff = segments[-1]["start"] if len(segments) > 1 else buffer_seconds
+        else:
+            cutoff = buffer_seconds - LIVE_HOLDBACK_SECONDS
+
+        committed = []
+        tentative = []
+        for segment in segments:
+            target = committed if segment["end"] <= cutoff else tentative
+            target.append({
+                "start": self._buffer_offset + segment["start"],
+                "end": self._buffer_offset + segment["end"],
+                "text": segment["text"],
+            })
+
+        if committed:
+            consumed = int(min(committed[-1]["end"] - self._buffer_offset, buffer_seconds) * SAMPLE_RATE)
+            self._buffer = self._buffer[consumed:]
+            self._buffer_offset += consumed / SAMPLE_RATE
+            self.segments.extend(committed)
+        elif buffer_seconds >= MAX_WINDOW_SECONDS:
+            # Nothing recognisable in a whole window (silence/noise): drop it.
+            self._buffer = self._buffer[buffer_samples:]
+            self._buffer_offset += buffer_seconds
+
+        logger.debug("Live step for meeting_id %s: %s committed, %s tentative, %.1fs buffered.",
+                     self.meeting_id, len(committed), len(tentative), len(self._buffer) / SAMPLE_RATE)
+        return committed, "".join(segment["text"] for segment in tentative) or None
+
+
+class LiveSessionManager:
+    """Holds the live sessions of this process and expires idle ones."""
+
+    def __init__(self, timeout_seconds=LIVE_SESSION_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, meeting_id, whisper_model=None):
+        self._expire()
+        session = LiveSession(meeting_id, whisper_model)
+        with self._lock:
+            self._sessions[meeting_id] = session
+        logger.info("Started live session for meeting_id: %s", meeting_id)
+        return session
+
+    def get(self, meeting_id):
+        self._expire()
+        with self._lock:
+            session = self._sessions.get(meeting_id)
+        if session is None:
+            raise AppError(f"No active live session with id '{meeting_id}'.", status_code=404)
+        return session
+
+    def remove(self, meeting_id):
+        with self._lock:
+            self._sessions.pop(meeting_id, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [mid for mid, s in self._sessions.items() if now - s.last_activity > self.timeout_seconds]
+            for meeting_id in expired:
+                del self._sessions[meeting_id]
+        for meeting_id in expired:
+            logger.warning("Expired idle live session for meeting_id: %s", meeting_id)
+
+
+live_sessions = LiveSessionManager()
@@ -0,0 +1,276 @@
+"""
+Offline, extractive insight engine for short or near-empty transcripts, and the router
+that decides between it and Gemini.
+
+The local engine writes the same six sections as the Gemini prompt asks for:
+    1. Summary              top-scoring sentences (content-word frequency, length, position)
+    2. Action items         sentences matching commitment patterns ("I'll", "we need to", ...)
+    3. Sentiment            lexicon score with simple negation handling
+    4. Key insights         sentences matching decision patterns ("we agreed", "decided", ...)
+    5. Participants         not knowable without speaker labels; names mentioned and
+                            action-item owners are listed
+    6. Follow-up questions  questions and open-issue phrases
+
+route_insights() sends a transcript to the local engine when it has fewer than
+LOCAL_INSIGHTS_MAX_WORDS words or fewer than LOCAL_INSIGHTS_MIN_CONTENT_WORDS distinct
+content words; everything else goes to Gemini. Both decisions and the estimated Gemini
+latency avoided are exported as metrics.
+"""
+import os
+import re
+import math
+import threading
+from collections import Counter
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        ENABLE_LOCAL_INSIGHTS as DEFAULT_ENABLE_LOCAL_INSIGHTS,
+        LOCAL_INSIGHTS_MAX_WORDS as DEFAULT_LOCAL_INSIGHTS_MAX_WORDS,
+        LOCAL_INSIGHTS_MIN_CONTENT_WORDS as DEFAULT_LOCAL_INSIGHTS_MIN_CONTENT_WORDS,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default local insights settings.")
+    DEFAULT_ENABLE_LOCAL_INSIGHTS = True
+    DEFAULT_LOCAL_INSIGHTS_MAX_WORDS = 75
+    DEFAULT_LOCAL_INSIGHTS_MIN_CONTENT_WORDS = 10
+
+ENABLE_LOCAL_INSIGHTS = os.environ.get("ENABLE_LOCAL_INSIGHTS", str(DEFAULT_ENABLE_LOCAL_INSIGHTS)).lower() in ['true', '1', 't', 'yes']
+LOCAL_INSIGHTS_MAX_WORDS = int(os.environ.get("LOCAL_INSIGHTS_MAX_WORDS", DEFAULT_LOCAL_INSIGHTS_MAX_WORDS))
+LOCAL_INSIGHTS_MIN_CONTENT_WORDS = int(os.environ.get("LOCAL_INSIGHTS_MIN_CONTENT_WORDS", DEFAULT_LOCAL_INSIGHTS_MIN_CONTENT_WORDS))
+
+LOCAL_ENGINE_NAME = "local-extractive"
+# Bump when the engine's output changes, so cached local insights are regenerated
+LOCAL_INSIGHTS_VERSION = "2"
+
+# Gemini latency assumed before any call has been timed in this process
+DEFAULT_GEMINI_LATENCY_SECONDS = 3.0
+
+INSIGHTS_ROUTES = metrics.counter(
+    "neuronote_insights_routes_total", "Insight requests by engine (local or gemini) and routing reason.", labels=("engine", "reason"))
+LATENCY_SAVED = metrics.counter(
+    "neuronote_insights_latency_saved_seconds_total", "Estimated Gemini latency avoided by the local insight engine.")
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[A-Za-z']+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just let me more most my myself no nor not now of off on once only or
+other our ours ourselves out over own same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were what when where which while who whom why
+will with would you your yours yourself yourselves yeah yes okay ok um uh like really right well oh so know think
+going get got gonna also one thing things lot kind sort mean actually
+""".split())
+
+POSITIVE_WORDS = frozenset("""
+good great excellent awesome happy glad pleased agree agreed success successful progress improve improved improvement
+love like helpful useful clear confident excited positive perfect nice thanks thank appreciate win wins solved resolved
+ahead done finished easy fantastic strong effective efficient productive smooth benefit opportunity
+""".split())
+NEGATIVE_WORDS = frozenset("""
+bad poor problem problems issue issues concern concerned worried worry risk risky delay delayed late fail failed failure
+broken bug bugs blocker blocked difficult hard frustrated frustrating unclear confused disagree wrong error errors
+negative slow unhappy sorry angry annoyed complaint crisis loss lost missed behind expensive stuck
+""".split())
+NEGATIONS = frozenset(["not", "no", "never", "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "won't", "can't", "cannot"])
+
+ACTION_PATTERN = re.compile(
+    r"\b(?P<owner>[Ii]|[Ww]e|[Yy]ou|[Hh]e|[Ss]he|[Tt]hey|[A-Z][a-z]+)(?:\s+|')(?i:will|ll|shall|need to|needs to|should|must|"
+    r"has to|have to|am going to|is going to|are going to|is gonna|are gonna)\s+\w+"
+    r"|(?i:\b(?:let's|action item|to-do|todo|follow up|follow-up|deadline|by (?:monday|tuesday|wednesday|thursday|friday|"
+    r"tomorrow|next week|end of (?:the )?(?:day|week|month)))\b)")
+PRONOUN_OWNERS = {"i": "the speaker", "we": "the team", "you": "unassigned", "he": "unassigned", "she": "unassigned", "they": "unassigned"}
+DECISION_PATTERN = re.compile(
+    r"\b(?:decided|decision|agreed|agree that|we(?:'ll| will) go with|going with|the plan is|approved|settled on|"
+    r"concluded|final answer|confirmed|signed off)\b", re.IGNORECASE)
+OPEN_ISSUE_PATTERN = re.compile(
+    r"\b(?:not sure|unclear|open question|to be decided|tbd|need to figure out|need to decide|look into|find out|"
+    r"check (?:with|whether|if))\b", re.IGNORECASE)
+NAME_CANDIDATE = re.compile(r"\b[A-Z][a-z]{2,}\b")
+NOT_NAMES = frozenset("""
+I Monday Tuesday Wednesday Thursday Friday Saturday Sunday January February March April May June July August
+September October November December Okay Yeah Thanks Thank Hello Hi Also And But The This That So Well Yes No
+""".split())
+# Capitalized only because they open a sentence; checked (lowercased) for sentence-initial candidates only
+SENTENCE_STARTERS = frozenset("""
+let please maybe sure next first second third finally last anyway basically honestly hopefully perhaps probably
+sounds looks seems everyone everybody someone somebody nobody anyone anybody today tomorrow yesterday tonight morning
+afternoon evening meanwhile otherwise however therefore hey alright absolutely exactly definitely great sorry thanks
+overall regarding moving yep nope cool fine
+""".split())
+
+_gemini_latency = None # Moving average of timed Gemini insight calls in this process
+_gemini_latency_lock = threading.Lock()
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text.strip()) if s.strip()]
+
+
+def _words(text):
+    return [w.lower() for w in _WORD.findall(text)]
+
+
+def _content_words(words):
+    return [w for w in words if w not in STOPWORDS and len(w) > 2]
+
+
+# --- Routing ---
+
+def route_insights(transcript):
+    """Returns (engine, reason): ("local", "short" / "low_content" / ...) or ("gemini", ...)."""
+    if not ENABLE_LOCAL_INSIGHTS:
+        return "gemini", "local_disabled"
+    words = _words(transcript)
+    if len(words) < LOCAL_INSIGHTS_MAX_WORDS:
+        return "local", "short"
+    if len(set(_content_words(words))) < LOCAL_INSIGHTS_MIN_CONTENT_WORDS:
+        return "local", "low_content"
+    return "gemini", "long"
+
+
+def record_gemini_latency(seconds):
+    """Feeds the Gemini latency estimate used to report the time the local engine saves."""
+    global _gemini_latency
+    with _gemini_latency_lock:
+        _gemini_latency = seconds if _gemini_latency is None else 0.8 * _gemini_latency + 0.2 * seconds
+
+
+def estimated_gemini_latency():
+    return _gemini_latency if _gemini_latency is not None else DEFAULT_GEMINI_LATENCY_SECONDS
+
+
+def record_route(engine, reason, local_seconds=None):
+    """Counts a routing decision; for local runs also adds the estimated latency saved."""
+    INSIGHTS_ROUTES.inc(1, engine, reason)
+    if engine == "local" and local_seconds is not None:
+        saved = max(0.0, estimated_gemini_latency() - local_seconds)
+        LATENCY_SAVED.inc(saved)
+        logger.info("Insights generated locally (%s) in %.1f ms; about %.2fs of Gemini latency saved.", reason, local_seconds * 1000, saved)
+        return saved
+    return None
+
+
+# --- Extraction ---
+
+def _summary(sentences, frequencies):
+    if not sentences:
+        return "The recording contains no speech that could be transcribed."
+    scored = []
+    for index, sentence in enumerate(sentences):
+        content = _content_words(_words(sentence))
+        if not content:
+            continue
+        score = sum(frequencies[w] for w in content) / math.sqrt(len(content))
+        score *= 1.0 + 0.5 / (1 + index) # Openings tend to state the topic
+        scored.append((score, index))
+    if not scored:
+        return " ".join(sentences[:2])
+    count = 1 if len(sentences) < 4 else min(3, max(2, len(sentences) // 6))
+    chosen = sorted(index for _, index in sorted(scored, reverse=True)[:count])
+    return " ".join(sentences[i] for i in chosen)
+
+
+def _action_items(sentences):
+    """Returns (items, owners): the action-item lines and the named owners among them."""
+    items = []
+    owners = []
+    for sentence in sentences:
+        if sentence.endswith("?"):
+            continue
+        for match in ACTION_PATTERN.finditer(sentence):
+            owner = match.group("owner")
+            if owner is None:
+                items.append(f"* {sentence} (responsible: unassigned)")
+                break
+            if owner.lower() in PRONOUN_OWNERS:
+                items.append(f"* {sentence} (responsible: {PRONOUN_OWNERS[owner.lower()]})")
+                break
+            if owner.lower() not in STOPWORDS and owner not in NOT_NAMES: # "It will..." is not a commitment
+                items.append(f"* {sentence} (responsible: {owner})")
+                owners.append(owner)
+                break
+    return items, owners
+
+
+def _sentiment(words):
+    score = 0
+    positive = negative = 0
+    for index, word in enumerate(words):
+        polarity = 1 if word in POSITIVE_WORDS else -1 if word in NEGATIVE_WORDS else 0
+        if not polarity:
+            continue
+        if any(w in NEGATIONS for w in words[max(0, index - 3):index]):
+            polarity = -polarity
+        score += polarity
+        if polarity > 0:
+            positive += 1
+        else:
+            negative += 1
+    if positive + negative == 0:
+        return "Neutral. No clearly positive or negative language was detected."
+    balance = score / (positive + negative)
+    if positive and negative and abs(balance) < 0.34:
+        label = "Mixed"
+    elif balance > 0:
+        label = "Positive"
+    else:
+        label = "Negative"
+    return f"{label} ({positive} positive and {negative} negative expressions detected)."
+
+
+def _decisions(sentences):
+    return [f"* {s}" for s in sentences if DECISION_PATTERN.search(s) and not s.endswith("?")]
+
+
+def _is_name(match):
+    name = match.group()
+    if name in NOT_NAMES:
+        return False
+    if match.start() == 0: # Any word is capitalized here; only keep words that are not common English
+        word = name.lower()
+        return word not in STOPWORDS and word not in SENTENCE_STARTERS and word not in POSITIVE_WORDS and word not in NEGATIVE_WORDS
+    return True
+
+
+def _participants(sentences, owners):
+    names = Counter(owners)
+    for sentence in sentences:
+        names.update(match.group() for match in NAME_CANDIDATE.finditer(sentence) if _is_name(match))
+    mentioned = [name for name, _ in names.most_common(8)]
+    text = "At least one speaker; the transcript has no speaker labels, so the exact number is unknown."
+    if mentioned:
+        text += f" Names mentioned: {', '.join(mentioned)}."
+    return text
+
+
+def _questions(sentences):
+    return [f"* {s}" for s in sentences if s.endswith("?") or OPEN_ISSUE_PATTERN.search(s)]
+
+
+def generate_local_insights(transcript: str) -> str:
+    """Builds the six-section insights text from the transcript alone, without any API call."""
+    sentences = split_sentences(transcript)
+    words = _words(transcript)
+    frequencies = Counter(_content_words(words))
+    if frequencies:
+        top = frequencies.most_common(1)[0][1]
+        frequencies = Counter({w: c / top for w, c in frequencies.items()})
+
+    actions, owners = _action_items(sentences)
+    decisions = _decisions(sentences)
+    questions = _questions(sentences)
+    sections = [
+        f"**1. Summary:** {_summary(sentences, frequencies)}",
+        "**2. Action Items:**" + ("\n" + "\n".join(actions) if actions else " None explicitly stated in the transcript."),
+        f"**3. Sentiment:** {_sentiment(words)}",
+        "**4. Key Insights/Decisions:**" + ("\n" + "\n".join(decisions) if decisions else " No explicit decisions were detected."),
+        f"**5. Number of Participants:** {_participants(sentences, owners)}",
+        "**6. Follow-up Questions/Topics:**" + ("\n" + "\n".join(questions) if questions else " None detected."),
+    ]
+    return "\n\n".join(sections)
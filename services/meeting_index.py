@@ -0,0 +1,271 @@
+"""
+SQLite index over the stored meetings, so listing and lookups never walk output/meetings.
+
+save_transcript/save_insights update it as they write, the pipeline adds model names,
+durations and stage timings, and GET /meetings pages through it with a cursor.
+For directories written before the index existed, run once:
+
+    python -m services.meeting_index reindex
+"""
+import os
+import re
+import sys
+import json
+import base64
+import sqlite3
+import datetime
+import threading
+
+from utils.logger import logger
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import MEETING_INDEX_PATH as DEFAULT_MEETING_INDEX_PATH
+except ImportError:
+    logger.warning("config.py not found, using default MEETING_INDEX_PATH.")
+    DEFAULT_MEETING_INDEX_PATH = "output/meeting_index.sqlite3"
+
+MEETING_INDEX_PATH = os.environ.get("MEETING_INDEX_PATH", DEFAULT_MEETING_INDEX_PATH)
+
+MEETING_ID_TIMESTAMP = re.compile(r"^meeting_(\d{8}_\d{6}_\d{6})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    meeting_id       TEXT PRIMARY KEY,
+    created_at       TEXT NOT NULL,
+    updated_at       TEXT NOT NULL,
+    status           TEXT NOT NULL DEFAULT 'pending',
+    whisper_model    TEXT,
+    speed_profile    TEXT,
+    gemini_model     TEXT,
+    audio_seconds    REAL,
+    transcript_path  TEXT,
+    transcript_bytes INTEGER,
+    insights_path    TEXT,
+    insights_bytes   INTEGER,
+    timings          TEXT
+);
+CREATE INDEX IF NOT EXISTS meetings_created ON meetings (created_at DESC, meeting_id DESC);
+"""
+
+# Columns added to SCHEMA later, and their definitions, for index files created before them
+ADDED_COLUMNS = {
+    "speed_profile": "TEXT",
+}
+
+# Columns a caller may set through update_meeting(), mapped from the API's camelCase names
+UPDATABLE_COLUMNS = {
+    "status": "status",
+    "whisperModel": "whisper_model",
+    "speedProfile": "speed_profile",
+    "geminiModel": "gemini_model",
+    "audioSeconds": "audio_seconds",
+    "transcriptPath": "transcript_path",
+    "transcriptBytes": "transcript_bytes",
+    "insightsPath": "insights_path",
+    "insightsBytes": "insights_bytes",
+    "timings": "timings",
+}
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+def created_at_for(meeting_id, fallback=None):
+    """Derives the creation time from a timestamped meeting_id, else uses fallback or now."""
+    match = MEETING_ID_TIMESTAMP.match(meeting_id)
+    if match:
+        return datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S_%f").isoformat()
+    return fallback or _now()
+
+
+def encode_cursor(created_at, meeting_id):
+    return base64.urlsafe_b64encode(f"{created_at}|{meeting_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, meeting_id) from a cursor; raises ValueError if malformed."""
+    created_at, meeting_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    return created_at, meeting_id
+
+
+def parse_time(value):
+    """Returns an ISO 8601 date or time as a created_at string (local time); raises ValueError if malformed."""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def _row_to_dict(row):
+    return {
+        "meetingId": row["meeting_id"],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+        "status": row["status"],
+        "whisperModel": row["whisper_model"],
+        "speedProfile": row["speed_profile"],
+        "geminiModel": row["gemini_model"],
+        "audioSeconds": row["audio_seconds"],
+        "transcriptPath": row["transcript_path"],
+        "transcriptBytes": row["transcript_bytes"],
+        "insightsPath": row["insights_path"],
+        "insightsBytes": row["insights_bytes"],
+        "timings": json.loads(row["timings"]) if row["timings"] else None,
+    }
+
+
+class MeetingIndex:
+    """
+    Thin wrapper around the SQLite index. Each thread gets its own connection; the
+    database runs in WAL mode so readers (listing requests) never block the writer
+    and several gunicorn workers can share the file.
+    """
+
+    def __init__(self, path=MEETING_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL") # Durable enough with WAL; avoids an fsync per commit
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._migrate(connection)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _migrate(connection):
+        """Adds columns introduced after an index file was created."""
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(meetings)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE meetings ADD COLUMN {column} {definition}")
+
+    def update_meeting(self, meeting_id, **fields):
+        """
+        Inserts the meeting if needed and sets the given fields (camelCase names from
+        UPDATABLE_COLUMNS) in one transaction. timings dicts are merged with stored ones.
+        """
+        unknown = set(fields) - set(UPDATABLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown meeting index fields: {', '.join(sorted(unknown))}")
+        connection = self._connection()
+        now = _now()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR IGNORE INTO meetings (meeting_id, created_at, updated_at) VALUES (?, ?, ?)",
+                (meeting_id, created_at_for(meeting_id), now),
+            )
+            if "timings" in fields and fields["timings"] is not None:
+                row = connection.execute("SELECT timings FROM meetings WHERE meeting_id = ?", (meeting_id,)).fetchone()
+                merged = json.loads(row["timings"]) if row and row["timings"] else {}
+                merged.update(fields["timings"])
+                fields["timings"] = json.dumps(merged)
+            if fields:
+                assignments = ", ".join(f"{UPDATABLE_COLUMNS[name]} = ?" for name in fields)
+                connection.execute(
+                    f"UPDATE meetings SET {assignments}, updated_at = ? WHERE meeting_id = ?",
+                    list(fields.values()) + [now, meeting_id],
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get(self, meeting_id):
+        row = self._connection().execute("SELECT * FROM meetings WHERE meeting_id = ?", (meeting_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list_meetings(self, limit=50, cursor=None, status=None, whisper_model=None, since=None, until=None):
+        """
+        Returns (meetings, next_cursor), newest first. The cursor is opaque to clients and
+        resumes after the last row returned, so pages stay stable while meetings are added.
+        Raises ValueError for a malformed cursor or since/until time.
+        """
+        clauses = []
+        params = []
+        if cursor:
+            created_at, meeting_id = decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND meeting_id < ?))")
+            params += [created_at, created_at, meeting_id]
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if whisper_model:
+            clauses.append("whisper_model = ?")
+            params.append(whisper_model)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(parse_time(since))
+        if until:
+            clauses.append("created_at < ?")
+            params.append(parse_time(until))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT * FROM meetings {where} ORDER BY created_at DESC, meeting_id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        meetings = [_row_to_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last["created_at"], last["meeting_id"])
+        return meetings, next_cursor
+
+    def reindex(self, base_dir):
+        """Indexes every meeting directory under base_dir (existing rows are updated). Returns the count."""
+        count = 0
+        for entry in os.scandir(base_dir):
+            if not entry.is_dir():
+                continue
+            meeting_id = entry.name
+            fields = {}
+            transcript_path = os.path.join(entry.path, f"{meeting_id}_transcript.txt")
+            insights_path = os.path.join(entry.path, f"{meeting_id}_insights.md")
+            if os.path.exists(transcript_path):
+                fields.update(transcriptPath=transcript_path, transcriptBytes=os.path.getsize(transcript_path), status="transcribed")
+            if os.path.exists(insights_path):
+                fields.update(insightsPath=insights_path, insightsBytes=os.path.getsize(insights_path), status="completed")
+            if not fields:
+                continue
+            self.update_meeting(meeting_id, **fields)
+            if not MEETING_ID_TIMESTAMP.match(meeting_id):
+                # No timestamp in the name: use the directory's modification time.
+                mtime = datetime.datetime.fromtimestamp(entry.stat().st_mtime).isoformat()
+                connection = self._connection()
+                connection.execute("UPDATE meetings SET created_at = ? WHERE meeting_id = ?", (mtime, meeting_id))
+            count += 1
+        logger.info("Reindexed %s meetings from %s into %s.", count, base_dir, self.path)
+        return count
+
+
+meeting_index = MeetingIndex()
+
+
+def main(argv):
+    if len(argv) != 1 or argv[0] != "reindex":
+        print("Usage: python -m services.meeting_index reindex")
+        return 2
+    from services.storage_service import OUTPUT_BASE_DIR
+    count = meeting_index.reindex(OUTPUT_BASE_DIR)
+    print(f"Indexed {count} meetings from {OUTPUT_BASE_DIR} into {meeting_index.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,178 @@
+import os
+import threading
+from collections import OrderedDict
+
+from utils.error_handlers import TranscriptionError, GeminiError
+from utils.logger import logger
+from services.quantized_whisper import is_quantized, load_quantized_model
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        DEFAULT_WHISPER_MODEL, DEFAULT_GEMINI_MODEL, GEMINI_API_KEY as CONFIG_GEMINI_API_KEY,
+        WHISPER_ALLOWED_MODELS as DEFAULT_WHISPER_ALLOWED_MODELS,
+        WHISPER_MAX_LOADED_MODELS as DEFAULT_WHISPER_MAX_LOADED_MODELS,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default model registry settings.")
+    DEFAULT_WHISPER_MODEL = "base"
+    DEFAULT_GEMINI_MODEL = "models/gemini-1.5-flash-latest"
+    CONFIG_GEMINI_API_KEY = None
+    DEFAULT_WHISPER_ALLOWED_MODELS = "tiny,base,small"
+    DEFAULT_WHISPER_MAX_LOADED_MODELS = 2
+
+# Use environment variables for model names if set, otherwise use config defaults
+WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL", DEFAULT_WHISPER_MODEL)
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL", DEFAULT_GEMINI_MODEL)
+FALLBACK_WHISPER_MODEL = "base"
+
+# Whisper models a request may ask for; the configured default is always allowed.
+WHISPER_ALLOWED_MODELS = {
+    name.strip() for name in os.environ.get("WHISPER_ALLOWED_MODELS", DEFAULT_WHISPER_ALLOWED_MODELS).split(",") if name.strip()
+} | {WHISPER_MODEL_NAME}
+WHISPER_MAX_LOADED_MODELS = max(1, int(os.environ.get("WHISPER_MAX_LOADED_MODELS", DEFAULT_WHISPER_MAX_LOADED_MODELS)))
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and shares them across requests.
+
+    Whisper models are kept in an LRU of at most max_whisper_models entries, so a request
+    can pick a model size without every size staying resident. Nothing is loaded at import
+    time; call preload() to load models up front (e.g. in the gunicorn master before it forks,
+    so workers share the weights through copy-on-write pages).
+    """
+
+    def __init__(self, max_whisper_models=WHISPER_MAX_LOADED_MODELS):
+        self.max_whisper_models = max_whisper_models
+        self._whisper_models = OrderedDict()
+        self._whisper_fallbacks = {} # Models that failed to load -> model used instead
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._gemini_model = None
+        self._gemini_lock = threading.Lock()
+
+    # --- Whisper ---
+
+    def resolve_whisper_name(self, name=None):
+        """
+        Returns the Whisper model name that get_whisper(name) will actually use.
+        Raises ValueError for models not in WHISPER_ALLOWED_MODELS.
+        """
+        name = name or WHISPER_MODEL_NAME
+        if name not in WHISPER_ALLOWED_MODELS:
+            raise ValueError(f"Whisper model '{name}' is not allowed. Choose one of: {', '.join(sorted(WHISPER_ALLOWED_MODELS))}.")
+        with self._lock:
+            return self._whisper_fallbacks.get(name, name)
+
+    def get_whisper(self, name=None):
+        """Returns (model_name, model), loading the model if it is not resident."""
+        name = self.resolve_whisper_name(name)
+        with self._lock:
+            if name in self._whisper_models:
+                self._whisper_models.move_to_end(name)
+                return name, self._whisper_models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile;
+        # the per-model lock makes concurrent requests for the same model load it once.
+        with load_lock:
+            with self._lock:
+                if name in self._whisper_models:
+                    self._whisper_models.move_to_end(name)
+                    return name, self._whisper_models[name]
+            loaded_name, model = self._load_whisper(name)
+            with self._lock:
+                self._whisper_models[loaded_name] = model
+                self._whisper_models.move_to_end(loaded_name)
+                while len(self._whisper_models) > self.max_whisper_models:
+                    evicted, _ = self._whisper_models.popitem(last=False)
+                    logger.info("Evicted Whisper model '%s' from registry (max %s resident).", evicted, self.max_whisper_models)
+            return loaded_name, model
+
+    def _load_whisper(self, name):
+        import whisper # Imported lazily: torch import alone costs seconds and hundreds of MB
+
+        logger.info("Loading Whisper model: %s", name)
+        try:
+            # "<size>-int8" names select the int8 quantized CPU backend
+            model = load_quantized_model(name) if is_quantized(name) else whisper.load_model(name)
+            logger.info("Whisper model '%s' loaded successfully.", name)
+            return name, model
+        except Exception as e:
+            if name == FALLBACK_WHISPER_MODEL:
+                logger.critical("Failed to load the Whisper model '%s': %s", name, e, exc_info=True)
+                raise TranscriptionError(f"Could not initialize Whisper model '{name}': {e}")
+            logger.error("Failed to load Whisper model '%s': %s. Attempting fallback to '%s' model.", name, e, FALLBACK_WHISPER_MODEL, exc_info=True)
+            try:
+                model = whisper.load_model(FALLBACK_WHISPER_MODEL)
+            except Exception as e_fallback:
+                logger.critical("Failed to load even the fallback Whisper model '%s': %s", FALLBACK_WHISPER_MODEL, e_fallback, exc_info=True)
+                raise TranscriptionError(f"Could not initialize Whisper model: {e_fallback}")
+            logger.info("Successfully loaded fallback Whisper model '%s'.", FALLBACK_WHISPER_MODEL)
+            with self._lock:
+                self._whisper_fallbacks[name] = FALLBACK_WHISPER_MODEL
+            return FALLBACK_WHISPER_MODEL, model
+
+    # --- Gemini ---
+
+    def get_gemini(self):
+        """Returns the shared Gemini model, configuring the API on first use."""
+        if self._gemini_model is not None:
+            return self._gemini_model
+        with self._gemini_lock:
+            if self._gemini_model is None:
+                self._gemini_model = self._load_gemini()
+            return self._gemini_model
+
+    def _load_gemini(self):
+        stub_url = os.environ.get("GEMINI_STUB_URL")
+        if stub_url:
+            from services.gemini_stub import StubGenerativeModel
+            logger.warning("GEMINI_STUB_URL is set; using the local Gemini stub at %s instead of the real API.", stub_url)
+            return StubGenerativeModel(stub_url, GEMINI_MODEL_NAME)
+
+        import google.generativeai as genai
+
+        # Prioritize environment variable for API key, then config file
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            logger.info("GEMINI_API_KEY not found in environment variables. Trying config.py.")
+            api_key = CONFIG_GEMINI_API_KEY
+            if api_key:
+                logger.info("Loaded GEMINI_API_KEY from config.py.")
+
+        if not api_key:
+            logger.error("GEMINI_API_KEY not found in environment variables or config.py. This is a critical setup error.")
+            raise GeminiError("GEMINI_API_KEY not found in environment variables or config.py. Please set it.")
+
+        try:
+            genai.configure(api_key=api_key)
+            logger.info("Gemini API configured successfully.")
+        except Exception as e:
+            logger.error("Failed to configure Gemini API with the provided key: %s", e, exc_info=True)
+            raise GeminiError(f"Gemini API configuration failed: {e}")
+
+        logger.info("Initializing Gemini model: %s", GEMINI_MODEL_NAME)
+        try:
+            gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+            logger.info("Gemini model '%s' loaded successfully.", GEMINI_MODEL_NAME)
+            return gemini_model
+        except Exception as e:
+            logger.error("Failed to load Gemini model '%s': %s. Check API key and model name.", GEMINI_MODEL_NAME, e, exc_info=True)
+            raise GeminiError(f"Could not initialize Gemini model '{GEMINI_MODEL_NAME}': {e}")
+
+    # --- Preloading ---
+
+    def preload(self, whisper_names=None, gemini=False):
+        """
+        Loads models up front. Gemini is off by default because its gRPC channel must not
+        be created before a fork; each worker configures it lazily instead.
+        """
+        for name in whisper_names or [WHISPER_MODEL_NAME]:
+            self.get_whisper(name)
+        if gemini:
+            self.get_gemini()
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,294 @@
+import time
+import asyncio
+
+from services import gemini
+from services.model_registry import model_registry
+from services.transcription import transcribe_audio, decode_settings
+from services.speed_profiles import resolve_speed_profile, profile_model, TRANSCRIPTION_LANGUAGE
+from services.audio_io import UploadedAudio
+from services.gemini import generate_insights, generate_insights_async, generate_insights_stream
+from services.local_insights import route_insights, generate_local_insights, record_route, LOCAL_ENGINE_NAME, LOCAL_INSIGHTS_VERSION
+from services.result_cache import transcript_cache, insights_cache, hash_file, make_key
+from services.storage_service import save_transcript, save_insights, index_meeting
+from services.audio_chunking import SAMPLE_RATE
+from services.admission import transcription_admission, check_audio_duration
+from utils.error_handlers import FileStorageError
+from utils.logger import logger
+from utils.metrics import stage_timer, record_transcription, STAGE_SECONDS
+
+
+def run_pipeline(audio, meeting_id: str, whisper_model: str = None, speed_profile: str = None, language: str = None) -> dict:
+    """
+    Runs the full meeting pipeline for one recording (a file path or an in-memory
+    UploadedAudio): transcription, insight generation
+    and saving of both outputs through the storage service. whisper_model selects one of
+    the allowed Whisper sizes and speed_profile a decoding profile (fast/balanced/accurate);
+    None uses the configured defaults. language optionally skips language detection.
+
+    Transcripts are cached by audio content hash + Whisper model (+ profile and language
+    when they differ from Whisper's defaults), and insights by transcript hash + Gemini
+    model + prompt version, so re-uploads skip both models.
+
+    Returns the response payload used by the /recorded-audio endpoints and the job queue.
+    Transcription and Gemini errors mark the meeting "failed" in the index and propagate;
+    storage errors are logged and reported as missing paths, since the insights themselves
+    were still produced.
+    """
+    speed_profile = resolve_speed_profile(speed_profile)
+    try:
+        transcript, transcript_cache_status = transcribe_stage(audio, meeting_id, whisper_model, speed_profile, language)
+        result = run_insights_stage(transcript, meeting_id)
+    except Exception:
+        index_meeting(meeting_id, status="failed")
+        raise
+    result["cache"]["transcript"] = transcript_cache_status
+    result["speedProfile"] = speed_profile
+    return result
+
+
+def _transcript_cache_key(audio_hash: str, model_name: str, speed_profile: str, language: str = None) -> str:
+    # Everything that changes the transcript: model, decoding profile, the language actually
+    # used (requested or TRANSCRIPTION_LANGUAGE), and the voice-activity and chunking settings.
+    return make_key(audio_hash, model_name, speed_profile, language or TRANSCRIPTION_LANGUAGE or "", decode_settings())
+
+
+def transcribe_stage(audio, meeting_id: str, whisper_model: str = None, speed_profile: str = None, language: str = None) -> tuple:
+    """Returns (transcript, "hit"/"miss") using the transcript cache before Whisper."""
+    in_memory = isinstance(audio, UploadedAudio)
+    speed_profile = resolve_speed_profile(speed_profile)
+    whisper_model = profile_model(speed_profile, whisper_model)
+    with stage_timer("transcript_cache_lookup") as lookup:
+        audio_hash = audio.sha256() if in_memory else hash_file(audio)
+        transcript_key = _transcript_cache_key(audio_hash, model_registry.resolve_whisper_name(whisper_model), speed_profile, language)
+        transcript = transcript_cache.get(transcript_key)
+    if transcript is not None:
+        logger.info("Using cached transcript for meeting_id: %s (%.1f ms)", meeting_id, lookup.seconds * 1000)
+        index_meeting(meeting_id, whisperModel=model_registry.resolve_whisper_name(whisper_model), speedProfile=speed_profile,
+                      timings={"transcribeSeconds": round(lookup.seconds, 3)})
+        return transcript, "hit"
+
+    logger.info("Starting audio processing for meeting_id: %s (source: %s)...", meeting_id, audio)
+    metadata = {}
+    timings = {}
+    source = audio
+    if in_memory:
+        with stage_timer("decode") as decode:
+            source = audio.samples()
+        timings["decodeSeconds"] = round(decode.seconds, 3)
+        logger.info("Decoded upload for meeting_id %s in memory in %.1f ms.", meeting_id, decode.seconds * 1000)
+        metadata["audioSeconds"] = round(len(source) / SAMPLE_RATE, 3)
+        check_audio_duration(metadata["audioSeconds"])
+    with transcription_admission.slot(meeting_id) as waited:
+        timings["queueWaitSeconds"] = round(waited, 3)
+        with stage_timer("transcribe", model=model_registry.resolve_whisper_name(whisper_model)) as transcribe:
+            vad_report = {}
+            transcript = transcribe_audio(source, model_name=whisper_model, profile=speed_profile, language=language, report=vad_report)
+            # Re-resolve: if the requested model failed to load, the fallback model was used.
+            transcribe.model = model_registry.resolve_whisper_name(whisper_model)
+    timings["transcribeSeconds"] = round(transcribe.seconds, 3)
+    vad_report.pop("segments", None) # Transcripts are stored as text; the durations go to the index
+    timings.update(vad_report)
+    record_transcription(transcribe.model, metadata.get("audioSeconds"), transcribe.seconds)
+    transcript_cache.put(_transcript_cache_key(audio_hash, transcribe.model, speed_profile, language), transcript)
+    index_meeting(meeting_id, whisperModel=transcribe.model, speedProfile=speed_profile, timings=timings, **metadata)
+    return transcript, "miss"
+
+
+def _insights_cache_key(transcript: str, engine: str = "gemini") -> str:
+    if engine == "local":
+        return make_key(make_key(transcript), LOCAL_ENGINE_NAME, LOCAL_INSIGHTS_VERSION)
+    return make_key(make_key(transcript), gemini.GEMINI_MODEL_NAME, gemini.PROMPT_VERSION)
+
+
+def _insights_engine_model(engine: str) -> str:
+    """Name recorded in metrics and the meeting index for the engine that wrote the insights."""
+    return LOCAL_ENGINE_NAME if engine == "local" else gemini.GEMINI_MODEL_NAME
+
+
+def _generate_local(transcript: str, reason: str) -> str:
+    start = time.perf_counter()
+    insights = generate_local_insights(transcript)
+    record_route("local", reason, time.perf_counter() - start)
+    return insights
+
+
+def stream_pipeline(audio, meeting_id: str, whisper_model: str = None, speed_profile: str = None, language: str = None):
+    """
+    Streaming variant of run_pipeline. Yields (event, data) pairs: "transcript" once the
+    transcript is ready, "insights" for each chunk of generated text as Gemini produces it,
+    and "done" with the same payload run_pipeline returns, after the outputs are saved.
+
+    The transcript is saved before it is sent. If the client disconnects while insights
+    are streaming, the rest of the Gemini response is read without sending it, and the
+    insights are still cached and saved. Failures mark the meeting "failed" in the index,
+    as in run_pipeline.
+    """
+    try:
+        yield from _stream_pipeline(audio, meeting_id, whisper_model, speed_profile, language)
+    except Exception:
+        index_meeting(meeting_id, status="failed")
+        raise
+
+
+def _stream_pipeline(audio, meeting_id, whisper_model, speed_profile, language):
+    speed_profile = resolve_speed_profile(speed_profile)
+    transcript, transcript_cache_status = transcribe_stage(audio, meeting_id, whisper_model, speed_profile, language)
+    with stage_timer("save") as save_timer:
+        transcript_path = _save_output(save_transcript, transcript, meeting_id, "transcript")
+    save_seconds = save_timer.seconds
+
+    start = time.perf_counter()
+    engine, reason = route_insights(transcript)
+    insights_key = _insights_cache_key(transcript, engine)
+    insights = insights_cache.get(insights_key)
+    insights_cache_status = "miss" if insights is None else "hit"
+    insights_path = None
+    try:
+        yield "transcript", {"meetingId": meeting_id, "transcript": transcript, "cache": transcript_cache_status}
+        if insights is None and engine == "local":
+            insights = _generate_local(transcript, reason) # Fast enough to send as one chunk
+            insights_cache.put(insights_key, insights)
+        elif insights is None:
+            record_route(engine, reason)
+            logger.info("Starting streamed insight generation for meeting_id: %s...", meeting_id)
+            chunks = []
+            stream = generate_insights_stream(transcript)
+            try:
+                for chunk in stream:
+                    chunks.append(chunk)
+                    yield "insights", {"text": chunk}
+            except GeneratorExit:
+                logger.info("Client disconnected from meeting_id %s; finishing insights without streaming.", meeting_id)
+                try:
+                    chunks.extend(stream)
+                except Exception as e: # Nobody is left to report it to
+                    logger.error("Insight generation for meeting_id %s failed after the client disconnected: %s", meeting_id, e, exc_info=True)
+                    index_meeting(meeting_id, status="failed")
+                    raise GeneratorExit
+                insights = "".join(chunks)
+                insights_cache.put(insights_key, insights)
+                raise
+            insights = "".join(chunks)
+            insights_cache.put(insights_key, insights)
+        if insights_cache_status == "hit" or engine == "local":
+            yield "insights", {"text": insights}
+    finally:
+        if insights is not None:
+            elapsed = time.perf_counter() - start # Includes time the client took to read the chunks
+            STAGE_SECONDS.observe(elapsed, "insights", _insights_engine_model(engine))
+            index_meeting(meeting_id, geminiModel=_insights_engine_model(engine), timings={"insightsSeconds": round(elapsed, 3)})
+            with stage_timer("save") as save_timer:
+                insights_path = _save_output(save_insights, insights, meeting_id, "insights")
+            save_seconds += save_timer.seconds
+        index_meeting(meeting_id, timings={"saveSeconds": round(save_seconds, 3)})
+
+    yield "done", {
+        "status": "success",
+        "text": insights,
+        "meetingId": meeting_id,
+        "transcriptPath": transcript_path,
+        "insightsPath": insights_path,
+        "cache": {"transcript": transcript_cache_status, "insights": insights_cache_status},
+        "speedProfile": speed_profile,
+        "insightsEngine": engine,
+    }
+
+
+def run_insights_stage(transcript: str, meeting_id: str) -> dict:
+    """
+    Runs the part of the pipeline that follows transcription: cached insight generation
+    and saving of the transcript and insights. Used directly by callers that already hold
+    the transcript (e.g. live streams) and by run_pipeline.
+    """
+    engine, reason = route_insights(transcript)
+    with stage_timer("insights", model=_insights_engine_model(engine)) as insights_timer:
+        insights_key, insights = _cached_insights(transcript, meeting_id, engine, reason)
+        cache_status = "miss" if insights is None else "hit"
+        if insights is None:
+            if engine == "local":
+                insights = _generate_local(transcript, reason)
+            else:
+                record_route(engine, reason)
+                insights = generate_insights(transcript)
+            insights_cache.put(insights_key, insights)
+    return _finish_insights_stage(transcript, insights, meeting_id, engine, cache_status, insights_timer.seconds)
+
+
+async def run_insights_stage_async(transcript: str, meeting_id: str) -> dict:
+    """
+    Async variant of run_insights_stage for asyncio callers such as batch jobs. Gemini is
+    awaited through generate_insights_async; cache, index and storage work runs in worker
+    threads so it does not stall the event loop.
+    """
+    engine, reason = route_insights(transcript)
+    with stage_timer("insights", model=_insights_engine_model(engine)) as insights_timer:
+        insights_key, insights = await asyncio.to_thread(_cached_insights, transcript, meeting_id, engine, reason)
+        cache_status = "miss" if insights is None else "hit"
+        if insights is None:
+            if engine == "local":
+                insights = _generate_local(transcript, reason)
+            else:
+                record_route(engine, reason)
+                insights = await generate_insights_async(transcript)
+            await asyncio.to_thread(insights_cache.put, insights_key, insights)
+    return await asyncio.to_thread(_finish_insights_stage, transcript, insights, meeting_id, engine,
+                                   cache_status, insights_timer.seconds)
+
+
+def _cached_insights(transcript: str, meeting_id: str, engine: str, reason: str) -> tuple:
+    """Returns (cache key, cached insights or None) for a transcript and insights engine."""
+    insights_key = _insights_cache_key(transcript, engine)
+    insights = insights_cache.get(insights_key)
+    if insights is not None:
+        logger.info("Using cached insights for meeting_id: %s", meeting_id)
+    else:
+        logger.info("Starting insight generation for meeting_id: %s (engine: %s, %s)...", meeting_id, engine, reason)
+    return insights_key, insights
+
+
+def _finish_insights_stage(transcript: str, insights: str, meeting_id: str, engine: str, cache_status: str, seconds: float) -> dict:
+    """Indexes and saves the outputs of an insights stage and returns the response payload."""
+    index_meeting(meeting_id, geminiModel=_insights_engine_model(engine), timings={"insightsSeconds": round(seconds, 3)})
+
+    logger.info("Successfully processed audio and generated insights for meeting_id: %s.", meeting_id)
+
+    transcript_path, insights_path = save_meeting_outputs(transcript, insights, meeting_id)
+    return {
+        "status": "success",
+        "text": insights,
+        "meetingId": meeting_id,
+        "transcriptPath": transcript_path,
+        "insightsPath": insights_path,
+        "cache": {"insights": cache_status},
+        "insightsEngine": engine,
+    }
+
+
+def _save_output(save, text: str, meeting_id: str, kind: str):
+    """
+    Saves one output with save (save_transcript or save_insights) and returns its path,
+    or None if saving failed; storage errors are logged, not raised.
+    """
+    try:
+        logger.info("Attempting to save %s for meeting_id: %s", kind, meeting_id)
+        path = save(text, meeting_id)
+        logger.info("%s for meeting_id %s saved to: %s", kind.capitalize(), meeting_id, path)
+        return path
+    except FileStorageError as fse:
+        logger.error("File storage error when saving %s for meeting_id %s: %s", kind, meeting_id, fse.message, exc_info=True)
+        # Not re-raising, as successful processing but failed saving might still be a partial success for the user.
+    except Exception as e_save:
+        logger.error("Unexpected error during saving %s for meeting_id %s: %s", kind, meeting_id, e_save, exc_info=True)
+    return None
+
+
+def save_meeting_outputs(transcript: str, insights: str, meeting_id: str) -> tuple:
+    """
+    Saves transcript and insights using the storage service and returns their paths.
+    A path is None if saving it failed; storage errors are logged, not raised.
+    """
+    with stage_timer("save") as save_timer:
+        transcript_path = _save_output(save_transcript, transcript, meeting_id, "transcript")
+        insights_path = _save_output(save_insights, insights, meeting_id, "insights")
+    index_meeting(meeting_id, timings={"saveSeconds": round(save_timer.seconds, 3)})
+    return transcript_path, insights_path
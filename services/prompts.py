@@ -0,0 +1,120 @@
+import re
+import math
+
+# Version of the prompts below. Bump it whenever a template changes so cached
+# insights produced by an older prompt are no longer reused.
+PROMPT_VERSION = "2"
+
+# Rough characters-per-token ratio for English text with Gemini's tokenizer. Used to
+# plan prompts offline; the exact counts the API reports are logged after each call.
+CHARS_PER_TOKEN = 4
+
+SECTIONS_INSTRUCTIONS = """Provide:
+1. A short summary.
+2. Action items with responsible people.
+3. Sentiment of the overall meeting.
+4. Key insights or decisions made during the meeting.
+5. Number of participants.
+6. Any follow-up questions or topics that need further discussion.
+Please ensure the response is concise and structured."""
+
+EXAMPLE_RESPONSE = """Example response format:
+**1. Summary:** The meeting discussed YouTube's content recommendation algorithm.  The speaker argues that the algorithm reflects current global trends and individual user interests, aiming for diversity while prioritizing relevance.  A disagreement exists regarding the algorithm's transparency and control over content selection.
+
+**2. Action Items:** None explicitly stated in the transcript.
+
+**3. Sentiment:**  The overall sentiment is a mix of explanatory and slightly defensive regarding the YouTube algorithm.  There's an underlying tension between the algorithm's design goals and concerns about content control and transparency.
+
+**4. Key Insights/Decisions:** No concrete decisions were made. The key insight is the speaker's perspective on the algorithm's design philosophy: prioritizing relevance and reflecting real-world trends over strict content selection.
+
+**5. Number of Participants:**  The transcript indicates at least two participants,  one speaking and at least one listening ("you can choose an additive...").  The exact number is unknown.
+
+**6. Follow-up Questions/Topics:**
+* Clarification on the "additive" mentioned. What is it, and how does it relate to content creators seeing what should be shown?
+* Deeper discussion on balancing diversity and relevance in the algorithm.
+* Addressing concerns about the algorithm's lack of transparency and control for content creators.
+* Exploring methods to improve the algorithm's responsiveness to user feedback."""
+
+INSIGHTS_TEMPLATE = """
+Here is a meeting transcript:
+{transcript}
+
+{instructions}
+
+{example}
+"""
+
+# Map step: condense one part of a long transcript into notes the reduce step can merge.
+MAP_TEMPLATE = """
+Here is part {index} of {total} of a meeting transcript:
+{transcript}
+
+Write compact notes on this part only, covering: what was discussed, action items with
+responsible people, the tone of the conversation, decisions made, the names or roles of
+everyone who speaks, and open questions. Do not invent information that is not in the text.
+"""
+
+# Reduce step: turn the per-part notes into the usual six-section insights.
+REDUCE_TEMPLATE = """
+Here are notes taken on consecutive parts of a single meeting transcript:
+{notes}
+
+Combine them into insights for the whole meeting. Count each participant once, even if they appear in several parts.
+{instructions}
+
+{example}
+"""
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens Gemini will count for text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def build_insights_prompt(transcript: str) -> str:
+    """Builds the single-call insights prompt for a whole transcript."""
+    return INSIGHTS_TEMPLATE.format(transcript=transcript, instructions=SECTIONS_INSTRUCTIONS, example=EXAMPLE_RESPONSE)
+
+
+def build_map_prompt(transcript_part: str, index: int, total: int) -> str:
+    """Builds the prompt that summarizes one part of a long transcript."""
+    return MAP_TEMPLATE.format(transcript=transcript_part, index=index, total=total)
+
+
+def build_reduce_prompt(notes: list) -> str:
+    """Builds the prompt that merges per-part notes into the final insights."""
+    joined = "\n\n".join(f"--- Part {i} ---\n{note.strip()}" for i, note in enumerate(notes, start=1))
+    return REDUCE_TEMPLATE.format(notes=joined, instructions=SECTIONS_INSTRUCTIONS, example=EXAMPLE_RESPONSE)
+
+
+def transcript_token_budget(total_budget: int) -> int:
+    """Returns how many transcript tokens fit in a single-call prompt within total_budget."""
+    overhead = estimate_tokens(build_insights_prompt(""))
+    return max(1, total_budget - overhead)
+
+
+def split_transcript(transcript: str, max_tokens: int) -> list:
+    """
+    Splits a transcript into parts of at most max_tokens (estimated), breaking at
+    sentence boundaries. A single sentence longer than the budget is split by characters.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    current = ""
+    for sentence in _SENTENCE_BOUNDARY.split(transcript.strip()):
+        while len(sentence) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            parts.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        parts.append(current)
+    return parts
@@ -0,0 +1,119 @@
+"""
+int8 dynamically quantized Whisper models for CPU-only nodes.
+
+A model name with the "-int8" suffix (e.g. WHISPER_MODEL=base-int8, or ?model=small-int8
+when allowed) loads the named Whisper model with its Linear layers (attention projections
+and MLPs, most of the weights) converted to int8 with torch dynamic quantization.
+Activations stay fp32 and are quantized on the fly, so the model keeps the regular
+Whisper interface: model.transcribe(), whisper.decode() and the kv-cache hooks all work.
+
+The first load converts the fp32 checkpoint and saves the quantized weights (the model
+dimensions and state_dict, no pickled code) under WHISPER_QUANTIZED_DIR. The file name
+includes the torch version, because the packed int8 weights are tied to it. Later loads
+build an empty model of those dimensions, quantize it so its layers have the right types,
+and fill in the saved weights with torch.load(weights_only=True), skipping the fp32
+checkpoint. A tampered cache file therefore cannot run code; at worst it fails to load
+and the model is converted again.
+"""
+import os
+import time
+import tempfile
+
+from utils.logger import logger
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import WHISPER_QUANTIZED_DIR as DEFAULT_WHISPER_QUANTIZED_DIR
+except ImportError:
+    logger.warning("config.py not found, using default WHISPER_QUANTIZED_DIR.")
+    DEFAULT_WHISPER_QUANTIZED_DIR = None
+
+QUANTIZED_SUFFIX = "-int8"
+
+# Next to Whisper's own downloads (~/.cache/whisper) unless configured
+WHISPER_QUANTIZED_DIR = os.environ.get("WHISPER_QUANTIZED_DIR", DEFAULT_WHISPER_QUANTIZED_DIR or "") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "whisper")
+
+
+def is_quantized(name):
+    return bool(name) and name.endswith(QUANTIZED_SUFFIX)
+
+
+def base_model_name(name):
+    """The fp32 Whisper model a quantized name is built from ("base-int8" -> "base")."""
+    return name[:-len(QUANTIZED_SUFFIX)] if is_quantized(name) else name
+
+
+def quantized_path(name, cache_dir=None):
+    import torch
+    torch_version = torch.__version__.split("+")[0]
+    return os.path.join(cache_dir or WHISPER_QUANTIZED_DIR, f"{base_model_name(name)}{QUANTIZED_SUFFIX}-torch{torch_version}.weights.pt")
+
+
+def quantize_model(model):
+    """Converts a loaded fp32 Whisper model's Linear layers to int8, in place. Returns the model."""
+    import torch
+    import whisper.model
+
+    # Whisper's Linear subclass only adds a dtype cast (a no-op for fp32 on CPU); the
+    # quantizer only converts modules whose type is exactly nn.Linear.
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _save_atomic(model, path):
+    import dataclasses
+    import torch
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save({"dims": dataclasses.asdict(model.dims), "state_dict": model.state_dict()}, f)
+        os.replace(temp_path, path) # Other workers never see a partial file
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _load_cached(name, path):
+    """Rebuilds the int8 model from weights saved by _save_atomic."""
+    import torch
+    import whisper
+    import whisper.model
+
+    checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+    model = quantize_model(whisper.model.Whisper(whisper.model.ModelDimensions(**checkpoint["dims"])))
+    model.load_state_dict(checkpoint["state_dict"])
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(base_model_name(name))
+    if alignment_heads is not None: # Not part of the state_dict; whisper.load_model sets it the same way
+        model.set_alignment_heads(alignment_heads)
+    return model
+
+
+def load_quantized_model(name, cache_dir=None):
+    """Returns the int8 model for name ("base-int8"), converting and caching it on first use."""
+    path = quantized_path(name, cache_dir)
+    if os.path.exists(path):
+        start = time.perf_counter()
+        try:
+            model = _load_cached(name, path)
+            logger.info("Loaded quantized Whisper model '%s' from %s in %.2fs.", name, path, time.perf_counter() - start)
+            return model
+        except Exception as e:
+            logger.warning("Could not load quantized Whisper model from %s (%s); converting again.", path, e)
+
+    import whisper
+    start = time.perf_counter()
+    model = quantize_model(whisper.load_model(base_model_name(name), device="cpu"))
+    logger.info("Quantized Whisper model '%s' to int8 in %.2fs.", base_model_name(name), time.perf_counter() - start)
+    try:
+        _save_atomic(model, path)
+        logger.info("Saved quantized Whisper model to %s.", path)
+    except OSError as e:
+        logger.warning("Could not save quantized Whisper model to %s: %s", path, e)
+    return model
@@ -0,0 +1,164 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+from utils.logger import logger
+from utils.metrics import CACHE_LOOKUPS
+from services.storage_service import OUTPUT_BASE_DIR
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        ENABLE_RESULT_CACHE as DEFAULT_ENABLE_RESULT_CACHE,
+        TRANSCRIPT_CACHE_MAX_BYTES as DEFAULT_TRANSCRIPT_CACHE_MAX_BYTES,
+        INSIGHTS_CACHE_MAX_BYTES as DEFAULT_INSIGHTS_CACHE_MAX_BYTES,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default result cache settings.")
+    DEFAULT_ENABLE_RESULT_CACHE = True
+    DEFAULT_TRANSCRIPT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_INSIGHTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+ENABLE_RESULT_CACHE = os.environ.get("ENABLE_RESULT_CACHE", str(DEFAULT_ENABLE_RESULT_CACHE)).lower() in ['true', '1', 't']
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", DEFAULT_TRANSCRIPT_CACHE_MAX_BYTES))
+INSIGHTS_CACHE_MAX_BYTES = int(os.environ.get("INSIGHTS_CACHE_MAX_BYTES", DEFAULT_INSIGHTS_CACHE_MAX_BYTES))
+
+# Caches live next to output/meetings, i.e. output/cache/<name>/
+CACHE_BASE_DIR = os.path.join(os.path.dirname(OUTPUT_BASE_DIR), "cache")
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    """Returns the SHA-256 hex digest of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Builds a cache key from the given string parts (content hash, model name, ...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0") # Separator so ("ab", "c") and ("a", "bc") differ
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded, content-addressed text cache stored as one file per entry.
+
+    Recency is tracked through file modification times: a hit touches the entry and
+    eviction removes the least recently used files until the cache fits max_bytes.
+    Because state lives on disk, all gunicorn workers share the same cache.
+
+    Each process keeps a running total (the last directory scan plus its own writes) and
+    only rescans the directory once that total exceeds max_bytes, so a put does not stat
+    every entry. Writes by other workers are seen at the next rescan, so with N workers
+    the directory can grow to about N * max_bytes before one of them evicts.
+    """
+
+    def __init__(self, name, max_bytes, suffix=".txt", enabled=ENABLE_RESULT_CACHE):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.enabled = enabled
+        self.cache_dir = os.path.join(CACHE_BASE_DIR, name)
+        self._lock = threading.Lock()
+        self._total_bytes = None # Estimated size on disk; None until the first scan
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def get(self, key):
+        """Returns the cached text for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            os.utime(path) # Mark as most recently used
+            logger.info("%s cache hit for key %s...", self.name, key[:12])
+            CACHE_LOOKUPS.inc(1, self.name, "hit")
+            return content
+        except FileNotFoundError:
+            logger.debug("%s cache miss for key %s...", self.name, key[:12])
+            CACHE_LOOKUPS.inc(1, self.name, "miss")
+            return None
+        except OSError as e:
+            # A broken cache must never fail the request; treat it as a miss.
+            logger.error("Error reading %s cache entry %s: %s", self.name, path, e, exc_info=True)
+            return None
+
+    def put(self, key, content):
+        """Stores content under key and evicts old entries if the cache is over its size bound."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial entry.
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content)
+                size = os.path.getsize(temp_path)
+                old_size = self._entry_size(path)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            logger.debug("Stored %s cache entry %s...", self.name, key[:12])
+            self._added(size - old_size)
+        except OSError as e:
+            logger.error("Error writing %s cache entry %s: %s", self.name, path, e, exc_info=True)
+
+    @staticmethod
+    def _entry_size(path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def _added(self, num_bytes):
+        """Adds a write to the running total; scans and evicts only once it is over max_bytes."""
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += num_bytes
+                if self._total_bytes <= self.max_bytes:
+                    return
+            self._total_bytes = self._evict()
+
+    def _evict(self):
+        """Evicts least recently used entries until the cache fits; returns the bytes left."""
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(self.suffix):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_bytes += stat.st_size
+        if total_bytes <= self.max_bytes:
+            return total_bytes
+        entries.sort() # Oldest (least recently used) first
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+                logger.debug("Evicted %s cache entry %s", self.name, path)
+            except FileNotFoundError:
+                total_bytes -= size # Another worker evicted it first
+        return total_bytes
+
+
+transcript_cache = ResultCache("transcripts", TRANSCRIPT_CACHE_MAX_BYTES, suffix=".txt")
+insights_cache = ResultCache("insights", INSIGHTS_CACHE_MAX_BYTES, suffix=".md")
@@ -0,0 +1,617 @@
+"""
+Full-text search over stored transcripts and insights.
+
+The index is a set of immutable segment files under SEARCH_INDEX_DIR. save_transcript and
+save_insights hand each document to a background indexer thread, which writes the
+documents queued so far as one new segment, so saving never waits on indexing. Segments
+are merged in the background by size tier: once SEARCH_MERGE_FACTOR segments fall in the
+same tier (sizes within a factor of SEARCH_MERGE_FACTOR of each other), they are merged
+into one segment of the next tier, so each document is rewritten about log(N) times. If
+there are still more than SEARCH_MAX_SEGMENTS segments, the smallest ones are merged.
+Superseded versions of a document are dropped during the merge. Queries memory-map the
+segments and binary-search their sorted term tables, so a lookup reads only the postings
+of the query terms. The map of live documents and the BM25 length statistics are updated
+as segments come and go, so a query costs only the postings it reads.
+
+Segment layout (little-endian):
+    header   magic, term count, doc count, offsets of the term table and doc table
+    postings per term and per doc: varint doc delta, varint tf, tf varint position deltas
+    terms    UTF-8 terms, sorted bytewise
+    term table  fixed-size entries (term offset, term length, postings offset/length, df)
+    doc table   JSON list of [meeting_id, field, version, length]
+
+Rebuild the index from output/meetings (e.g. after deleting it) with:
+
+    python -m services.search_index rebuild
+"""
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import time
+import queue
+import atexit
+import struct
+import threading
+try:
+    import fcntl
+except ImportError: # Not on POSIX: merges are not locked across processes
+    fcntl = None
+
+from utils.logger import logger
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        ENABLE_SEARCH_INDEX as DEFAULT_ENABLE_SEARCH_INDEX,
+        SEARCH_INDEX_DIR as DEFAULT_SEARCH_INDEX_DIR,
+        SEARCH_MAX_SEGMENTS as DEFAULT_SEARCH_MAX_SEGMENTS,
+        SEARCH_MERGE_FACTOR as DEFAULT_SEARCH_MERGE_FACTOR,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default search index settings.")
+    DEFAULT_ENABLE_SEARCH_INDEX = True
+    DEFAULT_SEARCH_INDEX_DIR = "output/search_index"
+    DEFAULT_SEARCH_MAX_SEGMENTS = 8
+    DEFAULT_SEARCH_MERGE_FACTOR = 4
+
+ENABLE_SEARCH_INDEX = os.environ.get("ENABLE_SEARCH_INDEX", str(DEFAULT_ENABLE_SEARCH_INDEX)).lower() in ['true', '1', 't', 'yes']
+SEARCH_INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", DEFAULT_SEARCH_INDEX_DIR)
+SEARCH_MAX_SEGMENTS = max(1, int(os.environ.get("SEARCH_MAX_SEGMENTS", DEFAULT_SEARCH_MAX_SEGMENTS)))
+SEARCH_MERGE_FACTOR = max(2, int(os.environ.get("SEARCH_MERGE_FACTOR", DEFAULT_SEARCH_MERGE_FACTOR)))
+
+SEGMENT_MAGIC = b"NNSEG001"
+HEADER = struct.Struct("<8sIIQQQ") # magic, n_terms, n_docs, terms_offset, term_table_offset, doc_table_offset
+TERM_ENTRY = struct.Struct("<QHQII") # term offset, term length, postings offset, postings length, df
+SEGMENT_SUFFIX = ".seg"
+TIER_FLOOR_BYTES = 64 * 1024 # Segments up to this size share the lowest merge tier
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+FIELDS = ("transcript", "insights")
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(data):
+    """Decodes one term's postings into a list of (local_doc_id, positions)."""
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    postings = []
+    doc_id = 0
+    i = 0
+    while i < len(values):
+        doc_id += values[i]
+        tf = values[i + 1]
+        positions = []
+        position = 0
+        for delta in values[i + 2:i + 2 + tf]:
+            position += delta
+            positions.append(position)
+        postings.append((doc_id, positions))
+        i += 2 + tf
+    return postings
+
+
+def write_segment(path, docs, postings):
+    """
+    Writes a segment atomically. docs is a list of (meeting_id, field, version, length);
+    postings maps term -> list of (local_doc_id, positions) in ascending doc id order.
+    """
+    blob = bytearray()
+    entries = []
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    for term in terms:
+        start = len(blob)
+        previous_doc = 0
+        for doc_id, positions in postings[term]:
+            _encode_varint(doc_id - previous_doc, blob)
+            _encode_varint(len(positions), blob)
+            previous_position = 0
+            for position in positions:
+                _encode_varint(position - previous_position, blob)
+                previous_position = position
+            previous_doc = doc_id
+        entries.append((start, len(blob) - start, len(postings[term])))
+
+    terms_blob = bytearray()
+    term_offsets = []
+    for term in terms:
+        encoded = term.encode("utf-8")
+        term_offsets.append((len(terms_blob), len(encoded)))
+        terms_blob += encoded
+
+    postings_offset = HEADER.size
+    terms_offset = postings_offset + len(blob)
+    term_table_offset = terms_offset + len(terms_blob)
+    doc_table_offset = term_table_offset + TERM_ENTRY.size * len(terms)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(SEGMENT_MAGIC, len(terms), len(docs), terms_offset, term_table_offset, doc_table_offset))
+        f.write(blob)
+        f.write(terms_blob)
+        for (term_start, term_length), (start, length, df) in zip(term_offsets, entries):
+            f.write(TERM_ENTRY.pack(terms_offset + term_start, term_length, postings_offset + start, length, df))
+        f.write(json.dumps(docs).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def build_postings(documents):
+    """documents: list of (meeting_id, field, version, tokens). Returns (docs, postings) for write_segment."""
+    docs = []
+    postings = {}
+    for doc_id, (meeting_id, field, version, tokens) in enumerate(documents):
+        docs.append([meeting_id, field, version, len(tokens)])
+        positions_by_term = {}
+        for position, token in enumerate(tokens):
+            positions_by_term.setdefault(token, []).append(position)
+        for term, positions in positions_by_term.items():
+            postings.setdefault(term, []).append((doc_id, positions))
+    return docs, postings
+
+
+class Segment:
+    """A memory-mapped, read-only segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_terms, self.n_docs, self._terms_offset, self._term_table_offset, doc_table_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not a search index segment.")
+        self.docs = json.loads(self._mm[doc_table_offset:].decode("utf-8"))
+
+    def _entry(self, index):
+        return TERM_ENTRY.unpack_from(self._mm, self._term_table_offset + index * TERM_ENTRY.size)
+
+    def _term_at(self, index):
+        term_offset, term_length, _, _, _ = self._entry(index)
+        return self._mm[term_offset:term_offset + term_length]
+
+    def postings(self, term):
+        """Binary-searches the term table; returns [(local_doc_id, positions)] or []."""
+        key = term.encode("utf-8")
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_terms and self._term_at(low) == key:
+            _, _, offset, length, _ = self._entry(low)
+            return _decode_postings(self._mm[offset:offset + length])
+        return []
+
+    def iter_terms(self):
+        """Yields (term, postings) for every term, in order. Used when merging."""
+        for index in range(self.n_terms):
+            term_offset, term_length, offset, length, _ = self._entry(index)
+            term = self._mm[term_offset:term_offset + term_length].decode("utf-8")
+            yield term, _decode_postings(self._mm[offset:offset + length])
+
+    def close(self):
+        self._mm.close()
+
+
+class SearchIndex:
+    """
+    Segment-based BM25 index shared by all workers through the files in index_dir.
+    Each process writes its own segments; queries read every segment in the directory.
+    """
+
+    def __init__(self, index_dir=SEARCH_INDEX_DIR, max_segments=SEARCH_MAX_SEGMENTS, merge_factor=SEARCH_MERGE_FACTOR, enabled=ENABLE_SEARCH_INDEX):
+        self.index_dir = index_dir
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._segments = {} # name -> Segment
+        self._live = {} # (meeting_id, field) -> (version, segment name, local doc id, length)
+        self._live_docs = {} # (segment name, local doc id) -> (meeting_id, field), for live documents only
+        self._field_totals = {field: [0, 0] for field in FIELDS} # field -> [live documents, total length]
+        self._worker_pid = None
+        self._queue = None
+        self._sequence = 0
+
+    # --- Indexing ---
+
+    def add_document(self, meeting_id, field, text):
+        """Queues a document for indexing and returns immediately. A newer version replaces older ones."""
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        self._queue.put((meeting_id, field, time.time_ns(), text))
+
+    def _ensure_worker(self):
+        # Started lazily, and again after a fork: threads do not survive into gunicorn workers.
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._run_worker, args=(self._queue,), name="search-indexer", daemon=True)
+            thread.start()
+            atexit.register(self._drain, self._queue)
+            self._worker_pid = os.getpid()
+
+    def _drain(self, work_queue):
+        """Indexes whatever is still queued when the process exits."""
+        documents = []
+        while True:
+            try:
+                documents.append(work_queue.get_nowait())
+            except queue.Empty:
+                break
+        if documents:
+            self._write_documents(documents)
+
+    def _run_worker(self, work_queue):
+        while True:
+            documents = [work_queue.get()]
+            while True:
+                try:
+                    documents.append(work_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_documents(documents)
+                self.maybe_merge()
+            except Exception as e:
+                logger.error("Search indexer failed for %s documents: %s", len(documents), e, exc_info=True)
+
+    def _new_segment_path(self):
+        self._sequence += 1
+        return os.path.join(self.index_dir, f"{time.time_ns():020d}_{os.getpid()}_{self._sequence}{SEGMENT_SUFFIX}")
+
+    def _write_documents(self, documents):
+        os.makedirs(self.index_dir, exist_ok=True)
+        start = time.perf_counter()
+        docs, postings = build_postings([(m, f, v, tokenize(text)) for m, f, v, text in documents])
+        path = self._new_segment_path()
+        write_segment(path, docs, postings)
+        logger.debug("Indexed %s documents into %s in %.1f ms.", len(docs), path, (time.perf_counter() - start) * 1000)
+        return path
+
+    def _tier(self, size):
+        return int(math.log(max(size, TIER_FLOOR_BYTES) / TIER_FLOOR_BYTES, self.merge_factor))
+
+    def _next_merge(self, names):
+        """Returns the segments to merge next, or [] if the index is in shape."""
+        sizes = {}
+        for name in names:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.index_dir, name))
+            except FileNotFoundError:
+                continue
+        tiers = {}
+        for name, size in sizes.items():
+            tiers.setdefault(self._tier(size), []).append(name)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return sorted(tiers[tier], key=sizes.get)[:self.merge_factor]
+        if len(sizes) > self.max_segments:
+            return sorted(sizes, key=sizes.get)[:max(2, len(sizes) - self.max_segments + 1)]
+        return []
+
+    def maybe_merge(self):
+        """
+        Merges segments while a size tier holds merge_factor of them or there are more
+        than max_segments. A lock file keeps workers from merging at the same time; if
+        another one holds it, this skips.
+        """
+        if not self._next_merge(self._list_segment_names()):
+            return
+        with open(os.path.join(self.index_dir, "merge.lock"), "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            try:
+                while True:
+                    names = self._next_merge(self._list_segment_names())
+                    if not names:
+                        break
+                    self._merge(names)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge(self, names):
+        start = time.perf_counter()
+        segments = []
+        for name in names:
+            try:
+                segments.append(Segment(os.path.join(self.index_dir, name)))
+            except FileNotFoundError:
+                continue
+        # Keep only the newest version of each document among the merged segments.
+        newest = {}
+        for segment in segments:
+            for local_id, (meeting_id, field, version, length) in enumerate(segment.docs):
+                key = (meeting_id, field)
+                if key not in newest or version > newest[key][0]:
+                    newest[key] = (version, segment.name, local_id)
+        docs = []
+        remap = {}
+        for key, (version, name, local_id) in sorted(newest.items(), key=lambda item: item[1][0]):
+            remap[(name, local_id)] = len(docs)
+            segment_docs = next(segment.docs for segment in segments if segment.name == name)
+            docs.append(segment_docs[local_id])
+        postings = {}
+        for segment in segments:
+            for term, term_postings in segment.iter_terms():
+                for local_id, positions in term_postings:
+                    doc_id = remap.get((segment.name, local_id))
+                    if doc_id is not None:
+                        postings.setdefault(term, []).append((doc_id, positions))
+        for term_postings in postings.values():
+            term_postings.sort(key=lambda posting: posting[0])
+        # Name the result after the newest input so directory order stays chronological.
+        path = os.path.join(self.index_dir, f"{max(names).split('_')[0]}_{os.getpid()}_m{self._sequence}{SEGMENT_SUFFIX}")
+        self._sequence += 1
+        write_segment(path, docs, postings)
+        # The merged segment is in place before the inputs disappear, so no query misses documents.
+        for segment in segments:
+            segment.close()
+            try:
+                os.remove(segment.path)
+            except FileNotFoundError:
+                pass
+        logger.info("Merged %s search segments (%s documents) in %.1f ms.", len(segments), len(docs), (time.perf_counter() - start) * 1000)
+
+    def rebuild(self, base_dir):
+        """
+        Re-indexes every stored meeting under base_dir into one segment and then removes
+        the segments that existed before. Runs offline; searches keep using the old
+        segments until the new one is in place.
+        """
+        from services.storage_service import read_text # Lazy: storage_service imports this module
+
+        existing = self._list_segment_names()
+        documents = []
+        for entry in os.scandir(base_dir):
+            if not entry.is_dir():
+                continue
+            for field, suffix in (("transcript", "_transcript.txt"), ("insights", "_insights.md")):
+                path = os.path.join(entry.path, f"{entry.name}{suffix}")
+                if os.path.exists(path):
+                    documents.append((entry.name, field, os.stat(path).st_mtime_ns, read_text(path)))
+        if documents:
+            self._write_documents(documents)
+        for name in existing:
+            try:
+                os.remove(os.path.join(self.index_dir, name))
+            except FileNotFoundError:
+                pass
+        logger.info("Rebuilt search index from %s: %s documents.", base_dir, len(documents))
+        return len(documents)
+
+    # --- Querying ---
+
+    def _list_segment_names(self):
+        try:
+            return sorted(name for name in os.listdir(self.index_dir) if name.endswith(SEGMENT_SUFFIX))
+        except FileNotFoundError:
+            return []
+
+    def _set_live(self, key, entry):
+        previous = self._live.get(key)
+        totals = self._field_totals.setdefault(key[1], [0, 0])
+        if previous is None:
+            totals[0] += 1
+        else:
+            totals[1] -= previous[3]
+            del self._live_docs[(previous[1], previous[2])]
+        totals[1] += entry[3]
+        self._live[key] = entry
+        self._live_docs[(entry[1], entry[2])] = key
+
+    def _recompute_live(self):
+        self._live = {}
+        self._live_docs = {}
+        self._field_totals = {field: [0, 0] for field in FIELDS}
+        for name in sorted(self._segments):
+            for local_id, (meeting_id, field, version, length) in enumerate(self._segments[name].docs):
+                live = self._live.get((meeting_id, field))
+                if live is None or version > live[0]:
+                    self._set_live((meeting_id, field), (version, name, local_id, length))
+
+    def _refresh(self):
+        """
+        Opens new segments and drops removed ones, updating the live document map and the
+        length totals from the changed segments only. A merged segment carries the same
+        versions as its inputs, so it takes over their live documents. If a removed segment
+        still held live documents (e.g. after a rebuild), the map is recomputed.
+        """
+        names = self._list_segment_names()
+        with self._lock:
+            if set(names) == set(self._segments):
+                return
+            removed = set(self._segments) - set(names)
+            for name in names:
+                if name in self._segments:
+                    continue
+                try:
+                    segment = Segment(os.path.join(self.index_dir, name))
+                except (FileNotFoundError, ValueError):
+                    continue # Removed by a merge since the listing, or a foreign file
+                self._segments[name] = segment
+                for local_id, (meeting_id, field, version, length) in enumerate(segment.docs):
+                    live = self._live.get((meeting_id, field))
+                    if live is None or version > live[0] or (version == live[0] and live[1] in removed):
+                        self._set_live((meeting_id, field), (version, name, local_id, length))
+            orphaned = False
+            for name in removed:
+                # Not closed explicitly: a concurrent query may still be reading it. The
+                # mapping is released once the last reference goes away.
+                segment = self._segments.pop(name)
+                orphaned = orphaned or any((name, local_id) in self._live_docs for local_id in range(len(segment.docs)))
+            if orphaned:
+                self._recompute_live()
+
+    def search(self, query, limit=10, field=None):
+        """
+        BM25 search. Bare words match any document containing them; "quoted phrases" only
+        match documents containing the words consecutively. Returns up to limit meetings,
+        best first, each with its score, matching fields and a snippet.
+        """
+        start = time.perf_counter()
+        self._refresh()
+        phrases = []
+        terms = []
+        for phrase, word in QUERY_PATTERN.findall(query):
+            tokens = tokenize(phrase if phrase else word)
+            if phrase and len(tokens) > 1:
+                phrases.append(tokens)
+            terms.extend(tokens)
+        terms = list(dict.fromkeys(terms))
+        if not terms:
+            return {"query": query, "total": 0, "results": [], "elapsedMs": 0.0}
+
+        with self._lock:
+            segments = list(self._segments.items())
+        postings = {term: [(name, segment.postings(term)) for name, segment in segments] for term in terms}
+
+        # term -> {doc key: positions}, live documents only
+        matches = {}
+        lengths = {}
+        with self._lock:
+            totals = [self._field_totals.get(field, [0, 0])] if field is not None else self._field_totals.values()
+            total_docs = sum(count for count, _ in totals)
+            average_length = sum(length for _, length in totals) / total_docs if total_docs else 0.0
+            for term, segment_postings in postings.items():
+                term_matches = {}
+                for name, term_postings in segment_postings:
+                    for local_id, positions in term_postings:
+                        key = self._live_docs.get((name, local_id))
+                        if key is not None and (field is None or key[1] == field):
+                            term_matches[key] = positions
+                            lengths[key] = self._live[key][3]
+                matches[term] = term_matches
+
+        scores = {}
+        for term, term_matches in matches.items():
+            df = len(term_matches)
+            if not df:
+                continue
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            for key, positions in term_matches.items():
+                tf = len(positions)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[key] / average_length) if average_length else BM25_K1
+                scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        for phrase in phrases:
+            scores = {key: score for key, score in scores.items() if _phrase_position(matches, phrase, key) is not None}
+
+        by_meeting = {}
+        for (meeting_id, doc_field), score in scores.items():
+            result = by_meeting.setdefault(meeting_id, {"meetingId": meeting_id, "score": 0.0, "fields": []})
+            result["fields"].append(doc_field)
+            if score > result["score"]:
+                result["score"] = score
+                result["_best"] = (meeting_id, doc_field)
+        ranked = sorted(by_meeting.values(), key=lambda result: result["score"], reverse=True)
+
+        results = []
+        for result in ranked[:limit]:
+            best = result.pop("_best")
+            result["score"] = round(result["score"], 4)
+            result["fields"].sort()
+            result["snippet"] = self._snippet(best, matches, phrases, terms)
+            results.append(result)
+        return {
+            "query": query,
+            "total": len(ranked),
+            "results": results,
+            "elapsedMs": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def _snippet(self, key, matches, phrases, terms, before=8, after=16):
+        """Returns the text around the first match in the stored document, or None if it is gone."""
+        from services.storage_service import load_text_from_file # Lazy: storage_service imports this module
+
+        meeting_id, field = key
+        filename = f"{meeting_id}_transcript.txt" if field == "transcript" else f"{meeting_id}_insights.md"
+        try:
+            text = load_text_from_file(filename, subdirectory=meeting_id)
+        except Exception:
+            return None
+        if text is None:
+            return None
+        position = None
+        for phrase in phrases:
+            position = _phrase_position(matches, phrase, key)
+            if position is not None:
+                break
+        if position is None:
+            candidates = [matches[term][key][0] for term in terms if key in matches[term]]
+            position = min(candidates) if candidates else 0
+        spans = [m.span() for m in TOKEN_PATTERN.finditer(text)]
+        if not spans:
+            return None
+        first = spans[max(0, position - before)][0]
+        last = spans[min(len(spans) - 1, position + after)][1]
+        snippet = " ".join(text[first:last].split())
+        return ("... " if first > 0 else "") + snippet + (" ..." if last < len(text.rstrip()) else "")
+
+
+def _phrase_position(matches, phrase, key):
+    """Position where the phrase starts in the document, or None if it does not occur."""
+    position_sets = []
+    for term in phrase:
+        positions = matches.get(term, {}).get(key)
+        if not positions:
+            return None
+        position_sets.append(positions if not position_sets else set(positions))
+    for start in position_sets[0]:
+        if all(start + offset in positions for offset, positions in enumerate(position_sets[1:], 1)):
+            return start
+    return None
+
+
+search_index = SearchIndex()
+
+
+def main(argv):
+    if len(argv) != 1 or argv[0] != "rebuild":
+        print("Usage: python -m services.search_index rebuild")
+        return 2
+    from services.storage_service import OUTPUT_BASE_DIR
+    count = search_index.rebuild(OUTPUT_BASE_DIR)
+    print(f"Indexed {count} documents from {OUTPUT_BASE_DIR} into {search_index.index_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
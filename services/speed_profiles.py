@@ -0,0 +1,147 @@
+"""
+Named transcription speed profiles, selected per request with ?profile= on /recorded-audio.
+
+    fast      tiny model, greedy decoding, no temperature fallback, no conditioning on
+              the previous window (interactive uploads)
+    balanced  the default model with Whisper's default decoding (greedy with temperature
+              fallback); the same output as before profiles existed
+    accurate  small model, beam search (5 beams) with temperature fallback (background jobs)
+
+An explicit ?model= still wins over the profile's model. ?language= (or
+TRANSCRIPTION_LANGUAGE) skips Whisper's language detection pass for every profile.
+
+Profiles do not change torch's thread count: torch.set_num_threads is process-wide, so a
+per-request value would be overwritten by whichever transcription started last. Each
+worker process sets TORCH_THREADS once, before its first transcription.
+"""
+import os
+import threading
+
+from utils.logger import logger
+from services.model_registry import WHISPER_MODEL_NAME, WHISPER_ALLOWED_MODELS
+from services.admission import MAX_CONCURRENT_TRANSCRIPTIONS
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        DEFAULT_SPEED_PROFILE as CONFIG_DEFAULT_SPEED_PROFILE,
+        BACKGROUND_SPEED_PROFILE as DEFAULT_BACKGROUND_SPEED_PROFILE,
+        SPEED_PROFILE_FAST_MODEL as DEFAULT_SPEED_PROFILE_FAST_MODEL,
+        SPEED_PROFILE_ACCURATE_MODEL as DEFAULT_SPEED_PROFILE_ACCURATE_MODEL,
+        TRANSCRIPTION_LANGUAGE as DEFAULT_TRANSCRIPTION_LANGUAGE,
+        TORCH_THREADS as DEFAULT_TORCH_THREADS,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default speed profile settings.")
+    CONFIG_DEFAULT_SPEED_PROFILE = "balanced"
+    DEFAULT_BACKGROUND_SPEED_PROFILE = None
+    DEFAULT_SPEED_PROFILE_FAST_MODEL = "tiny"
+    DEFAULT_SPEED_PROFILE_ACCURATE_MODEL = "small"
+    DEFAULT_TRANSCRIPTION_LANGUAGE = None
+    DEFAULT_TORCH_THREADS = 0
+
+DEFAULT_SPEED_PROFILE = os.environ.get("DEFAULT_SPEED_PROFILE", CONFIG_DEFAULT_SPEED_PROFILE)
+# Profile for ?async=true jobs that do not ask for one
+BACKGROUND_SPEED_PROFILE = os.environ.get("BACKGROUND_SPEED_PROFILE", DEFAULT_BACKGROUND_SPEED_PROFILE or "") or DEFAULT_SPEED_PROFILE
+TRANSCRIPTION_LANGUAGE = os.environ.get("TRANSCRIPTION_LANGUAGE", DEFAULT_TRANSCRIPTION_LANGUAGE or "") or None
+# Torch intra-op threads per transcription; 0 splits the cores across the machine-wide
+# transcription slots, so MAX_CONCURRENT_TRANSCRIPTIONS running at once fill the CPU
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", DEFAULT_TORCH_THREADS)) or max(
+    1, (os.cpu_count() or 1) // MAX_CONCURRENT_TRANSCRIPTIONS)
+
+WHISPER_DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+SPEED_PROFILES = {
+    "fast": {
+        "model": os.environ.get("SPEED_PROFILE_FAST_MODEL", DEFAULT_SPEED_PROFILE_FAST_MODEL),
+        "beam_size": None,
+        "best_of": None,
+        "temperature": 0.0, # A single greedy pass, even if it looks repetitive
+        "condition_on_previous_text": False,
+    },
+    "balanced": {
+        "model": WHISPER_MODEL_NAME,
+        "beam_size": None,
+        "best_of": None,
+        "temperature": WHISPER_DEFAULT_TEMPERATURES,
+        "condition_on_previous_text": True,
+    },
+    "accurate": {
+        "model": os.environ.get("SPEED_PROFILE_ACCURATE_MODEL", DEFAULT_SPEED_PROFILE_ACCURATE_MODEL),
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": WHISPER_DEFAULT_TEMPERATURES,
+        "condition_on_previous_text": True,
+    },
+}
+
+if DEFAULT_SPEED_PROFILE not in SPEED_PROFILES:
+    logger.warning("Unknown DEFAULT_SPEED_PROFILE '%s'; using 'balanced'.", DEFAULT_SPEED_PROFILE)
+    DEFAULT_SPEED_PROFILE = "balanced"
+if BACKGROUND_SPEED_PROFILE not in SPEED_PROFILES:
+    logger.warning("Unknown BACKGROUND_SPEED_PROFILE '%s'; using '%s'.", BACKGROUND_SPEED_PROFILE, DEFAULT_SPEED_PROFILE)
+    BACKGROUND_SPEED_PROFILE = DEFAULT_SPEED_PROFILE
+
+_threads_lock = threading.Lock()
+_threads_pid = None # Process that last applied TORCH_THREADS; forked workers apply it again
+
+
+def resolve_speed_profile(name=None, background=False):
+    """Returns the profile name to use; raises ValueError for unknown profiles."""
+    if not name:
+        return BACKGROUND_SPEED_PROFILE if background else DEFAULT_SPEED_PROFILE
+    if name not in SPEED_PROFILES:
+        raise ValueError(f"Unknown speed profile '{name}'. Choose one of: {', '.join(SPEED_PROFILES)}.")
+    return name
+
+
+def profile_model(name, whisper_model=None):
+    """Whisper model for a request: an explicit model, else the profile's if it is allowed."""
+    if whisper_model:
+        return whisper_model
+    model = SPEED_PROFILES[resolve_speed_profile(name)]["model"]
+    if model not in WHISPER_ALLOWED_MODELS:
+        logger.warning("Speed profile '%s' model '%s' is not in WHISPER_ALLOWED_MODELS; using '%s'.", name, model, WHISPER_MODEL_NAME)
+        return WHISPER_MODEL_NAME
+    return model
+
+
+def validate_language(language):
+    """Returns a Whisper language code (e.g. "en"), or raises ValueError."""
+    from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+    code = language.strip().lower()
+    code = TO_LANGUAGE_CODE.get(code, code) # Also accept names such as "english"
+    if code not in LANGUAGES:
+        raise ValueError(f"Unsupported language '{language}'.")
+    return code
+
+
+def transcribe_options(name, device_type="cpu", language=None):
+    """Keyword arguments for model.transcribe() under the given profile."""
+    profile = SPEED_PROFILES[resolve_speed_profile(name)]
+    options = {
+        "temperature": profile["temperature"],
+        "condition_on_previous_text": profile["condition_on_previous_text"],
+        "fp16": device_type == "cuda", # Whisper would warn and fall back to fp32 on CPU anyway
+    }
+    if profile["beam_size"]:
+        options["beam_size"] = profile["beam_size"]
+    if profile["best_of"]:
+        options["best_of"] = profile["best_of"]
+    language = language or TRANSCRIPTION_LANGUAGE
+    if language:
+        options["language"] = language
+    return options
+
+
+def apply_torch_threads():
+    """Sets torch's intra-op thread count to TORCH_THREADS, once per process."""
+    global _threads_pid
+    if _threads_pid == os.getpid():
+        return
+    import torch
+    with _threads_lock:
+        if _threads_pid != os.getpid():
+            torch.set_num_threads(TORCH_THREADS)
+            _threads_pid = os.getpid()
+            logger.info("Using %s torch threads per transcription in worker %s.", TORCH_THREADS, _threads_pid)
@@ -1,43 +1,189 @@
 import os
+import re
+import gzip
+import json
+import zlib
+import queue
+import atexit
 import datetime
+import tempfile
+import threading
 from utils.logger import logger
+from utils.metrics import stage_timer
 from utils.error_handlers import FileStorageError
+from services.meeting_index import meeting_index
+from services.search_index import search_index
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        STORAGE_WRITE_BEHIND as DEFAULT_STORAGE_WRITE_BEHIND,
+        TRANSCRIPT_COMPRESSION as DEFAULT_TRANSCRIPT_COMPRESSION,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default storage settings.")
+    DEFAULT_STORAGE_WRITE_BEHIND = False
+    DEFAULT_TRANSCRIPT_COMPRESSION = None
 
 OUTPUT_BASE_DIR = "output/meetings"
+JOB_STATUS_DIR = "output/jobs" # Job records live apart from meetings: batch jobs are not meetings
+MEETING_ID_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$") # meeting_ids double as directory names
+
+# Write-behind: saves return at once and a background thread writes the files
+STORAGE_WRITE_BEHIND = os.environ.get("STORAGE_WRITE_BEHIND", str(DEFAULT_STORAGE_WRITE_BEHIND)).lower() in ['true', '1', 't', 'yes']
+# None, "gzip" or "zstd". Compressed transcripts keep their .txt path; reads detect the format.
+TRANSCRIPT_COMPRESSION = (os.environ.get("TRANSCRIPT_COMPRESSION", DEFAULT_TRANSCRIPT_COMPRESSION or "") or "").lower() or None
+if TRANSCRIPT_COMPRESSION in ("none", "false", "0"):
+    TRANSCRIPT_COMPRESSION = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
 
 def ensure_dir_exists(directory_path):
     """Ensures that the specified directory exists, creating it if necessary."""
     try:
         os.makedirs(directory_path, exist_ok=True)
-        logger.debug(f"Ensured directory exists: {directory_path}")
+        logger.debug("Ensured directory exists: %s", directory_path)
     except OSError as e:
-        logger.error(f"Error creating directory {directory_path}: {e}", exc_info=True)
+        logger.error("Error creating directory %s: %s", directory_path, e, exc_info=True)
         raise FileStorageError(f"Could not create directory {directory_path}: {e}")
 
-def save_text_to_file(content, filename, subdirectory=""):
+def compress_bytes(data, compression):
+    """Compresses data with gzip or zstd (zstd needs the optional 'zstandard' package)."""
+    if compression == "zstd":
+        try:
+            import zstandard
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        except ImportError:
+            logger.warning("TRANSCRIPT_COMPRESSION is 'zstd' but the zstandard package is not installed; using gzip.")
+            compression = "gzip"
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+def decompress_bytes(data):
+    """Returns data decompressed if it starts with a gzip or zstd header, else unchanged."""
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == ZSTD_MAGIC:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+def write_file_atomic(file_path, data):
     """
-    Saves the given text content to a file in a specified subdirectory under OUTPUT_BASE_DIR.
-    A timestamped parent directory will be created for each session.
+    Writes bytes so that readers see either the old file or the complete new one:
+    temporary file in the same directory, fsync, rename over the target, fsync the directory.
     """
+    directory = os.path.dirname(file_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
     try:
-        # Create a unique directory for this session based on timestamp
-        # The 'subdirectory' here is intended to be the meeting_id for grouping.
-        session_dir = os.path.join(OUTPUT_BASE_DIR, subdirectory) # subdirectory is meeting_id
-        ensure_dir_exists(session_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd) # Makes the rename itself durable
+    finally:
+        os.close(dir_fd)
+
+
+class WriteBehindWriter:
+    """
+    Background thread that performs queued file writes in order. Content that is queued
+    but not yet written is kept in memory, so reads in this process see it at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {} # file_path -> bytes of the newest queued write
+        self._queue = None
+        self._pid = None
 
-        file_path = os.path.join(session_dir, filename)
+    def submit(self, file_path, data, on_saved=None):
+        self._ensure_thread()
+        with self._lock:
+            self._pending[file_path] = data
+        self._queue.put((file_path, data, on_saved))
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        logger.info(f"Successfully saved content to {file_path}")
+    def pending(self, file_path):
+        with self._lock:
+            return self._pending.get(file_path)
+
+    def flush(self):
+        """Blocks until every queued write has been performed."""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def _ensure_thread(self):
+        # Started lazily, and again after a fork: threads do not survive into gunicorn workers.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = {}
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, args=(self._queue,), name="storage-writer", daemon=True).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def _run(self, work_queue):
+        while True:
+            file_path, data, on_saved = work_queue.get()
+            try:
+                _write_and_notify(file_path, data, on_saved)
+            except Exception as e:
+                logger.error("Write-behind save of %s failed: %s", file_path, e, exc_info=True)
+            finally:
+                with self._lock:
+                    if self._pending.get(file_path) is data:
+                        del self._pending[file_path]
+                work_queue.task_done()
+
+
+write_behind = WriteBehindWriter()
+
+def _write_and_notify(file_path, data, on_saved):
+    with stage_timer("storage_write"):
+        ensure_dir_exists(os.path.dirname(file_path))
+        write_file_atomic(file_path, data)
+    logger.info("Successfully saved content to %s", file_path)
+    if on_saved is not None:
+        on_saved(file_path, len(data))
+
+def save_text_to_file(content, filename, subdirectory="", compression=None, on_saved=None):
+    """
+    Saves the given text content to a file in a specified subdirectory under OUTPUT_BASE_DIR.
+    A timestamped parent directory will be created for each session.
+
+    The write is atomic, optionally compressed ("gzip"/"zstd"), and with
+    STORAGE_WRITE_BEHIND it happens on a background thread after this returns.
+    on_saved(file_path, stored_bytes) is called once the file is on disk.
+    """
+    # The 'subdirectory' here is intended to be the meeting_id for grouping.
+    session_dir = os.path.join(OUTPUT_BASE_DIR, subdirectory) # subdirectory is meeting_id
+    file_path = os.path.join(session_dir, filename)
+    data = compress_bytes(content.encode("utf-8"), compression)
+    if STORAGE_WRITE_BEHIND:
+        write_behind.submit(file_path, data, on_saved)
+        return file_path
+    try:
+        _write_and_notify(file_path, data, on_saved)
         return file_path
     except FileStorageError: # Already logged in ensure_dir_exists
         raise
     except IOError as e:
-        logger.error(f"IOError saving content to file {filename} in {session_dir}: {e}", exc_info=True)
+        logger.error("IOError saving content to file %s in %s: %s", filename, session_dir, e, exc_info=True)
         raise FileStorageError(f"Could not write to file {filename}: {e}")
     except Exception as e:
-        logger.error(f"Unexpected error saving content to file {filename} in {session_dir}: {e}", exc_info=True)
+        logger.error("Unexpected error saving content to file %s in %s: %s", filename, session_dir, e, exc_info=True)
         raise FileStorageError(f"An unexpected error occurred while saving file {filename}: {e}")
 
 def save_transcript(transcript_text, meeting_id="meeting"):
@@ -45,9 +191,114 @@ def save_transcript(transcript_text, meeting_id="meeting"):
     # The actual filename will be like 'meeting_20231027_103000_transcript.txt'
     # And it will be inside a directory named 'meeting_20231027_103000'
     filename = f"{meeting_id}_transcript.txt"
-    return save_text_to_file(transcript_text, filename, subdirectory=meeting_id)
+
+    def on_saved(file_path, stored_bytes):
+        index_meeting(meeting_id, transcriptPath=file_path, transcriptBytes=stored_bytes, status="transcribed")
+        search_index.add_document(meeting_id, "transcript", transcript_text)
+
+    return save_text_to_file(transcript_text, filename, subdirectory=meeting_id, compression=TRANSCRIPT_COMPRESSION, on_saved=on_saved)
 
 def save_insights(insights_text, meeting_id="meeting"):
     """Saves the insights text to a file, named with meeting_id."""
     filename = f"{meeting_id}_insights.md" # Using .md for better readability of structured insights
-    return save_text_to_file(insights_text, filename, subdirectory=meeting_id)
+
+    def on_saved(file_path, stored_bytes):
+        index_meeting(meeting_id, insightsPath=file_path, insightsBytes=stored_bytes, status="completed")
+        search_index.add_document(meeting_id, "insights", insights_text)
+
+    return save_text_to_file(insights_text, filename, subdirectory=meeting_id, on_saved=on_saved)
+
+def index_meeting(meeting_id, **fields):
+    """
+    Records meeting metadata (saved outputs, models, durations, timings) in the meeting index.
+    The files on disk are the source of truth, so index failures are logged rather than
+    raised (python -m services.meeting_index reindex repairs them).
+    """
+    try:
+        meeting_index.update_meeting(meeting_id, **fields)
+    except Exception as e:
+        logger.error("Could not update meeting index for meeting_id %s: %s", meeting_id, e, exc_info=True)
+
+def is_valid_meeting_id(meeting_id):
+    """Checks that a meeting_id is safe to use as a directory/file name component."""
+    return bool(meeting_id) and MEETING_ID_PATTERN.match(meeting_id) is not None
+
+def get_meeting_dir(meeting_id):
+    """Returns the directory holding all outputs for the given meeting_id."""
+    return os.path.join(OUTPUT_BASE_DIR, meeting_id)
+
+def read_text(file_path):
+    """Reads a stored text file, decompressing it if needed. Returns None if it does not exist."""
+    data = write_behind.pending(file_path)
+    if data is None:
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, "rb") as f:
+            data = f.read()
+    return decompress_bytes(data).decode("utf-8")
+
+def load_text_from_file(filename, subdirectory=""):
+    """
+    Reads a text file previously written by save_text_to_file, including writes still
+    queued for the write-behind thread. Returns None if the file does not exist.
+    """
+    file_path = os.path.join(OUTPUT_BASE_DIR, subdirectory, filename)
+    try:
+        return read_text(file_path)
+    except (OSError, ValueError, zlib.error) as e:
+        logger.error("Error reading file %s: %s", file_path, e, exc_info=True)
+        raise FileStorageError(f"Could not read file {filename}: {e}")
+
+def load_meeting(meeting_id):
+    """
+    Loads the stored transcript and insights for a meeting.
+    Returns None if nothing has been stored for this meeting_id yet.
+    """
+    if not is_valid_meeting_id(meeting_id):
+        return None
+    transcript_filename = f"{meeting_id}_transcript.txt"
+    insights_filename = f"{meeting_id}_insights.md"
+    transcript = load_text_from_file(transcript_filename, subdirectory=meeting_id)
+    insights = load_text_from_file(insights_filename, subdirectory=meeting_id)
+    if transcript is None and insights is None:
+        return None
+    meeting_dir = get_meeting_dir(meeting_id)
+    return {
+        "meetingId": meeting_id,
+        "transcript": transcript,
+        "text": insights,
+        "transcriptPath": os.path.join(meeting_dir, transcript_filename) if transcript is not None else None,
+        "insightsPath": os.path.join(meeting_dir, insights_filename) if insights is not None else None,
+    }
+
+def save_job_status(status, job_id="meeting"):
+    """
+    Saves a job status record (a JSON-serialisable dict) as JOB_STATUS_DIR/<job_id>.json,
+    so any worker process can answer status queries for the job. Written synchronously,
+    even with STORAGE_WRITE_BEHIND, since other workers poll it.
+    """
+    file_path = os.path.join(JOB_STATUS_DIR, f"{job_id}.json")
+    try:
+        ensure_dir_exists(JOB_STATUS_DIR)
+        write_file_atomic(file_path, json.dumps(status, indent=2).encode("utf-8"))
+    except FileStorageError:
+        raise
+    except Exception as e:
+        logger.error("Error saving job status to %s: %s", file_path, e, exc_info=True)
+        raise FileStorageError(f"Could not write job status for {job_id}: {e}")
+    return file_path
+
+def load_job_status(job_id):
+    """Loads a job status record saved by save_job_status, or None if there is none."""
+    if not is_valid_meeting_id(job_id):
+        return None
+    content = read_text(os.path.join(JOB_STATUS_DIR, f"{job_id}.json"))
+    if content is None: # Saved by an older version, next to the meeting outputs
+        content = load_text_from_file(f"{job_id}_job.json", subdirectory=job_id)
+    if content is None:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError as e:
+        logger.error("Corrupt job status file for job %s: %s", job_id, e, exc_info=True)
+        raise FileStorageError(f"Could not parse job status for job {job_id}: {e}")
@@ -1,55 +1,243 @@
-import whisper
 import os
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # Attempt to import config, handle if it's not found for some reason (e.g. testing environment)
 try:
-    from config import DEFAULT_WHISPER_MODEL
+    from config import (
+        CHUNKED_TRANSCRIPTION as DEFAULT_CHUNKED_TRANSCRIPTION,
+        TRANSCRIBE_CHUNK_SECONDS as DEFAULT_TRANSCRIBE_CHUNK_SECONDS,
+        TRANSCRIBE_CHUNK_OVERLAP_SECONDS as DEFAULT_TRANSCRIBE_CHUNK_OVERLAP_SECONDS,
+        TRANSCRIBE_WORKERS as DEFAULT_TRANSCRIBE_WORKERS,
+        ENABLE_VAD_TRIM as DEFAULT_ENABLE_VAD_TRIM,
+    )
 except ImportError:
-    logger.warning("config.py not found, using default WHISPER_MODEL='base'.")
-    DEFAULT_WHISPER_MODEL = "base" # Fallback if config.py is not found
+    DEFAULT_CHUNKED_TRANSCRIPTION = False
+    DEFAULT_TRANSCRIBE_CHUNK_SECONDS = 120
+    DEFAULT_TRANSCRIBE_CHUNK_OVERLAP_SECONDS = 2
+    DEFAULT_TRANSCRIBE_WORKERS = 0
+    DEFAULT_ENABLE_VAD_TRIM = True
 
 # Import custom error and logger
 from utils.error_handlers import TranscriptionError
 from utils.logger import logger
+from utils.metrics import metrics, stage_timer
+from services import model_registry as model_registry_module
+from services.model_registry import model_registry
+from services.admission import transcription_admission
+from services.speed_profiles import resolve_speed_profile, profile_model, transcribe_options, apply_torch_threads
+from services.audio_chunking import (
+    SAMPLE_RATE, plan_chunks, stitch_segments, join_segments, init_worker, transcribe_chunk
+)
+from services.voice_activity import (
+    trim_silence, map_segments, VAD_MIN_SILENCE_SECONDS, VAD_PADDING_SECONDS, VAD_ENERGY_MARGIN_DB,
+    VAD_MIN_MODULATION_DB, VAD_MIN_KEPT_FRACTION
+)
 
 # --- Whisper Setup ---
-# Use environment variable for model name if set, otherwise use config default
-WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL", DEFAULT_WHISPER_MODEL)
-logger.info(f"Initializing Whisper model: {WHISPER_MODEL_NAME}")
-model = None
-try:
-    model = whisper.load_model(WHISPER_MODEL_NAME)
-    logger.info(f"Whisper model '{WHISPER_MODEL_NAME}' loaded successfully.")
-except Exception as e:
-    logger.error(f"Failed to load Whisper model '{WHISPER_MODEL_NAME}': {e}. Attempting fallback to 'base' model.", exc_info=True)
-    if WHISPER_MODEL_NAME != "base": # Avoid trying to load base model twice if it was the one that failed
-        try:
-            WHISPER_MODEL_NAME = "base" # Explicitly set to base for logging clarity on fallback
-            model = whisper.load_model(WHISPER_MODEL_NAME)
-            logger.info(f"Successfully loaded fallback Whisper model '{WHISPER_MODEL_NAME}'.")
-        except Exception as e_fallback:
-            logger.critical(f"Failed to load even the fallback Whisper model '{WHISPER_MODEL_NAME}': {e_fallback}", exc_info=True)
-            raise TranscriptionError(f"Could not initialize Whisper model: {e_fallback}")
-    else: # Original model was 'base' and it failed
-        logger.critical(f"Failed to load the primary Whisper model '{WHISPER_MODEL_NAME}': {e}", exc_info=True)
-        raise TranscriptionError(f"Could not initialize Whisper model '{WHISPER_MODEL_NAME}': {e}")
-
-
-def transcribe_audio(file_path: str) -> str:
-    """
-    Transcribes an audio file using the configured Whisper model.
-    """
-    if not model:
-        logger.error("Whisper model is not available or failed to load prior to transcription call.")
-        raise TranscriptionError("Whisper model is not available or failed to load.")
-
-    logger.info(f"Starting transcription for audio file: {file_path} using model: {WHISPER_MODEL_NAME}")
+# Models are loaded on first use (or preloaded) through the shared model registry.
+WHISPER_MODEL_NAME = model_registry_module.WHISPER_MODEL_NAME
+
+# --- Chunked transcription setup ---
+CHUNKED_TRANSCRIPTION = os.environ.get("CHUNKED_TRANSCRIPTION", str(DEFAULT_CHUNKED_TRANSCRIPTION)).lower() in ['true', '1', 't']
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", DEFAULT_TRANSCRIBE_CHUNK_SECONDS))
+TRANSCRIBE_CHUNK_OVERLAP_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_OVERLAP_SECONDS", DEFAULT_TRANSCRIBE_CHUNK_OVERLAP_SECONDS))
+# 0 means "one worker per two cores", leaving headroom for the web workers
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", DEFAULT_TRANSCRIBE_WORKERS)) or max(1, (os.cpu_count() or 2) // 2)
+
+# --- Voice-activity trimming setup ---
+ENABLE_VAD_TRIM = os.environ.get("ENABLE_VAD_TRIM", str(DEFAULT_ENABLE_VAD_TRIM)).lower() in ['true', '1', 't']
+
+VAD_REMOVED_SECONDS = metrics.counter(
+    "neuronote_vad_removed_audio_seconds_total", "Non-speech audio cut before transcription.", labels=("model",))
+VAD_SAVED_SECONDS = metrics.counter(
+    "neuronote_vad_saved_seconds_total", "Estimated transcription time saved by cutting non-speech audio.", labels=("model",))
+
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+
+def decode_settings() -> str:
+    """
+    The configured settings, besides model, speed profile and language, that change what
+    transcribe_audio() returns: voice-activity trimming and chunking. Part of the
+    transcript cache key, so changing one of them does not serve stale transcripts.
+    """
+    settings = {"vadTrim": ENABLE_VAD_TRIM, "chunked": CHUNKED_TRANSCRIPTION}
+    if ENABLE_VAD_TRIM:
+        settings.update(vadMinSilenceSeconds=VAD_MIN_SILENCE_SECONDS, vadPaddingSeconds=VAD_PADDING_SECONDS,
+                        vadEnergyMarginDb=VAD_ENERGY_MARGIN_DB, vadMinModulationDb=VAD_MIN_MODULATION_DB,
+                        vadMinKeptFraction=VAD_MIN_KEPT_FRACTION)
+    if CHUNKED_TRANSCRIPTION:
+        settings.update(chunkSeconds=TRANSCRIBE_CHUNK_SECONDS, chunkOverlapSeconds=TRANSCRIBE_CHUNK_OVERLAP_SECONDS)
+    return json.dumps(settings, sort_keys=True)
+
+
+def _get_chunk_pool():
+    """
+    Lazily starts the process pool used for chunked transcription. Each worker has its own
+    model registry, preloads the default model and splits the machine's cores evenly for
+    torch intra-op threads.
+    The 'spawn' start method avoids forking a process that already has torch threads running.
+    """
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS)
+            logger.info("Starting chunked transcription pool: %s workers x %s threads, model '%s'.", TRANSCRIBE_WORKERS, threads_per_worker, WHISPER_MODEL_NAME)
+            _chunk_pool = ProcessPoolExecutor(
+                max_workers=TRANSCRIBE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(WHISPER_MODEL_NAME, threads_per_worker),
+            )
+        return _chunk_pool
+
+
+def _describe(audio) -> str:
+    """Short description of a file path or in-memory sample array, for log messages."""
+    if isinstance(audio, str):
+        return audio
+    return f"<in-memory audio, {len(audio) / SAMPLE_RATE:.1f}s>"
+
+
+def transcribe_audio_chunked(audio, chunk_seconds: float = None, overlap_seconds: float = None, model_name: str = None,
+                             options: dict = None) -> str:
+    """
+    Transcribes a long recording by splitting it at silences into overlapping windows,
+    transcribing the windows in parallel worker processes and stitching the segments
+    back together on a global timeline. Short recordings use the in-process model.
+    The caller's admission slot covers one chunk at a time; more run in parallel only on
+    extra slots that are free when the recording starts, so the machine never runs more
+    decodes than MAX_CONCURRENT_TRANSCRIPTIONS.
+    audio is a file path or a float32 16 kHz mono array. options are passed to model.transcribe().
+    """
+    return join_segments(_transcribe_chunked_segments(audio, chunk_seconds, overlap_seconds, model_name, options))
+
+
+def _transcribe_chunked_segments(audio, chunk_seconds=None, overlap_seconds=None, model_name=None, options=None) -> list:
+    """transcribe_audio_chunked, returning the stitched segments instead of the joined text."""
+    chunk_seconds = chunk_seconds or TRANSCRIBE_CHUNK_SECONDS
+    overlap_seconds = overlap_seconds if overlap_seconds is not None else TRANSCRIBE_CHUNK_OVERLAP_SECONDS
+
+    model_name = model_registry.resolve_whisper_name(model_name)
+    description = _describe(audio)
+    if isinstance(audio, str):
+        import whisper
+        audio = whisper.load_audio(audio)
+    chunks = plan_chunks(audio, chunk_seconds, overlap_seconds)
+    if len(chunks) == 1:
+        logger.debug("Audio %s is shorter than one chunk; transcribing in-process.", description)
+        _, model = model_registry.get_whisper(model_name)
+        return model.transcribe(audio, **(options or {}))["segments"]
+
+    logger.info("Chunked transcription for %s: %.1fs audio in %s chunks of ~%.0fs.", description, len(audio) / SAMPLE_RATE, len(chunks), chunk_seconds)
+    start = time.perf_counter()
+    pool = _get_chunk_pool()
+    with transcription_admission.extra_slots(min(len(chunks), TRANSCRIBE_WORKERS) - 1) as extra:
+        logger.info("Transcribing %s chunks at most %s at a time.", len(chunks), 1 + extra)
+        calls = [(chunk, audio[chunk["start"]:chunk["end"]], model_name, options) for chunk in chunks]
+        segments = stitch_segments(run_bounded(pool, transcribe_chunk, calls, 1 + extra))
+    logger.info("Chunked transcription finished in %.2fs (%s segments).", time.perf_counter() - start, len(segments))
+    return segments
+
+
+def run_bounded(pool, fn, calls, limit):
+    """Runs fn(*args) for each args tuple in calls on pool, at most limit at a time; returns the results in order."""
+    results = [None] * len(calls)
+    pending = {}
+    waiting = iter(enumerate(calls))
+    while True:
+        for index, args in waiting:
+            pending[pool.submit(fn, *args)] = index
+            if len(pending) >= limit:
+                break
+        if not pending:
+            return results
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+
+
+def trim_non_speech(audio, description: str):
+    """
+    Voice-activity stage: returns (samples, regions, report) with long non-speech spans cut
+    from audio (a file path or float32 16 kHz array). regions map the trimmed audio back
+    to the original (see services.voice_activity); report holds the durations for the
+    meeting index.
+    """
+    if isinstance(audio, str):
+        import whisper
+        audio = whisper.load_audio(audio)
+    with stage_timer("vad") as vad:
+        trimmed, regions = trim_silence(audio)
+    total_seconds = len(audio) / SAMPLE_RATE
+    speech_seconds = len(trimmed) / SAMPLE_RATE
+    report = {
+        "vadSeconds": round(vad.seconds, 3),
+        "speechSeconds": round(speech_seconds, 3),
+        "silenceRemovedSeconds": round(total_seconds - speech_seconds, 3),
+    }
+    logger.info("Voice activity for %s: kept %.1fs of %.1fs in %s regions (%.1f ms).",
+                description, speech_seconds, total_seconds, len(regions), vad.seconds * 1000)
+    return trimmed, regions, report
+
+
+def transcribe_audio(audio, model_name: str = None, profile: str = None, language: str = None, report: dict = None) -> str:
+    """
+    Transcribes audio using the requested Whisper model and speed profile (defaults:
+    DEFAULT_SPEED_PROFILE and its model). audio is a file path (decoded by Whisper via
+    ffmpeg) or an already decoded float32 16 kHz mono NumPy array, which Whisper uses
+    directly. language is an optional Whisper language code that skips detection.
+
+    With ENABLE_VAD_TRIM, long non-speech spans are cut first. If report is a dict, it
+    receives the voice-activity durations, the estimated transcription time saved, and
+    the segments with timestamps in the original recording.
+    """
+    try:
+        profile = resolve_speed_profile(profile)
+        model_name, model = model_registry.get_whisper(profile_model(profile, model_name))
+    except ValueError as e:
+        raise TranscriptionError(str(e))
+
+    description = _describe(audio)
+    options = transcribe_options(profile, model.device.type, language)
+    logger.info("Starting transcription for audio: %s using model: %s, profile: %s", description, model_name, profile)
     try:
-        result = model.transcribe(file_path)
-        transcript = result["text"]
-        logger.info(f"Transcription completed for {file_path}. Transcript length: {len(transcript)} chars.")
-        logger.debug(f"Transcript snippet: {transcript[:100]}...") # Log a snippet for debugging
+        regions = None
+        if ENABLE_VAD_TRIM:
+            audio, regions, vad_report = trim_non_speech(audio, description)
+            if report is not None:
+                report.update(vad_report)
+            VAD_REMOVED_SECONDS.inc(vad_report["silenceRemovedSeconds"], model_name)
+        start = time.perf_counter()
+        if regions == []:
+            logger.info("Audio %s is silent; skipping Whisper.", description)
+            segments = [] # Whisper tends to invent text for silence
+            transcript = ""
+        elif CHUNKED_TRANSCRIPTION:
+            segments = _transcribe_chunked_segments(audio, model_name=model_name, options=options)
+            transcript = join_segments(segments)
+        else:
+            apply_torch_threads() # Chunk workers pin their own thread count when they start
+            result = model.transcribe(audio, **options)
+            segments = result["segments"]
+            transcript = result["text"]
+        if regions:
+            segments = map_segments(segments, regions)
+            # Cut audio would have cost about as much per second as the speech that was transcribed
+            saved = vad_report["silenceRemovedSeconds"] * (time.perf_counter() - start) / max(vad_report["speechSeconds"], 1e-3)
+            VAD_SAVED_SECONDS.inc(saved, model_name)
+            if report is not None:
+                report["transcribeSavedSeconds"] = round(saved, 3)
+        if report is not None:
+            report["segments"] = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments]
+        logger.info("Transcription completed for %s. Transcript length: %s chars.", description, len(transcript))
+        logger.debug("Transcript snippet: %s...", transcript[:100]) # Log a snippet for debugging
         return transcript
     except Exception as e:
-        logger.error(f"Error during Whisper transcription for {file_path}: {e}", exc_info=True)
-        raise TranscriptionError(f"Whisper transcription failed for {file_path}: {e}")
+        logger.error("Error during Whisper transcription for %s: %s", description, e, exc_info=True)
+        raise TranscriptionError(f"Whisper transcription failed for {description}: {e}")
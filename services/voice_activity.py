@@ -0,0 +1,196 @@
+"""
+Voice-activity trimming: finds the speech in a recording with NumPy frame features and
+removes long non-speech spans (dead air, room noise, hold music) before Whisper runs.
+
+Each 30 ms frame gets three features, computed for all frames at once:
+    energy        log energy relative to the recording's noise floor (10th percentile)
+    speech band   fraction of the frame's power between 300 and 3400 Hz
+    flatness      spectral flatness; broadband noise is close to 1, voiced speech is low
+A frame is speech when it is loud enough, concentrates its power in the speech band and
+is not noise-like. Frames in a steady passage (energy varying less than
+VAD_MIN_MODULATION_DB over half a second, as with sustained tones and hum) are dropped;
+speech rises and falls with every syllable.
+
+Only non-speech runs of at least VAD_MIN_SILENCE_SECONDS are cut, and VAD_PADDING_SECONDS
+is kept on either side of speech, so pauses inside sentences are left alone. The kept
+regions record where they came from, so segment timestamps from the trimmed audio can be
+mapped back to the original recording.
+
+The detector misses speech that never drops back to the noise floor (continuous talk in
+heavy noise), so when it keeps less than VAD_MIN_KEPT_FRACTION of an audible recording the
+audio is passed on untrimmed. Only a recording that is silent throughout (below
+ABSOLUTE_FLOOR_DB) is reported as having no speech at all.
+"""
+import os
+import numpy as np
+
+from utils.logger import logger
+from services.audio_chunking import SAMPLE_RATE, FRAME_SECONDS
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        VAD_MIN_SILENCE_SECONDS as DEFAULT_VAD_MIN_SILENCE_SECONDS,
+        VAD_PADDING_SECONDS as DEFAULT_VAD_PADDING_SECONDS,
+        VAD_ENERGY_MARGIN_DB as DEFAULT_VAD_ENERGY_MARGIN_DB,
+        VAD_MIN_MODULATION_DB as DEFAULT_VAD_MIN_MODULATION_DB,
+        VAD_MIN_KEPT_FRACTION as DEFAULT_VAD_MIN_KEPT_FRACTION,
+    )
+except ImportError:
+    logger.warning("config.py not found, using default voice activity settings.")
+    DEFAULT_VAD_MIN_SILENCE_SECONDS = 2.0
+    DEFAULT_VAD_PADDING_SECONDS = 0.3
+    DEFAULT_VAD_ENERGY_MARGIN_DB = 10.0
+    DEFAULT_VAD_MIN_MODULATION_DB = 1.5
+    DEFAULT_VAD_MIN_KEPT_FRACTION = 0.05
+
+VAD_MIN_SILENCE_SECONDS = float(os.environ.get("VAD_MIN_SILENCE_SECONDS", DEFAULT_VAD_MIN_SILENCE_SECONDS))
+VAD_PADDING_SECONDS = float(os.environ.get("VAD_PADDING_SECONDS", DEFAULT_VAD_PADDING_SECONDS))
+VAD_ENERGY_MARGIN_DB = float(os.environ.get("VAD_ENERGY_MARGIN_DB", DEFAULT_VAD_ENERGY_MARGIN_DB))
+VAD_MIN_MODULATION_DB = float(os.environ.get("VAD_MIN_MODULATION_DB", DEFAULT_VAD_MIN_MODULATION_DB))
+VAD_MIN_KEPT_FRACTION = float(os.environ.get("VAD_MIN_KEPT_FRACTION", DEFAULT_VAD_MIN_KEPT_FRACTION))
+
+ABSOLUTE_FLOOR_DB = -60.0 # Frames quieter than this (dBFS) are never speech
+MIN_SPEECH_BAND_RATIO = 0.15 # Low-pitched voices carry much of their power at the fundamental, below 300 Hz
+MAX_FLATNESS = 0.5
+MODULATION_SECONDS = 0.5
+MIN_SPEECH_SECONDS = 0.1 # Shorter bursts (clicks, bumps) are not speech
+FFT_BLOCK_FRAMES = 4096 # Frames per FFT batch, bounding memory to a few tens of MB
+
+
+def _runs(mask):
+    """Returns (starts, ends) frame indices of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _moving_std(values, width):
+    """Standard deviation over a centered window of width values, via cumulative sums."""
+    if len(values) < width:
+        return np.full(len(values), values.std() if len(values) else 0.0)
+    padded = np.pad(values.astype(np.float64), (width // 2, width - 1 - width // 2), mode="edge")
+    sums = np.cumsum(np.concatenate(([0.0], padded)))
+    squares = np.cumsum(np.concatenate(([0.0], padded * padded)))
+    mean = (sums[width:] - sums[:-width]) / width
+    variance = (squares[width:] - squares[:-width]) / width - mean * mean
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def frame_features(audio, sample_rate=SAMPLE_RATE):
+    """Returns (energy_db, speech_band_ratio, flatness) arrays with one value per frame."""
+    frame_samples = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame_samples
+    frames = np.asarray(audio[:n_frames * frame_samples], dtype=np.float32).reshape(n_frames, frame_samples)
+    energy_db = 10.0 * np.log10(np.einsum("ij,ij->i", frames, frames) / frame_samples + 1e-10)
+
+    frequencies = np.fft.rfftfreq(frame_samples, 1.0 / sample_rate)
+    speech_band = (frequencies >= 300) & (frequencies <= 3400)
+    analysis_band = (frequencies >= 100) & (frequencies <= 7000)
+    window = np.hanning(frame_samples).astype(np.float32)
+    band_ratio = np.empty(n_frames)
+    flatness = np.empty(n_frames)
+    for lo in range(0, n_frames, FFT_BLOCK_FRAMES):
+        power = np.abs(np.fft.rfft(frames[lo:lo + FFT_BLOCK_FRAMES] * window, axis=1)) ** 2 + 1e-12
+        band_ratio[lo:lo + len(power)] = power[:, speech_band].sum(axis=1) / power.sum(axis=1)
+        analysed = power[:, analysis_band]
+        flatness[lo:lo + len(power)] = np.exp(np.log(analysed).mean(axis=1)) / analysed.mean(axis=1)
+    return energy_db, band_ratio, flatness
+
+
+def speech_mask(audio, sample_rate=SAMPLE_RATE, energy_margin_db=None, min_modulation_db=None):
+    """Boolean array, one value per frame: True where the frame is classified as speech."""
+    energy_margin_db = VAD_ENERGY_MARGIN_DB if energy_margin_db is None else energy_margin_db
+    min_modulation_db = VAD_MIN_MODULATION_DB if min_modulation_db is None else min_modulation_db
+    energy_db, band_ratio, flatness = frame_features(audio, sample_rate)
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+    threshold = max(np.percentile(energy_db, 10) + energy_margin_db, ABSOLUTE_FLOOR_DB)
+    mask = (energy_db > threshold) & (band_ratio >= MIN_SPEECH_BAND_RATIO) & (flatness <= MAX_FLATNESS)
+    modulation = _moving_std(energy_db, max(1, int(MODULATION_SECONDS / FRAME_SECONDS)))
+    mask &= modulation >= min_modulation_db
+
+    starts, ends = _runs(mask) # Drop bursts too short to be a word
+    min_frames = max(1, int(MIN_SPEECH_SECONDS / FRAME_SECONDS))
+    for start, end in zip(starts, ends):
+        if end - start < min_frames:
+            mask[start:end] = False
+    return mask
+
+
+def speech_regions(audio, sample_rate=SAMPLE_RATE, min_silence_seconds=None, padding_seconds=None):
+    """
+    Returns the (start, end) sample ranges to keep: speech plus padding, with non-speech
+    gaps shorter than min_silence_seconds filled in. Empty if no speech was found.
+    """
+    min_silence_seconds = VAD_MIN_SILENCE_SECONDS if min_silence_seconds is None else min_silence_seconds
+    padding_seconds = VAD_PADDING_SECONDS if padding_seconds is None else padding_seconds
+    frame_samples = int(FRAME_SECONDS * sample_rate)
+    starts, ends = _runs(speech_mask(audio, sample_rate))
+    if not len(starts):
+        return []
+
+    padding = int(padding_seconds * sample_rate)
+    starts = np.maximum(starts * frame_samples - padding, 0)
+    ends = np.minimum(ends * frame_samples + padding, len(audio))
+    ends[-1] = len(audio) if len(audio) - ends[-1] < frame_samples else ends[-1] # Keep the partial last frame
+    # A region starts wherever the gap since the previous speech is long enough to cut
+    gaps = starts[1:] - ends[:-1]
+    breaks = np.flatnonzero(gaps >= int(min_silence_seconds * sample_rate)) + 1
+    region_starts = starts[np.concatenate(([0], breaks))]
+    region_ends = ends[np.concatenate((breaks - 1, [len(ends) - 1]))]
+    return [(int(start), int(end)) for start, end in zip(region_starts, region_ends)]
+
+
+def is_silent(audio, sample_rate=SAMPLE_RATE):
+    """True if no frame of the recording is louder than ABSOLUTE_FLOOR_DB."""
+    frame_samples = int(FRAME_SECONDS * sample_rate)
+    n_frames = max(1, len(audio) // frame_samples)
+    frames = np.asarray(audio[:n_frames * frame_samples], dtype=np.float32)
+    if not len(frames):
+        return True
+    frames = frames.reshape(n_frames, -1)
+    peak = np.einsum("ij,ij->i", frames, frames).max() / frames.shape[1]
+    return 10.0 * np.log10(peak + 1e-10) <= ABSOLUTE_FLOOR_DB
+
+
+def trim_silence(audio, sample_rate=SAMPLE_RATE, min_silence_seconds=None, padding_seconds=None, min_kept_fraction=None):
+    """
+    Returns (trimmed_audio, regions). regions is a list of dicts with the kept range in
+    the original recording ("start", "end") and where it begins in the trimmed audio
+    ("trimmed_start"), all in samples. regions is empty only for silent recordings;
+    when less than min_kept_fraction would be kept otherwise, the audio is returned whole.
+    """
+    min_kept_fraction = VAD_MIN_KEPT_FRACTION if min_kept_fraction is None else min_kept_fraction
+    ranges = speech_regions(audio, sample_rate, min_silence_seconds, padding_seconds)
+    if sum(end - start for start, end in ranges) < min_kept_fraction * len(audio):
+        if is_silent(audio):
+            return audio[:0], []
+        logger.warning("Voice activity kept less than %.0f%% of %.1fs of audible audio; using it untrimmed.",
+                       min_kept_fraction * 100, len(audio) / sample_rate)
+        ranges = [(0, len(audio))]
+    regions = []
+    offset = 0
+    for start, end in ranges:
+        regions.append({"start": start, "end": end, "trimmed_start": offset})
+        offset += end - start
+    if len(ranges) == 1 and ranges[0] == (0, len(audio)):
+        return audio, regions
+    trimmed = np.concatenate([audio[start:end] for start, end in ranges]) if ranges else audio[:0]
+    return trimmed, regions
+
+
+def _to_original(seconds, regions, sample_rate, side):
+    trimmed_starts = np.array([r["trimmed_start"] for r in regions]) / sample_rate
+    shifts = np.array([r["start"] - r["trimmed_start"] for r in regions]) / sample_rate
+    index = np.clip(np.searchsorted(trimmed_starts, seconds, side=side) - 1, 0, len(regions) - 1)
+    return np.asarray(seconds) + shifts[index]
+
+
+def map_segments(segments, regions, sample_rate=SAMPLE_RATE):
+    """Returns segments with "start"/"end" moved from the trimmed timeline to the original one."""
+    if not segments or not regions:
+        return segments
+    starts = _to_original(np.array([s["start"] for s in segments]), regions, sample_rate, "right")
+    # An end that falls exactly on a join belongs to the region before it
+    ends = _to_original(np.array([s["end"] for s in segments]), regions, sample_rate, "left")
+    return [{**segment, "start": float(start), "end": float(end)} for segment, start, end in zip(segments, starts, ends)]
@@ -0,0 +1,151 @@
+import tempfile
+import threading
+import time
+import unittest
+
+from services.admission import AdmissionController
+from utils.error_handlers import OverloadedError
+
+
+class AdmissionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+
+    def controller(self, **kwargs):
+        kwargs = {"max_concurrent": 1, "max_waiting": 8, "wait_timeout": 5, "max_background": 1, **kwargs}
+        return AdmissionController(lock_dir=self.lock_dir.name, **kwargs)
+
+    def start_waiter(self, admission, label, admitted, background=False, hold=0.0):
+        """Starts a thread that takes a slot and records label; returns once it is queued or running."""
+        queued = len(admission._queue)
+        running = admission._running
+
+        def run():
+            if background:
+                with admission.background(), admission.slot(label):
+                    admitted.append(label)
+                    time.sleep(hold)
+            else:
+                with admission.slot(label):
+                    admitted.append(label)
+                    time.sleep(hold)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while len(admission._queue) == queued and admission._running == running:
+            time.sleep(0.005)
+        return thread
+
+
+class TestQueueOrder(AdmissionTestCase):
+    def test_waiters_are_admitted_in_arrival_order(self):
+        admission = self.controller()
+        admitted = []
+        with admission.slot("holder"):
+            threads = [self.start_waiter(admission, label, admitted) for label in ("a", "b", "c")]
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, ["a", "b", "c"])
+
+    def test_interactive_requests_go_ahead_of_background_jobs(self):
+        admission = self.controller()
+        admitted = []
+        with admission.slot("holder"):
+            threads = [self.start_waiter(admission, "job", admitted, background=True),
+                       self.start_waiter(admission, "request", admitted)]
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, ["request", "job"])
+
+    def test_background_jobs_leave_a_slot_for_requests(self):
+        admission = self.controller(max_concurrent=2, max_background=1)
+        admitted = []
+        first = self.start_waiter(admission, "job-1", admitted, background=True, hold=0.5)
+        while not admitted:
+            time.sleep(0.005)
+        second = self.start_waiter(admission, "job-2", admitted, background=True)
+        with admission.slot("request"): # The reserved slot is still free
+            admitted.append("request")
+        self.assertEqual(admitted, ["job-1", "request"])
+        first.join()
+        second.join()
+        self.assertEqual(admitted, ["job-1", "request", "job-2"])
+
+
+class TestRejection(AdmissionTestCase):
+    def test_full_queue_is_rejected_with_retry_after(self):
+        admission = self.controller(max_waiting=0)
+        with admission.slot("holder"):
+            with self.assertRaises(OverloadedError) as raised:
+                with admission.slot("extra"):
+                    pass
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(raised.exception.to_dict()["retryAfter"], raised.exception.retry_after)
+        self.assertEqual(admission.stats()["rejected"], 1)
+
+    def test_wait_timeout_is_rejected(self):
+        admission = self.controller(wait_timeout=0.1)
+        with admission.slot("holder"):
+            with self.assertRaises(OverloadedError):
+                with admission.slot("late"):
+                    pass
+        self.assertEqual(admission.stats()["timedOut"], 1)
+        self.assertEqual(admission.stats()["waiting"], 0)
+
+    def test_background_jobs_are_not_rejected(self):
+        admission = self.controller(max_waiting=0, wait_timeout=0.05)
+        admitted = []
+        with admission.slot("holder"):
+            job = self.start_waiter(admission, "job", admitted, background=True)
+            time.sleep(0.1)
+        job.join()
+        self.assertEqual(admitted, ["job"])
+
+    def test_retry_after_grows_with_the_backlog(self):
+        admission = self.controller(max_concurrent=2)
+        admission._service_seconds = 10.0
+        self.assertEqual(admission.retry_after(), 1)
+        with admission.slot("a"), admission.slot("b"):
+            self.assertEqual(admission.retry_after(), 10)
+
+
+class TestMachineWideSlots(AdmissionTestCase):
+    def test_slots_are_shared_through_the_lock_directory(self):
+        # Two controllers on one lock directory stand in for two worker processes
+        first, second = self.controller(max_waiting=0), self.controller(max_waiting=0)
+        with first.slot("holder"):
+            with self.assertRaises(OverloadedError):
+                with second.slot("other worker"):
+                    pass
+        with second.slot("after release"):
+            self.assertEqual(second.stats()["running"], 1)
+
+    def test_waiter_notices_a_release_in_another_process(self):
+        first, second = self.controller(), self.controller()
+        admitted = []
+        with first.slot("holder"):
+            waiter = self.start_waiter(second, "other worker", admitted)
+            time.sleep(0.1)
+            self.assertEqual(admitted, [])
+        waiter.join(timeout=2)
+        self.assertEqual(admitted, ["other worker"])
+
+
+class TestExtraSlots(AdmissionTestCase):
+    def test_takes_only_free_slots_and_releases_them(self):
+        admission = self.controller(max_concurrent=3, max_waiting=0)
+        other_worker = self.controller(max_concurrent=3, max_waiting=0)
+        with admission.slot("chunked recording"):
+            with admission.extra_slots(5) as extra:
+                self.assertEqual(extra, 2)
+                with self.assertRaises(OverloadedError):
+                    with other_worker.slot("request"):
+                        pass
+            with other_worker.slot("request"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
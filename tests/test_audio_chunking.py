@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.audio_chunking import SAMPLE_RATE, plan_chunks, stitch_segments, join_segments
+from services.transcription import run_bounded
+
+
+def speech_with_pauses(seconds, pauses):
+    """Loud noise with silent half-second pauses centered at the given times (seconds)."""
+    audio = (0.3 * np.random.default_rng(0).standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+    for pause in pauses:
+        audio[int((pause - 0.25) * SAMPLE_RATE):int((pause + 0.25) * SAMPLE_RATE)] = 0
+    return audio
+
+
+class TestPlanChunks(unittest.TestCase):
+    def test_owned_regions_tile_the_recording(self):
+        audio = speech_with_pauses(95, [])
+        chunks = plan_chunks(audio, chunk_seconds=20, overlap_seconds=2)
+        self.assertEqual(chunks[0]["owned_start"], 0)
+        self.assertEqual(chunks[-1]["owned_end"], len(audio))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous["owned_end"], chunk["owned_start"])
+        for chunk in chunks:
+            self.assertEqual(chunk["start"], max(0, chunk["owned_start"] - 2 * SAMPLE_RATE))
+            self.assertEqual(chunk["end"], min(len(audio), chunk["owned_end"] + 2 * SAMPLE_RATE))
+
+    def test_cuts_move_into_pauses(self):
+        audio = speech_with_pauses(60, [21.0, 39.5])
+        cuts = [chunk["owned_start"] / SAMPLE_RATE for chunk in plan_chunks(audio, chunk_seconds=20, overlap_seconds=1)[1:]]
+        self.assertEqual(len(cuts), 2)
+        self.assertAlmostEqual(cuts[0], 21.0, delta=0.25)
+        self.assertAlmostEqual(cuts[1], 39.5, delta=0.25)
+
+    def test_short_recording_is_one_chunk(self):
+        audio = speech_with_pauses(25, [])
+        self.assertEqual(plan_chunks(audio, chunk_seconds=20, overlap_seconds=2),
+                         [{"start": 0, "end": len(audio), "owned_start": 0, "owned_end": len(audio)}])
+
+
+class TestStitchSegments(unittest.TestCase):
+    # Owned regions 0-10 s and 10-20 s, with a 2-second overlap on each side
+    FIRST = {"start": 0, "end": 12 * SAMPLE_RATE, "owned_start": 0, "owned_end": 10 * SAMPLE_RATE}
+    SECOND = {"start": 8 * SAMPLE_RATE, "end": 20 * SAMPLE_RATE, "owned_start": 10 * SAMPLE_RATE, "owned_end": 20 * SAMPLE_RATE}
+
+    def test_timestamps_are_offset_by_the_window_start(self):
+        stitched = stitch_segments([(self.SECOND, [{"start": 4.0, "end": 6.0, "text": " b"}]),
+                                    (self.FIRST, [{"start": 1.0, "end": 3.0, "text": " a"}])])
+        self.assertEqual(stitched, [{"start": 1.0, "end": 3.0, "text": " a"}, {"start": 12.0, "end": 14.0, "text": " b"}])
+
+    def test_overlap_is_kept_once(self):
+        # " shared" spans 9-10.5 s; both chunks transcribe it, the first owns its midpoint (9.75 s)
+        first = [{"start": 7.0, "end": 9.0, "text": " before"}, {"start": 9.0, "end": 10.5, "text": " shared"},
+                 {"start": 10.5, "end": 12.0, "text": " cut off"}]
+        second = [{"start": 1.0, "end": 2.5, "text": " shared"}, {"start": 2.5, "end": 4.0, "text": " after"}]
+        stitched = stitch_segments([(self.FIRST, first), (self.SECOND, second)])
+        self.assertEqual(join_segments(stitched), " before shared after")
+        self.assertEqual([(s["start"], s["end"]) for s in stitched], [(7.0, 9.0), (9.0, 10.5), (10.5, 12.0)])
+
+
+class TestRunBounded(unittest.TestCase):
+    def test_limits_calls_in_flight_and_keeps_order(self):
+        lock = threading.Lock()
+        running = [0, 0] # current, peak
+
+        def work(value):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.01 * (value % 3))
+            with lock:
+                running[0] -= 1
+            return value * 10
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = run_bounded(pool, work, [(i,) for i in range(8)], limit=2)
+        self.assertEqual(results, [i * 10 for i in range(8)])
+        self.assertEqual(running[1], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
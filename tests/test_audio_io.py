@@ -0,0 +1,104 @@
+import io
+import wave
+import unittest
+
+import numpy as np
+
+from services.audio_io import decode_audio_bytes, decode_wav_bytes, resample
+from utils.error_handlers import AppError
+
+SR = 16000
+
+
+def tone(frequency, seconds, rate):
+    return np.sin(2 * np.pi * frequency * np.arange(int(seconds * rate)) / rate)
+
+
+def wav_bytes(samples, rate, channels=1, sample_width=2):
+    scale = {1: 127, 2: 32767, 3: 8388607}[sample_width]
+    ints = np.repeat(np.round(np.clip(samples, -1, 1) * scale).astype(np.int32), channels)
+    if sample_width == 1:
+        raw = (ints + 128).astype(np.uint8).tobytes()
+    else:
+        raw = ints.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :sample_width].tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(raw)
+    return buffer.getvalue()
+
+
+def float_wav_bytes(samples, rate):
+    payload = np.asarray(samples, dtype="<f4").tobytes()
+    fmt = (3).to_bytes(2, "little") + (1).to_bytes(2, "little") + rate.to_bytes(4, "little") + \
+        (rate * 4).to_bytes(4, "little") + (4).to_bytes(2, "little") + (32).to_bytes(2, "little")
+    chunks = b"fmt " + len(fmt).to_bytes(4, "little") + fmt + b"data" + len(payload).to_bytes(4, "little") + payload
+    return b"RIFF" + (4 + len(chunks)).to_bytes(4, "little") + b"WAVE" + chunks
+
+
+def rms_db(samples):
+    return 20 * np.log10(np.sqrt(np.mean(np.square(samples))) / np.sqrt(0.5) + 1e-12)
+
+
+class TestDecodeWav(unittest.TestCase):
+    def test_pcm16_mono_at_16khz_is_exact(self):
+        samples = tone(440, 1, SR) * 0.5
+        decoded = decode_wav_bytes(wav_bytes(samples, SR))
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_allclose(decoded, samples, atol=1 / 32768)
+
+    def test_sample_widths(self):
+        samples = tone(440, 0.5, SR) * 0.5
+        for width, tolerance in ((1, 1 / 64), (3, 1e-6)):
+            with self.subTest(width=width):
+                np.testing.assert_allclose(decode_wav_bytes(wav_bytes(samples, SR, sample_width=width)), samples, atol=tolerance)
+        np.testing.assert_allclose(decode_wav_bytes(float_wav_bytes(samples, SR)), samples, atol=1e-7)
+
+    def test_stereo_44khz_is_mixed_down_and_resampled(self):
+        decoded = decode_wav_bytes(wav_bytes(tone(440, 2, 44100) * 0.5, 44100, channels=2))
+        self.assertEqual(len(decoded), 2 * SR)
+        np.testing.assert_allclose(decoded[500:-500], tone(440, 2, SR)[500:-500] * 0.5, atol=1e-3)
+
+    def test_truncated_data_chunk_keeps_what_is_there(self):
+        data = wav_bytes(tone(440, 1, SR) * 0.5, SR)
+        self.assertEqual(len(decode_audio_bytes(data[:44 + 2 * 8000])), 8000)
+
+    def test_corrupt_wav_is_a_client_error(self):
+        data = wav_bytes(tone(440, 1, SR) * 0.5, SR)
+        corrupt = {
+            "truncated header": data[:30],
+            "no data chunk": data[:36],
+            "empty data": data[:44],
+            "zero sample rate": data[:24] + bytes(4) + data[28:],
+        }
+        for name, payload in corrupt.items():
+            with self.subTest(name), self.assertRaises(AppError) as raised:
+                decode_audio_bytes(payload)
+            self.assertEqual(raised.exception.status_code, 400)
+
+
+class TestResample(unittest.TestCase):
+    def test_speech_band_passes_unchanged(self):
+        for rate in (8000, 22050, 44100, 48000):
+            with self.subTest(rate=rate):
+                resampled = resample(tone(3000 if rate > 8000 else 1000, 1, rate).astype(np.float32), rate)
+                self.assertEqual(len(resampled), SR)
+                self.assertAlmostEqual(rms_db(resampled[1000:-1000]), 0.0, delta=0.05)
+
+    def test_frequencies_above_the_new_nyquist_are_removed(self):
+        for rate in (22050, 44100, 48000):
+            for frequency in (8000, 9000, 11000):
+                with self.subTest(rate=rate, frequency=frequency):
+                    resampled = resample(tone(frequency, 1, rate).astype(np.float32), rate)
+                    self.assertLess(rms_db(resampled[1000:-1000]), -60)
+
+    def test_no_time_shift(self):
+        impulse = np.zeros(48000, dtype=np.float32)
+        impulse[24000] = 1.0
+        self.assertEqual(int(np.argmax(resample(impulse, 48000))), 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import types
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from services import batch
+from services.admission import AdmissionController
+from services.result_cache import ResultCache
+from utils.error_handlers import TranscriptionError
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        self.admission = AdmissionController(max_concurrent=1, max_waiting=0, wait_timeout=1, max_background=1,
+                                             lock_dir=os.path.join(self.dir, "admission"))
+        self.patch(batch, "transcription_admission", self.admission)
+        self.patch(batch, "index_meeting", mock.Mock())
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def items(self, *contents):
+        """Writes one file per content string; a file's content is its fake transcript (or "fail")."""
+        items = []
+        for i, content in enumerate(contents):
+            path = os.path.join(self.dir, f"audio{i}.wav")
+            with open(path, "w") as f:
+                f.write(content)
+            items.append({"name": f"audio{i}.wav", "path": path, "meetingId": f"meeting_{i}"})
+        return items
+
+
+class TestRunBatch(BatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ResultCache("batch-test", max_bytes=1 << 20, enabled=True)
+        self.cache.cache_dir = os.path.join(self.dir, "cache")
+        self.patch(batch, "transcript_cache", self.cache)
+        self.transcribed = []
+        self.background = []
+        self.patch(batch, "transcribe_batch", self.fake_transcribe_batch)
+        self.patch(batch, "run_insights_stage_async", self.fake_insights)
+
+    def fake_transcribe_batch(self, paths, model_name=None, reports=None):
+        self.transcribed.append([os.path.basename(path) for path in paths])
+        self.background.append(self.admission._local.background)
+        results = []
+        for index, path in enumerate(paths):
+            with open(path) as f:
+                text = f.read()
+            if text == "fail":
+                results.append(TranscriptionError("Whisper transcription failed: out of memory"))
+                continue
+            reports[index] = {"audioSeconds": 1.0, "timings": {"transcribeSeconds": 0.1}}
+            results.append(text)
+        return results
+
+    @staticmethod
+    async def fake_insights(transcript, meeting_id):
+        return {"transcriptPath": f"{meeting_id}.txt", "insightsPath": f"{meeting_id}.md", "cache": {"insights": "miss"}}
+
+    def test_partial_failure_keeps_the_other_items(self):
+        summary = batch.run_batch(self.items("first meeting", "fail", "third meeting"))
+        self.assertEqual([item["status"] for item in summary["items"]], ["success", "error", "success"])
+        self.assertEqual(summary["status"], "partial")
+        self.assertIn("out of memory", summary["items"][1]["message"])
+        batch.index_meeting.assert_any_call("meeting_1", status="failed")
+
+    def test_cached_transcripts_are_reused(self):
+        items = self.items("first meeting", "fail")
+        batch.run_batch(items)
+        with open(items[1]["path"], "w") as f:
+            f.write("second meeting")
+        summary = batch.run_batch(items)
+        self.assertEqual(self.transcribed, [["audio0.wav", "audio1.wav"], ["audio1.wav"]])
+        self.assertEqual([item["cache"]["transcript"] for item in summary["items"]], ["hit", "miss"])
+        self.assertEqual(summary["status"], "success")
+
+    def test_transcription_runs_as_background_work(self):
+        batch.run_batch(self.items("first meeting"))
+        self.assertEqual(self.background, [True])
+
+
+class FakeTensor(list):
+    def to(self, device):
+        return self
+
+
+class TestTranscribeBatch(BatchTestCase):
+    """Runs transcribe_batch against stand-ins for torch and whisper; each file's audio is a constant marker value."""
+
+    def setUp(self):
+        super().setUp()
+        whisper = types.ModuleType("whisper")
+        whisper.audio = types.SimpleNamespace(N_SAMPLES=16000)
+        whisper.DecodingOptions = lambda **kwargs: kwargs
+        whisper.load_audio = lambda path: np.full(24000, float(open(path).read()), dtype=np.float32)
+        whisper.pad_or_trim = lambda audio: audio
+        whisper.log_mel_spectrogram = lambda audio, n_mels: audio
+        whisper.decode = self.fake_decode
+        torch = types.ModuleType("torch")
+        torch.stack = FakeTensor
+        patcher = mock.patch.dict(sys.modules, {"whisper": whisper, "whisper.audio": whisper.audio, "torch": torch})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model = types.SimpleNamespace(device=types.SimpleNamespace(type="cpu"), dims=types.SimpleNamespace(n_mels=80))
+        self.patch(batch.model_registry, "get_whisper", lambda name=None: ("base", model))
+        self.patch(batch, "BATCH_DECODE_SIZE", 2)
+
+    @staticmethod
+    def fake_decode(model, mel, options):
+        markers = [int(window[0]) for window in mel]
+        if 2 in markers:
+            raise RuntimeError("decoder crashed")
+        return [types.SimpleNamespace(text=f" file {marker}") for marker in markers]
+
+    def test_failed_group_fails_only_its_files(self):
+        # Two windows per file and two windows per group: each group holds one file
+        paths = [item["path"] for item in self.items("1", "2", "3")]
+        reports = [None] * 3
+        results = batch.transcribe_batch(paths, reports=reports)
+        self.assertEqual(results[0], "file 1 file 1")
+        self.assertIsInstance(results[1], TranscriptionError)
+        self.assertEqual(results[2], "file 3 file 3")
+        self.assertEqual(reports[0]["audioSeconds"], 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from services import gemini_stub
+from services.insights_client import InsightsClient
+from utils.error_handlers import GeminiError
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Streams the given chunks; each entry of failures is raised by one attempt, in order."""
+    model_name = "fake"
+
+    def __init__(self, chunks, failures=(), fail_after=None):
+        self.chunks = chunks
+        self.failures = list(failures)
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return self._chunks()
+
+    def _chunks(self):
+        for i, text in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise Unavailable("connection reset")
+            yield Chunk(text)
+
+
+def client(model, **kwargs):
+    kwargs = {"rate_per_minute": 6000, "burst": 10, "max_concurrency": 1, "backoff_base": 0.001, **kwargs}
+    return InsightsClient(model_getter=lambda: model, **kwargs)
+
+
+class TestStream(unittest.TestCase):
+    def test_yields_text_and_returns_the_response(self):
+        stream = client(FakeModel(["a", "", "b"])).stream("prompt")
+        chunks = []
+        try:
+            while True:
+                chunks.append(next(stream))
+        except StopIteration as stop:
+            response = stop.value
+        self.assertEqual(chunks, ["a", "b"])
+        self.assertIsNotNone(response)
+
+    def test_slot_is_held_until_the_stream_is_closed(self):
+        insights = client(FakeModel(["a", "b"]))
+        stream = insights.stream("prompt")
+        next(stream)
+        self.assertFalse(insights._semaphore.acquire(blocking=False))
+        stream.close()
+        self.assertTrue(insights._semaphore.acquire(blocking=False))
+
+    def test_failure_before_the_first_chunk_is_retried(self):
+        model = FakeModel(["a"], failures=[Unavailable("busy")])
+        self.assertEqual(list(client(model).stream("prompt")), ["a"])
+        self.assertEqual(model.calls, 2)
+
+    def test_failure_mid_stream_is_not_retried(self):
+        model = FakeModel(["a", "b"], fail_after=1)
+        stream = client(model).stream("prompt")
+        self.assertEqual(next(stream), "a")
+        with self.assertRaises(GeminiError):
+            next(stream)
+        self.assertEqual(model.calls, 1)
+
+
+class TestGenerateAsync(unittest.TestCase):
+    def start_stub(self, **kwargs):
+        server = gemini_stub.serve(port=0, **{"latency": 0.05, **kwargs})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return gemini_stub.StubGenerativeModel(f"http://127.0.0.1:{server.server_address[1]}")
+
+    def run_prompts(self, insights, prompts):
+        async def run():
+            return await asyncio.gather(*(insights.generate_async(prompt, f"p{i}") for i, prompt in enumerate(prompts)))
+        return [response.text for response in asyncio.run(run())]
+
+    def test_concurrent_calls_stay_within_the_concurrency_limit(self):
+        # The stub answers 429 above two calls in flight; the client must never get there
+        model = self.start_stub(max_concurrency=2)
+        insights = client(model, max_concurrency=2, max_retries=0)
+        prompts = [f"Meeting {i} about the roadmap" for i in range(6)]
+        self.assertEqual(self.run_prompts(insights, prompts), [gemini_stub.stub_insights_text(p) for p in prompts])
+
+    def test_throttled_calls_are_retried(self):
+        model = self.start_stub(throttle_rate=0.5, seed=1)
+        insights = client(model, max_concurrency=4, max_retries=20)
+        prompts = [f"Meeting {i}" for i in range(4)]
+        self.assertEqual(self.run_prompts(insights, prompts), [gemini_stub.stub_insights_text(p) for p in prompts])
+
+
+if __name__ == "__main__":
+    unittest.main()
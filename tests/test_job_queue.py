@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import storage_service
+from services.job_queue import JobQueue, JOB_COMPLETED, JOB_FAILED
+from utils.error_handlers import AppError
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.job_dir = os.path.join(directory.name, "jobs")
+        patcher = mock.patch.object(storage_service, "JOB_STATUS_DIR", self.job_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = JobQueue(max_workers=1, max_pending=4, max_history=2)
+        self.addCleanup(self.queue._executor.shutdown)
+
+    def run_jobs(self, *job_ids, fn=lambda job_id: {"id": job_id}):
+        for job_id in job_ids:
+            self.queue.submit(job_id, fn, job_id, keep_result=True)
+        self.queue._executor.submit(lambda: None).result() # The single worker runs jobs in order
+
+    def test_records_are_saved_outside_the_meetings_directory(self):
+        self.run_jobs("batch_1")
+        self.assertEqual(os.listdir(self.job_dir), ["batch_1.json"])
+        self.assertEqual(storage_service.load_job_status("batch_1")["result"], {"id": "batch_1"})
+
+    def test_finished_jobs_beyond_the_history_are_read_from_disk(self):
+        self.run_jobs("a", "b", "c")
+        self.assertEqual(list(self.queue._finished), ["b", "c"])
+        self.assertEqual(self.queue._jobs, {})
+        job = self.queue.get("a")
+        self.assertEqual((job["status"], job["result"]), (JOB_COMPLETED, {"id": "a"}))
+
+    def test_failed_job_keeps_its_error(self):
+        def fail(job_id):
+            raise AppError("bad audio", status_code=400)
+        self.run_jobs("a", fn=fail)
+        job = self.queue.get("a")
+        self.assertEqual((job["status"], job["error"]), (JOB_FAILED, "bad audio"))
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.queue.get("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from services import live_transcription
+from services.admission import AdmissionController
+from services.audio_chunking import SAMPLE_RATE
+from services.live_transcription import LiveSession
+
+
+def frames(seconds, amplitude=1000):
+    """PCM16 bytes of the given length."""
+    return np.full(int(seconds * SAMPLE_RATE), amplitude, dtype="<i2").tobytes()
+
+
+class FakeModel:
+    """Transcribes any buffer as one segment per whole second ("silent" buffers, amplitude 0, as none)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(len(audio) / SAMPLE_RATE)
+        if not audio.any():
+            return {"segments": []}
+        return {"segments": [{"start": float(i), "end": float(i + 1), "text": f" w{i}"}
+                             for i in range(int(len(audio) / SAMPLE_RATE))]}
+
+
+class LiveSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.admission = AdmissionController(max_concurrent=1, max_waiting=4, wait_timeout=5, max_background=1,
+                                             lock_dir=os.path.join(directory.name, "admission"))
+        self.model = FakeModel()
+        for name, value in (("transcription_admission", self.admission), ("LIVE_STEP_SECONDS", 5),
+                            ("LIVE_HOLDBACK_SECONDS", 2)):
+            patcher = mock.patch.object(live_transcription, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(live_transcription.model_registry, "get_whisper", lambda name=None: ("fake", self.model))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = LiveSession("meeting_live")
+
+
+class TestCommit(LiveSessionTestCase):
+    def test_holdback_keeps_the_tail_tentative(self):
+        self.assertEqual(self.session.add_frames(frames(4)), ([], None)) # Below one step
+        committed, tentative = self.session.add_frames(frames(1))
+        self.assertEqual([(s["start"], s["end"]) for s in committed], [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(tentative, " w3 w4")
+        self.assertEqual(self.session._buffer_offset, 3)
+        self.assertEqual(len(self.session._buffer), 2 * SAMPLE_RATE)
+
+    def test_segments_keep_global_timestamps_across_steps(self):
+        self.session.add_frames(frames(5))
+        committed, _ = self.session.add_frames(frames(5))
+        self.assertEqual([(s["start"], s["end"]) for s in committed], [(3, 4), (4, 5), (5, 6), (6, 7), (7, 8)])
+        self.assertEqual(self.model.calls, [5, 7])
+        self.assertEqual(self.session.finish(), "".join(f" w{i}" for i in range(3)) + " w0 w1 w2 w3 w4 w0 w1")
+        self.assertEqual(self.session.segments[-1]["end"], 10)
+        self.assertEqual(len(self.session._buffer), 0)
+
+    def test_silent_window_is_dropped(self):
+        for _ in range(6):
+            self.session.add_frames(frames(5, amplitude=0))
+        self.assertEqual(self.session._buffer_offset, 30)
+        self.assertEqual(len(self.session._buffer), 0)
+        self.assertEqual(self.session.segments, [])
+
+
+class TestLocking(LiveSessionTestCase):
+    def test_frames_are_accepted_while_a_step_waits_for_a_slot(self):
+        results = []
+        with self.admission.slot("another recording"):
+            step = threading.Thread(target=lambda: results.append(self.session.add_frames(frames(5))))
+            step.start()
+            while not self.admission._queue:
+                time.sleep(0.005)
+            started = time.monotonic()
+            self.assertEqual(self.session.add_frames(frames(1)), ([], None))
+            self.assertLess(time.monotonic() - started, 1)
+        step.join()
+        self.assertEqual(self.model.calls, [6]) # The step picked up the frame posted while it waited
+        self.assertEqual(len(results[0][0]), 4)
+
+    def test_finish_waits_for_a_running_step(self):
+        with self.admission.slot("another recording"):
+            step = threading.Thread(target=self.session.add_frames, args=(frames(5),))
+            step.start()
+            while not self.admission._queue:
+                time.sleep(0.005)
+            finished = []
+            closer = threading.Thread(target=lambda: finished.append(self.session.finish()))
+            closer.start()
+            time.sleep(0.05)
+            self.assertEqual(finished, [])
+        step.join()
+        closer.join()
+        self.assertEqual(finished, [" w0 w1 w2 w0 w1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+from services import local_insights
+from services.local_insights import generate_local_insights, route_insights
+
+SECTIONS = ["**1. Summary:**", "**2. Action Items:**", "**3. Sentiment:**", "**4. Key Insights/Decisions:**",
+            "**5. Number of Participants:**", "**6. Follow-up Questions/Topics:**"]
+
+MEETING = ("John will send the deck by Monday. Great work on the launch, everyone. "
+           "We agreed to move the review to Thursday. The budget is still a concern for Priya. "
+           "Should we invite the design team next time?")
+
+
+def section(insights, number):
+    """Returns the text of one numbered section, header excluded."""
+    start = insights.index(SECTIONS[number - 1]) + len(SECTIONS[number - 1])
+    end = insights.index(SECTIONS[number]) if number < len(SECTIONS) else len(insights)
+    return insights[start:end]
+
+
+class TestRouting(unittest.TestCase):
+    def test_short_transcript_is_local(self):
+        self.assertEqual(route_insights(MEETING), ("local", "short"))
+
+    def test_transcript_with_little_content_is_local(self):
+        self.assertEqual(route_insights("Okay. Yeah, yeah. Thank you so much. " * 20), ("local", "low_content"))
+
+    def test_long_transcript_goes_to_gemini(self):
+        self.assertEqual(route_insights(MEETING * 10), ("gemini", "long"))
+
+    def test_disabled_local_insights_go_to_gemini(self):
+        with mock.patch.object(local_insights, "ENABLE_LOCAL_INSIGHTS", False):
+            self.assertEqual(route_insights(MEETING), ("gemini", "local_disabled"))
+
+
+class TestSections(unittest.TestCase):
+    def setUp(self):
+        self.insights = generate_local_insights(MEETING)
+
+    def test_all_six_sections_in_order(self):
+        positions = [self.insights.index(header) for header in SECTIONS]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_action_item_owner(self):
+        self.assertIn("John will send the deck by Monday. (responsible: John)", section(self.insights, 2))
+
+    def test_sentiment(self):
+        self.assertIn("Mixed", section(self.insights, 3))
+
+    def test_decisions(self):
+        self.assertIn("We agreed to move the review to Thursday.", section(self.insights, 4))
+
+    def test_sentence_initial_names_are_participants(self):
+        participants = section(self.insights, 5)
+        self.assertIn("Names mentioned: John, Priya.", participants) # Not "Great", "Should" or "Monday"
+
+    def test_questions(self):
+        self.assertIn("Should we invite the design team next time?", section(self.insights, 6))
+
+    def test_empty_transcript(self):
+        insights = generate_local_insights("")
+        for header in SECTIONS:
+            self.assertIn(header, insights)
+
+
+if __name__ == "__main__":
+    unittest.main()
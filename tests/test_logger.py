@@ -0,0 +1,103 @@
+import sys
+import json
+import queue
+import logging
+import unittest
+from unittest import mock
+
+from utils import logger as logger_module
+from utils.logger import (
+    ContextFilter, DebugRateLimitFilter, JsonFormatter, LazyQueueHandler, log_context,
+)
+
+
+def make_record(msg, *args, level=logging.INFO, lineno=10):
+    return logging.LogRecord("neuronote_app", level, "/app/services/example.py", lineno, msg, args, None)
+
+
+class TestLazyQueueHandler(unittest.TestCase):
+    def setUp(self):
+        self.handler = LazyQueueHandler(queue.Queue(1))
+
+    def test_mutable_args_are_formatted_up_front(self):
+        speakers = ["Ana"]
+        record = self.handler.prepare(make_record("Speakers: %s", speakers))
+        speakers.append("Ben")
+        self.assertEqual(record.getMessage(), "Speakers: ['Ana']")
+        self.assertIsNone(record.args)
+
+    def test_immutable_args_are_left_for_the_listener(self):
+        record = self.handler.prepare(make_record("Saved %s in %.1f s", "m1", 2.0))
+        self.assertEqual(record.msg, "Saved %s in %.1f s")
+        self.assertEqual(record.args, ("m1", 2.0))
+
+    def test_records_are_dropped_when_the_queue_is_full(self):
+        self.handler.enqueue(make_record("first"))
+        self.handler.enqueue(make_record("second"))
+        self.assertEqual(self.handler.dropped, 1)
+        self.assertEqual(self.handler.queue.get_nowait().msg, "first")
+
+
+class TestDebugRateLimitFilter(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch.object(logger_module.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.filter = DebugRateLimitFilter(rate=2)
+
+    def passes(self, record):
+        return self.filter.filter(record)
+
+    def test_debug_records_are_limited_per_call_site(self):
+        results = [self.passes(make_record("tick", level=logging.DEBUG)) for _ in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        # Another line has its own bucket
+        self.assertTrue(self.passes(make_record("other", level=logging.DEBUG, lineno=20)))
+
+    def test_next_record_reports_the_suppressed_count(self):
+        for _ in range(5):
+            self.passes(make_record("tick", level=logging.DEBUG))
+        self.now += 0.5 # Refills one token at two per second
+        record = make_record("tick", level=logging.DEBUG)
+        self.assertTrue(self.passes(record))
+        self.assertEqual(record.getMessage(), "tick [3 similar debug messages suppressed]")
+        self.now += 0.5
+        record = make_record("tick", level=logging.DEBUG)
+        self.assertTrue(self.passes(record))
+        self.assertEqual(record.getMessage(), "tick")
+
+    def test_other_levels_are_not_limited(self):
+        self.assertTrue(all(self.passes(make_record("warn", level=logging.WARNING)) for _ in range(10)))
+
+    def test_zero_rate_is_unlimited(self):
+        unlimited = DebugRateLimitFilter(rate=0)
+        self.assertTrue(all(unlimited.filter(make_record("tick", level=logging.DEBUG)) for _ in range(10)))
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def format(self, record):
+        ContextFilter().filter(record) # Runs on the logging thread, as the queue handler's filter does
+        return json.loads(JsonFormatter().format(record))
+
+    def test_meeting_id_from_log_context(self):
+        with log_context("meeting-42"):
+            entry = self.format(make_record("Saved %s", "transcript"))
+        self.assertEqual(entry["meetingId"], "meeting-42")
+        self.assertEqual(entry["message"], "Saved transcript")
+        self.assertEqual(entry["level"], "INFO")
+
+    def test_no_meeting_id_outside_a_context(self):
+        self.assertNotIn("meetingId", self.format(make_record("Started")))
+
+    def test_exceptions_are_included(self):
+        try:
+            raise ValueError("bad frame")
+        except ValueError:
+            record = make_record("Decode failed")
+            record.exc_info = sys.exc_info()
+        self.assertIn("ValueError: bad frame", self.format(record)["exception"])
+
+
+if __name__ == "__main__":
+    unittest.main()
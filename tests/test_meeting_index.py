@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import pipeline, storage_service
+from services.meeting_index import MeetingIndex, decode_cursor
+from utils.error_handlers import GeminiError
+
+
+class MeetingIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index = MeetingIndex(path=os.path.join(directory.name, "index.sqlite3"))
+        for day in range(1, 6):
+            self.index.update_meeting(f"meeting_202405{day:02d}_100000_000000", status="completed",
+                                      whisperModel="base" if day % 2 else "small")
+
+    def ids(self, **kwargs):
+        meetings, _ = self.index.list_meetings(**kwargs)
+        return [meeting["meetingId"][8:16] for meeting in meetings]
+
+
+class TestPaging(MeetingIndexTestCase):
+    def test_cursor_pages_through_every_meeting_once(self):
+        pages = []
+        cursor = None
+        while True:
+            meetings, cursor = self.index.list_meetings(limit=2, cursor=cursor)
+            pages.append([meeting["meetingId"][8:16] for meeting in meetings])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [["20240505", "20240504"], ["20240503", "20240502"], ["20240501"]])
+
+    def test_cursor_round_trip(self):
+        _, cursor = self.index.list_meetings(limit=1)
+        self.assertEqual(decode_cursor(cursor), ("2024-05-05T10:00:00", "meeting_20240505_100000_000000"))
+
+    def test_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            self.index.list_meetings(cursor="not a cursor")
+
+
+class TestFilters(MeetingIndexTestCase):
+    def test_status_and_model(self):
+        self.index.update_meeting("meeting_20240503_100000_000000", status="failed")
+        self.assertEqual(self.ids(status="failed"), ["20240503"])
+        self.assertEqual(self.ids(status="completed", whisper_model="base"), ["20240505", "20240501"])
+
+    def test_dates_and_times(self):
+        self.assertEqual(self.ids(since="2024-05-02", until="2024-05-04"), ["20240503", "20240502"])
+        self.assertEqual(self.ids(since="2024-05-04T10:00:00"), ["20240505", "20240504"])
+        self.assertEqual(self.ids(until="2024-05-02T09:59"), ["20240501"])
+
+    def test_malformed_dates(self):
+        for value in ("yesterday", "2024-13-01", "05/01/2024"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                self.index.list_meetings(since=value)
+
+
+class TestFailedPipeline(MeetingIndexTestCase):
+    def test_failed_run_marks_the_meeting(self):
+        meeting_id = "meeting_20240506_100000_000000"
+        with mock.patch.object(storage_service, "meeting_index", self.index), \
+                mock.patch.object(pipeline, "transcribe_stage", side_effect=RuntimeError("model crashed")):
+            with self.assertRaises(RuntimeError):
+                pipeline.run_pipeline("audio.wav", meeting_id)
+        self.assertEqual(self.index.get(meeting_id)["status"], "failed")
+
+    def test_failed_stream_marks_the_meeting(self):
+        meeting_id = "meeting_20240507_100000_000000"
+
+        def failing_stream(transcript):
+            yield "**1. Summary:**"
+            raise GeminiError("Gemini API call failed: 503")
+
+        with mock.patch.object(storage_service, "meeting_index", self.index), \
+                mock.patch.object(pipeline, "transcribe_stage", return_value=("A long meeting.", "miss")), \
+                mock.patch.object(pipeline, "route_insights", return_value=("gemini", "long")), \
+                mock.patch.object(pipeline, "insights_cache", mock.Mock(get=mock.Mock(return_value=None))), \
+                mock.patch.object(pipeline, "save_transcript", return_value="transcript.txt"), \
+                mock.patch.object(pipeline, "generate_insights_stream", failing_stream):
+            events = pipeline.stream_pipeline("audio.wav", meeting_id)
+            self.assertEqual([next(events)[0], next(events)[0]], ["transcript", "insights"])
+            with self.assertRaises(GeminiError):
+                next(events)
+        self.assertEqual(self.index.get(meeting_id)["status"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
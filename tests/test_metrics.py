@@ -0,0 +1,138 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import metrics
+from utils.metrics import MetricsRegistry
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_exposition(text):
+    """Parses Prometheus text output into {(name, sorted label pairs): value} and {name: type}."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if line.startswith("#") or not line:
+            continue
+        match = SAMPLE_LINE.match(line)
+        if match is None:
+            raise AssertionError(f"Malformed sample line: {line!r}")
+        name, labels, value = match.groups()
+        pairs = tuple(sorted(LABEL.findall(labels or "")))
+        samples[(name, pairs)] = float(value)
+    return samples, types
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(metrics, "ENABLE_METRICS", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestHistogram(MetricsTestCase):
+    def test_buckets_are_cumulative(self):
+        registry = MetricsRegistry(multiprocess_dir=None)
+        histogram = registry.histogram("test_seconds", "Test latency.", labels=("stage",), buckets=(0.1, 1, 10))
+        for value in (0.05, 0.1, 0.5, 5, 50):
+            histogram.observe(value, "decode")
+        samples, types = parse_exposition(registry.render())
+        self.assertEqual(types["test_seconds"], "histogram")
+        buckets = {le: samples[("test_seconds_bucket", (("le", le), ("stage", "decode")))]
+                   for le in ("0.1", "1.0", "10.0", "+Inf")}
+        # A value equal to a bound falls in that bucket (le = "less than or equal")
+        self.assertEqual(buckets, {"0.1": 2, "1.0": 3, "10.0": 4, "+Inf": 5})
+        self.assertEqual(samples[("test_seconds_count", (("stage", "decode"),))], 5)
+        self.assertAlmostEqual(samples[("test_seconds_sum", (("stage", "decode"),))], 55.65)
+
+    def test_disabled_metrics_record_nothing(self):
+        registry = MetricsRegistry(multiprocess_dir=None)
+        counter = registry.counter("test_total", "Test counter.")
+        with mock.patch.object(metrics, "ENABLE_METRICS", False):
+            counter.inc()
+        samples, _ = parse_exposition(registry.render())
+        self.assertEqual(samples, {})
+
+
+class TestMultiprocess(MetricsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_registry(self):
+        registry = MetricsRegistry(multiprocess_dir=self.directory)
+        counter = registry.counter("test_total", "Test counter.", labels=("model",))
+        histogram = registry.histogram("test_seconds", "Test latency.", buckets=(1,))
+        return registry, counter, histogram
+
+    def write_as_other_process(self, registry, pid):
+        registry.write_snapshot()
+        os.replace(registry._snapshot_path(), os.path.join(self.directory, f"metrics_{pid}.json"))
+
+    def test_samples_of_other_processes_are_added(self):
+        other, other_counter, other_histogram = self.make_registry()
+        other_counter.inc(2, "base")
+        other_counter.inc(1, "tiny")
+        other_histogram.observe(0.5)
+        self.write_as_other_process(other, 1)
+
+        own, counter, histogram = self.make_registry()
+        counter.inc(3, "base")
+        histogram.observe(2)
+        samples, _ = parse_exposition(own.render())
+        self.assertEqual(samples[("test_total", (("model", "base"),))], 5)
+        self.assertEqual(samples[("test_total", (("model", "tiny"),))], 1)
+        self.assertEqual(samples[("test_seconds_bucket", (("le", "1.0"),))], 1)
+        self.assertEqual(samples[("test_seconds_bucket", (("le", "+Inf"),))], 2)
+        self.assertEqual(samples[("test_seconds_count", ())], 2)
+
+    def test_own_snapshot_is_not_counted_twice(self):
+        own, counter, _ = self.make_registry()
+        counter.inc(4, "base")
+        own.write_snapshot()
+        samples, _ = parse_exposition(own.render())
+        self.assertEqual(samples[("test_total", (("model", "base"),))], 4)
+
+    def test_unreadable_snapshots_are_skipped(self):
+        with open(os.path.join(self.directory, "metrics_2.json"), "w", encoding="utf-8") as f:
+            f.write("{not json")
+        own, counter, _ = self.make_registry()
+        counter.inc(1, "base")
+        samples, _ = parse_exposition(own.render())
+        self.assertEqual(samples[("test_total", (("model", "base"),))], 1)
+
+
+class TestExposition(MetricsTestCase):
+    def test_default_registry_output_parses(self):
+        with metrics.stage_timer("decode", model="base"):
+            pass
+        metrics.record_transcription("base", 10.0, 2.0)
+        metrics.CACHE_LOOKUPS.inc(1, "transcript", "hit")
+        samples, types = parse_exposition(metrics.metrics.render())
+        self.assertEqual(types["neuronote_stage_seconds"], "histogram")
+        self.assertEqual(types["neuronote_audio_seconds_total"], "counter")
+        self.assertEqual(types["neuronote_log_records_dropped"], "gauge")
+        self.assertGreaterEqual(
+            samples[("neuronote_stage_seconds_count", (("model", "base"), ("stage", "decode")))], 1)
+        self.assertGreaterEqual(
+            samples[("neuronote_transcription_realtime_factor_bucket", (("le", "0.2"), ("model", "base")))], 1)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry(multiprocess_dir=None)
+        counter = registry.counter("test_total", "Test counter.", labels=("route",))
+        counter.inc(1, 'a "quoted"\\path\nnext')
+        samples, _ = parse_exposition(registry.render())
+        self.assertEqual(samples[("test_total", (("route", 'a \\"quoted\\"\\\\path\\nnext'),))], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
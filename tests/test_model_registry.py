@@ -0,0 +1,82 @@
+import sys
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+from services.model_registry import ModelRegistry, FALLBACK_WHISPER_MODEL
+from utils.error_handlers import TranscriptionError
+
+
+class StubWhisper(types.ModuleType):
+    """Stands in for the whisper package: load_model returns a named object and counts loads."""
+
+    def __init__(self, failing=(), delay=0.0):
+        super().__init__("whisper")
+        self.failing = set(failing)
+        self.delay = delay
+        self.loads = []
+
+    def load_model(self, name):
+        time.sleep(self.delay)
+        self.loads.append(name)
+        if name in self.failing:
+            raise RuntimeError(f"checkpoint for {name} is corrupt")
+        return types.SimpleNamespace(name=name)
+
+
+class ModelRegistryTestCase(unittest.TestCase):
+    def use_whisper(self, **kwargs):
+        whisper = StubWhisper(**kwargs)
+        patcher = mock.patch.dict(sys.modules, {"whisper": whisper})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return whisper
+
+
+class TestLoading(ModelRegistryTestCase):
+    def test_least_recently_used_model_is_evicted(self):
+        whisper = self.use_whisper()
+        registry = ModelRegistry(max_whisper_models=2)
+        registry.get_whisper("tiny")
+        registry.get_whisper("base")
+        registry.get_whisper("tiny")  # Now the most recently used
+        registry.get_whisper("small")
+        self.assertEqual(list(registry._whisper_models), ["tiny", "small"])
+        registry.get_whisper("base")
+        self.assertEqual(whisper.loads, ["tiny", "base", "small", "base"])
+
+    def test_concurrent_requests_load_a_model_once(self):
+        whisper = self.use_whisper(delay=0.05)
+        registry = ModelRegistry()
+        threads = [threading.Thread(target=registry.get_whisper, args=("small",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(whisper.loads, ["small"])
+
+
+class TestFallback(ModelRegistryTestCase):
+    def test_failed_model_falls_back_and_is_remembered(self):
+        whisper = self.use_whisper(failing={"small"})
+        registry = ModelRegistry()
+        name, model = registry.get_whisper("small")
+        self.assertEqual((name, model.name), (FALLBACK_WHISPER_MODEL, FALLBACK_WHISPER_MODEL))
+        self.assertEqual(registry.resolve_whisper_name("small"), FALLBACK_WHISPER_MODEL)
+        registry.get_whisper("small")
+        self.assertEqual(whisper.loads, ["small", FALLBACK_WHISPER_MODEL])
+
+    def test_fallback_failure_is_a_transcription_error(self):
+        self.use_whisper(failing={"small", FALLBACK_WHISPER_MODEL})
+        with self.assertRaises(TranscriptionError):
+            ModelRegistry().get_whisper("small")
+
+    def test_models_outside_the_allowed_list_are_refused(self):
+        with self.assertRaises(ValueError):
+            ModelRegistry().resolve_whisper_name("large-v3-unlisted")
+
+
+if __name__ == "__main__":
+    unittest.main()
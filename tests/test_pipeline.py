@@ -0,0 +1,38 @@
+import unittest
+from unittest import mock
+
+from services import pipeline, transcription
+
+
+class TestTranscriptCacheKey(unittest.TestCase):
+    def key(self, language=None):
+        return pipeline._transcript_cache_key("hash", "base", "balanced", language)
+
+    def test_settings_that_change_the_transcript_change_the_key(self):
+        base = self.key()
+        changes = {
+            "ENABLE_VAD_TRIM": not transcription.ENABLE_VAD_TRIM,
+            "CHUNKED_TRANSCRIPTION": not transcription.CHUNKED_TRANSCRIPTION,
+        }
+        for name, value in changes.items():
+            with self.subTest(setting=name), mock.patch.object(transcription, name, value):
+                self.assertNotEqual(self.key(), base)
+        with mock.patch.object(transcription, "ENABLE_VAD_TRIM", True), \
+                mock.patch.object(transcription, "VAD_MIN_SILENCE_SECONDS", 7.5):
+            self.assertNotEqual(self.key(), base)
+
+    def test_default_language_is_part_of_the_key(self):
+        with mock.patch.object(pipeline, "TRANSCRIPTION_LANGUAGE", None):
+            detected = self.key()
+        with mock.patch.object(pipeline, "TRANSCRIPTION_LANGUAGE", "en"):
+            self.assertNotEqual(self.key(), detected)
+            self.assertEqual(self.key(), self.key("en")) # Same decode either way
+            self.assertNotEqual(self.key("de"), self.key("en"))
+
+    def test_model_and_profile_are_part_of_the_key(self):
+        self.assertNotEqual(pipeline._transcript_cache_key("hash", "small", "balanced"), self.key())
+        self.assertNotEqual(pipeline._transcript_cache_key("hash", "base", "fast"), self.key())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from services.prompts import (CHARS_PER_TOKEN, estimate_tokens, build_insights_prompt, transcript_token_budget,
+                              split_transcript)
+
+
+class TestBudget(unittest.TestCase):
+    def test_estimate_rounds_up(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("a" * CHARS_PER_TOKEN), 1)
+        self.assertEqual(estimate_tokens("a" * (CHARS_PER_TOKEN + 1)), 2)
+
+    def test_transcript_budget_leaves_room_for_the_template(self):
+        overhead = estimate_tokens(build_insights_prompt(""))
+        self.assertEqual(transcript_token_budget(overhead + 500), 500)
+        transcript = "word " * (500 * CHARS_PER_TOKEN // 5)
+        self.assertLessEqual(estimate_tokens(build_insights_prompt(transcript)), overhead + 500 + 1)
+
+    def test_transcript_budget_is_at_least_one(self):
+        self.assertEqual(transcript_token_budget(0), 1)
+
+
+class TestSplitTranscript(unittest.TestCase):
+    def test_short_transcript_is_one_part(self):
+        self.assertEqual(split_transcript("  One. Two.  ", 100), ["One. Two."])
+
+    def test_parts_break_at_sentences_within_the_budget(self):
+        sentences = [f"Sentence number {i} is here." for i in range(40)]
+        parts = split_transcript(" ".join(sentences), 20)
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            self.assertLessEqual(len(part), 20 * CHARS_PER_TOKEN)
+            self.assertTrue(part.endswith("."))
+        self.assertEqual(" ".join(parts), " ".join(sentences))
+
+    def test_long_sentence_is_split_by_characters(self):
+        parts = split_transcript("Short. " + "x" * 25 + " end.", 2)
+        self.assertEqual(parts, ["Short.", "x" * 8, "x" * 8, "x" * 8, "x end."])
+
+    def test_empty_transcript(self):
+        self.assertEqual(split_transcript("   ", 10), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import result_cache
+from services.result_cache import ResultCache, make_key
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(result_cache, "CACHE_BASE_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ResultCache("test", max_bytes=30, enabled=True)
+        self.clock = 1000
+
+    def put(self, key, content):
+        """Stores an entry with a modification time after every earlier one."""
+        self.cache.put(key, content)
+        self.touch(key)
+
+    def touch(self, key):
+        self.clock += 10
+        path = self.cache._path(key)
+        if os.path.exists(path):
+            os.utime(path, (self.clock, self.clock))
+
+    def test_round_trip(self):
+        self.put("a", "transcript text")
+        self.assertEqual(self.cache.get("a"), "transcript text")
+        self.assertIsNone(self.cache.get("missing"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in ("a", "b", "c"):
+            self.put(key, "x" * 10)
+        self.cache.get("a")
+        self.touch("a") # The hit makes "a" the most recently used entry
+        self.put("d", "x" * 10)
+        self.assertIsNone(self.cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertIsNotNone(self.cache.get(key))
+
+    def test_entry_larger_than_the_cache_is_not_kept(self):
+        self.put("big", "x" * 31)
+        self.assertIsNone(self.cache.get("big"))
+
+    def test_directory_is_scanned_only_when_over_budget(self):
+        self.put("a", "x" * 10) # The first put scans to learn the current size
+        with mock.patch.object(result_cache.os, "scandir", wraps=os.scandir) as scandir:
+            self.put("b", "x" * 10)
+            self.put("b", "y" * 10) # Replacing an entry does not count its old size twice
+            scandir.assert_not_called()
+            self.put("c", "x" * 15)
+            scandir.assert_called_once()
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache._total_bytes, 25)
+
+    def test_failed_write_removes_the_temp_file(self):
+        with mock.patch.object(result_cache.os, "replace", side_effect=OSError("disk full")):
+            self.cache.put("a", "transcript text")
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = ResultCache("off", max_bytes=30, enabled=False)
+        cache.put("a", "text")
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(cache.cache_dir))
+
+    def test_key_parts_are_separated(self):
+        self.assertNotEqual(make_key("ab", "c"), make_key("a", "bc"))
+        self.assertEqual(make_key("a", 1), make_key("a", "1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import search_index
+from services.search_index import SearchIndex
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index = SearchIndex(index_dir=directory.name, max_segments=8, merge_factor=4, enabled=True)
+        self.version = 0
+
+    def add(self, *documents):
+        """Writes one segment holding (meeting_id, field, text) documents, as one indexer drain does."""
+        batch = []
+        for meeting_id, field, text in documents:
+            self.version += 1
+            batch.append((meeting_id, field, self.version, text))
+        return self.index._write_documents(batch)
+
+    def meetings(self, query, **kwargs):
+        return [result["meetingId"] for result in self.index.search(query, **kwargs)["results"]]
+
+    def segment_count(self):
+        return len(self.index._list_segment_names())
+
+
+class TestSearch(SearchIndexTestCase):
+    def test_phrase_matches_consecutive_words_only(self):
+        self.add(("m1", "transcript", "We agreed to ship the release on Friday."),
+                 ("m2", "transcript", "The release will not ship before Friday."))
+        self.assertEqual(sorted(self.meetings("ship release")), ["m1", "m2"])
+        self.assertEqual(self.meetings('"ship the release"'), ["m1"])
+        self.assertEqual(self.meetings('"release will" friday'), ["m2"])
+        self.assertEqual(self.meetings('"friday release"'), [])
+
+    def test_field_filter(self):
+        self.add(("m1", "transcript", "budget review"), ("m2", "insights", "budget summary"))
+        self.assertEqual(self.meetings("budget", field="insights"), ["m2"])
+        self.assertEqual(self.index.search("budget")["total"], 2)
+
+    def test_rarer_terms_rank_higher(self):
+        self.add(("m1", "transcript", "roadmap roadmap hiring"), ("m2", "transcript", "roadmap budget"),
+                 ("m3", "transcript", "roadmap"))
+        self.assertEqual(self.meetings("budget roadmap")[0], "m2")
+
+
+class TestUpdatesAcrossMerges(SearchIndexTestCase):
+    def test_newer_version_replaces_older_one(self):
+        self.add(("m1", "transcript", "first draft mentions kangaroos"))
+        self.add(("m1", "transcript", "second draft mentions wombats"))
+        self.assertEqual(self.meetings("kangaroos"), [])
+        self.assertEqual(self.meetings("wombats"), ["m1"])
+        self.assertEqual(self.index._field_totals["transcript"], [1, 4])
+
+    def test_merge_keeps_newest_versions_and_totals(self):
+        self.add(("m1", "transcript", "alpha beta"), ("m2", "transcript", "gamma"))
+        self.add(("m1", "transcript", "alpha delta epsilon"))
+        self.add(("m3", "insights", "zeta"))
+        self.assertEqual(self.meetings("beta"), [])
+        self.add(("m4", "transcript", "eta"))
+        self.index.maybe_merge() # Four small segments share the lowest tier
+        self.assertEqual(self.segment_count(), 1)
+        self.assertEqual(self.meetings("delta"), ["m1"])
+        self.assertEqual(self.meetings("beta"), [])
+        self.assertEqual(sorted(self.meetings("alpha gamma eta zeta")), ["m1", "m2", "m3", "m4"])
+        self.assertEqual(self.index._field_totals, {"transcript": [3, 5], "insights": [1, 1]})
+
+    def test_update_after_merge(self):
+        for i in range(4):
+            self.add((f"m{i}", "transcript", f"meeting number {i} about planning"))
+        self.index.maybe_merge()
+        self.meetings("planning")
+        self.add(("m0", "transcript", "rescheduled"))
+        self.assertEqual(sorted(self.meetings("planning")), ["m1", "m2", "m3"])
+        self.assertEqual(self.index._field_totals["transcript"], [4, 16])
+
+    def test_removed_segment_drops_its_documents(self):
+        kept = self.add(("m1", "transcript", "kept words"))
+        removed = self.add(("m2", "transcript", "removed words"))
+        self.assertEqual(sorted(self.meetings("words")), ["m1", "m2"])
+        os.remove(removed)
+        self.assertEqual(self.meetings("words"), ["m1"])
+        self.assertEqual(self.index._field_totals["transcript"], [1, 2])
+        self.assertTrue(os.path.exists(kept))
+
+
+class TestTieredMerging(SearchIndexTestCase):
+    def test_merges_only_full_tiers(self):
+        for i in range(3):
+            self.add((f"m{i}", "transcript", "small"))
+        self.index.maybe_merge()
+        self.assertEqual(self.segment_count(), 3) # Below merge_factor, and within max_segments
+
+        self.add(("m3", "transcript", "small"))
+        self.index.maybe_merge()
+        self.assertEqual(self.segment_count(), 1)
+
+    def test_large_segment_is_not_rewritten_with_small_ones(self):
+        big_text = " ".join(f"word{i}" for i in range(60000))
+        big = os.path.basename(self.add(("big", "transcript", big_text)))
+        for i in range(4):
+            self.add((f"m{i}", "transcript", "small"))
+        self.index.maybe_merge()
+        names = self.index._list_segment_names()
+        self.assertEqual(len(names), 2)
+        self.assertIn(big, names)
+
+    def test_segment_cap_still_applies(self):
+        self.index.max_segments = 2
+        for i in range(3):
+            self.add((f"m{i}", "transcript", "small"))
+        self.index.maybe_merge()
+        self.assertEqual(self.segment_count(), 2)
+        self.assertEqual(len(self.meetings("small")), 3)
+
+    def test_merges_without_fcntl(self):
+        with mock.patch.object(search_index, "fcntl", None):
+            for i in range(4):
+                self.add((f"m{i}", "transcript", "small"))
+            self.index.maybe_merge()
+        self.assertEqual(self.segment_count(), 1)
+        self.assertEqual(len(self.meetings("small")), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import storage_service
+from services.storage_service import (GZIP_MAGIC, ZSTD_MAGIC, compress_bytes, decompress_bytes, write_file_atomic,
+                                      save_text_to_file, load_text_from_file)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TEXT = "We agreed to ship on Friday. " * 20
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        for name, value in (("OUTPUT_BASE_DIR", self.dir), ("STORAGE_WRITE_BEHIND", False)):
+            patcher = mock.patch.object(storage_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestAtomicWrite(StorageTestCase):
+    def test_writes_without_leaving_temporary_files(self):
+        path = os.path.join(self.dir, "out.txt")
+        write_file_atomic(path, b"first")
+        write_file_atomic(path, b"second")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"second")
+        self.assertEqual(os.listdir(self.dir), ["out.txt"])
+
+    def test_failed_write_keeps_the_old_file(self):
+        path = os.path.join(self.dir, "out.txt")
+        write_file_atomic(path, b"old")
+        with mock.patch.object(storage_service.os, "replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                write_file_atomic(path, b"new")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(os.listdir(self.dir), ["out.txt"])
+
+
+class TestCompression(StorageTestCase):
+    def test_gzip_magic_and_round_trip(self):
+        path = save_text_to_file(TEXT, "t.txt", subdirectory="m1", compression="gzip")
+        with open(path, "rb") as f:
+            stored = f.read()
+        self.assertEqual(stored[:2], GZIP_MAGIC)
+        self.assertLess(len(stored), len(TEXT))
+        self.assertEqual(load_text_from_file("t.txt", subdirectory="m1"), TEXT)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd_magic_and_round_trip(self):
+        data = compress_bytes(TEXT.encode("utf-8"), "zstd")
+        self.assertEqual(data[:4], ZSTD_MAGIC)
+        self.assertEqual(decompress_bytes(data).decode("utf-8"), TEXT)
+
+    @unittest.skipIf(zstandard is not None, "zstandard is installed")
+    def test_zstd_falls_back_to_gzip(self):
+        self.assertEqual(compress_bytes(b"text", "zstd")[:2], GZIP_MAGIC)
+
+    def test_uncompressed_text_is_read_as_is(self):
+        save_text_to_file(TEXT, "t.txt", subdirectory="m1")
+        self.assertEqual(load_text_from_file("t.txt", subdirectory="m1"), TEXT)
+        self.assertEqual(decompress_bytes(b"plain"), b"plain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from services.voice_activity import speech_regions, trim_silence, map_segments
+
+SR = 16000
+
+
+def speech(seconds, amplitude=0.2):
+    """Voiced-speech stand-in: a gliding 120 Hz harmonic tone with 4 Hz syllable bursts."""
+    t = np.arange(int(seconds * SR)) / SR
+    phase = 2 * np.pi * np.cumsum(120 + 20 * np.sin(2 * np.pi * 0.7 * t)) / SR
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 20))
+    return (amplitude * voiced * np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5).astype(np.float32)
+
+
+def noise(seconds, level=0.003, seed=0):
+    return (level * np.random.default_rng(seed).standard_normal(int(seconds * SR))).astype(np.float32)
+
+
+class TestSpeechRegions(unittest.TestCase):
+    def test_cuts_long_silences_only(self):
+        audio = np.concatenate([noise(5), speech(10), noise(1, seed=1), speech(5), noise(20, seed=2), speech(5), noise(8, seed=3)])
+        regions = [(start / SR, end / SR) for start, end in speech_regions(audio)]
+
+        self.assertEqual(len(regions), 2) # The 1-second pause is kept, the 20-second one is cut
+        (first_start, first_end), (second_start, second_end) = regions
+        self.assertAlmostEqual(first_start, 5, delta=0.5)
+        self.assertAlmostEqual(first_end, 21, delta=0.5)
+        self.assertAlmostEqual(second_start, 41, delta=0.5)
+        self.assertAlmostEqual(second_end, 46, delta=0.5)
+
+    def test_steady_tone_is_not_speech(self):
+        tone = (0.2 * np.sin(2 * np.pi * 440 * np.arange(30 * SR) / SR)).astype(np.float32)
+        audio = np.concatenate([speech(5), noise(5), tone, noise(5, seed=1), speech(5)])
+        kept = sum(end - start for start, end in speech_regions(audio)) / SR
+        self.assertLess(kept, 15) # About 10 s of speech plus padding and tone edges
+
+    def test_silence_has_no_regions(self):
+        self.assertEqual(speech_regions(np.zeros(5 * SR, dtype=np.float32)), [])
+        self.assertEqual(speech_regions(np.zeros(0, dtype=np.float32)), [])
+
+
+class TestTrimSilence(unittest.TestCase):
+    def test_trimmed_audio_matches_regions(self):
+        audio = np.concatenate([noise(10), speech(5), noise(10, seed=1), speech(5)])
+        trimmed, regions = trim_silence(audio)
+        self.assertEqual(len(regions), 2)
+        self.assertEqual(len(trimmed), sum(r["end"] - r["start"] for r in regions))
+        self.assertEqual(regions[1]["trimmed_start"], regions[0]["end"] - regions[0]["start"])
+        np.testing.assert_array_equal(trimmed[regions[1]["trimmed_start"]:], audio[regions[1]["start"]:regions[1]["end"]])
+
+    def test_noisy_continuous_speech_falls_back_to_untrimmed(self):
+        clean = speech(60)
+        hiss = np.random.default_rng(1).standard_normal(len(clean))
+        hiss *= np.sqrt(np.mean(clean ** 2) / np.mean(hiss ** 2) / 10 ** 0.5) # 5 dB SNR
+        audio = (clean + hiss).astype(np.float32)
+
+        trimmed, regions = trim_silence(audio)
+        self.assertIs(trimmed, audio)
+        self.assertEqual(regions, [{"start": 0, "end": len(audio), "trimmed_start": 0}])
+
+    def test_silent_recording_is_empty(self):
+        trimmed, regions = trim_silence(np.zeros(10 * SR, dtype=np.float32))
+        self.assertEqual(len(trimmed), 0)
+        self.assertEqual(regions, [])
+
+
+class TestMapSegments(unittest.TestCase):
+    REGIONS = [
+        {"start": 5 * SR, "end": 10 * SR, "trimmed_start": 0},
+        {"start": 30 * SR, "end": 40 * SR, "trimmed_start": 5 * SR},
+    ]
+
+    def test_maps_each_region_by_its_offset(self):
+        segments = [{"start": 1.0, "end": 4.0, "text": " a"}, {"start": 6.0, "end": 14.0, "text": " b"}]
+        mapped = map_segments(segments, self.REGIONS)
+        self.assertEqual([(s["start"], s["end"]) for s in mapped], [(6.0, 9.0), (31.0, 39.0)])
+        self.assertEqual([s["text"] for s in mapped], [" a", " b"])
+
+    def test_join_points_belong_to_the_right_region(self):
+        mapped = map_segments([{"start": 0.0, "end": 5.0, "text": " a"}, {"start": 5.0, "end": 6.0, "text": " b"}], self.REGIONS)
+        self.assertEqual((mapped[0]["start"], mapped[0]["end"]), (5.0, 10.0)) # Ends at the join: first region
+        self.assertEqual((mapped[1]["start"], mapped[1]["end"]), (30.0, 31.0)) # Starts at the join: second region
+
+    def test_no_regions_leaves_segments_unchanged(self):
+        segments = [{"start": 1.0, "end": 2.0, "text": " a"}]
+        self.assertEqual(map_segments(segments, []), segments)
+
+
+if __name__ == "__main__":
+    unittest.main()
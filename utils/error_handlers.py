@@ -26,24 +26,38 @@ class FileStorageError(AppError):
     def __init__(self, message="Error during file storage operation."):
         super().__init__(message, status_code=500)
 
+class OverloadedError(AppError):
+    """Raised when the server is at capacity; answered with 503 and a Retry-After header."""
+    def __init__(self, message="Server is busy. Please retry later.", retry_after=None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after # Seconds, or None if there is no estimate
+
+    def to_dict(self):
+        payload = super().to_dict()
+        if self.retry_after is not None:
+            payload["retryAfter"] = self.retry_after
+        return payload
+
 def handle_app_error(error):
     """Handles AppError and its subclasses."""
     # Log with exc_info=True to include stack trace for unexpected AppErrors if they don't originate from explicit "raise AppError(...)"
-    logger.error(f"AppError caught: {error.message} (Status code: {error.status_code})", exc_info=isinstance(error, AppError) and error.status_code == 500)
+    logger.error("AppError caught: %s (Status code: %s)", error.message, error.status_code, exc_info=isinstance(error, AppError) and error.status_code == 500)
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
+    if getattr(error, "retry_after", None) is not None:
+        response.headers["Retry-After"] = str(error.retry_after)
     return response
 
 def handle_generic_error(error):
     """Handles generic exceptions."""
-    logger.critical(f"Unhandled generic exception caught: {str(error)}", exc_info=True)
+    logger.critical("Unhandled generic exception caught: %s", str(error), exc_info=True)
     response = jsonify({"status": "error", "message": "An unexpected internal server error occurred."})
     response.status_code = 500
     return response
 
 def handle_not_found_error(error):
     """Handles 404 Not Found errors."""
-    logger.warning(f"404 Not Found error: {error}. Requested URL: {request.url if request else 'N/A'}")
+    logger.warning("404 Not Found error: %s. Requested URL: %s", error, request.url if request else 'N/A')
     response = jsonify({"status": "error", "message": "The requested resource was not found."})
     response.status_code = 404
     return response
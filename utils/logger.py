@@ -1,41 +1,239 @@
-import logging
+"""
+Application logger.
+
+    from utils.logger import logger, log_context
+
+    with log_context(meeting_id):
+        logger.info("Saved transcript to %s", path)
+
+Records are handed to a queue and written by a background listener thread (LOG_ASYNC), so
+request threads never wait on console or file I/O. Pass values as arguments rather than
+f-strings: when the level is disabled nothing is formatted, and when it is enabled the
+message is built on the listener thread (arguments that are not plain str/number values
+are formatted up front, so later mutation cannot change the logged text).
+
+Every record carries the meeting_id set with log_context()/set_log_context() on the
+current thread ("-" if none); LOG_FORMAT=json writes one JSON object per line with it as
+meetingId. DEBUG records are rate-limited per call site (LOG_DEBUG_RATE_PER_SECOND); the
+next record let through reports how many were suppressed.
+"""
 import os
-from logging.handlers import RotatingFileHandler
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        LOG_FORMAT as DEFAULT_LOG_FORMAT,
+        LOG_ASYNC as DEFAULT_LOG_ASYNC,
+        LOG_QUEUE_MAX as DEFAULT_LOG_QUEUE_MAX,
+        LOG_DEBUG_RATE_PER_SECOND as DEFAULT_LOG_DEBUG_RATE_PER_SECOND,
+    )
+except ImportError:
+    DEFAULT_LOG_FORMAT = "text"
+    DEFAULT_LOG_ASYNC = True
+    DEFAULT_LOG_QUEUE_MAX = 10000
+    DEFAULT_LOG_DEBUG_RATE_PER_SECOND = 5
 
 # Determine log level from environment variable or default to INFO
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", DEFAULT_LOG_FORMAT).lower() # "text" or "json"
+LOG_ASYNC = os.environ.get("LOG_ASYNC", str(DEFAULT_LOG_ASYNC)).lower() in ['true', '1', 't', 'yes']
+LOG_QUEUE_MAX = int(os.environ.get("LOG_QUEUE_MAX", DEFAULT_LOG_QUEUE_MAX))
+LOG_DEBUG_RATE_PER_SECOND = float(os.environ.get("LOG_DEBUG_RATE_PER_SECOND", DEFAULT_LOG_DEBUG_RATE_PER_SECOND)) # 0 = unlimited
+
+# File handler (optional, could be enabled by config or another env var)
+ENABLE_FILE_LOGGING = os.environ.get("ENABLE_FILE_LOGGING", "false").lower() == "true"
+LOG_FILE_PATH = "app.log"
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - [%(meeting_id)s] - %(message)s'
+
+# Argument types that are safe to format later, on the listener thread
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+_meeting_id = contextvars.ContextVar("neuronote_meeting_id", default=None)
+
+
+def set_log_context(meeting_id):
+    """Tags records logged by the current thread/context with meeting_id (None clears it)."""
+    _meeting_id.set(meeting_id)
+
+
+@contextmanager
+def log_context(meeting_id):
+    """Tags records logged inside the with block with meeting_id."""
+    token = _meeting_id.set(meeting_id)
+    try:
+        yield
+    finally:
+        _meeting_id.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Adds record.meeting_id from the context of the thread that logged the record."""
+
+    def filter(self, record):
+        record.meeting_id = _meeting_id.get() or "-"
+        return True
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """
+    Lets at most `rate` DEBUG records per second through from each call site
+    (a token bucket per module and line). Other levels always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._buckets = {} # (pathname, lineno) -> [tokens, last refill, suppressed]
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.rate <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.rate, now, 0]
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar debug messages suppressed]"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; meetingId is included when a log context is set."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        meeting_id = getattr(record, "meeting_id", "-")
+        if meeting_id != "-":
+            entry["meetingId"] = meeting_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread, and drops (and
+    counts) records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _AsyncLogging:
+    """Owns the queue and listener; recreated in forked children (gunicorn workers)."""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.queue_handler = LazyQueueHandler(queue.Queue(LOG_QUEUE_MAX))
+        self.listener = None
+        self.start()
+        atexit.register(self.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def start(self):
+        self.listener = QueueListener(self.queue_handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Writes out everything queued and stops the listener thread."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def _after_fork(self):
+        # The listener thread does not survive the fork, and the queue's lock may have been held.
+        self.queue_handler.queue = queue.Queue(LOG_QUEUE_MAX)
+        self.start()
+
 
 # Create a custom logger
 logger = logging.getLogger("neuronote_app")
 logger.setLevel(LOG_LEVEL)
+logger.addFilter(DebugRateLimitFilter(LOG_DEBUG_RATE_PER_SECOND))
 
-# Create handlers
+# Create formatter and handlers
+formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
 console_handler = logging.StreamHandler()
 console_handler.setLevel(LOG_LEVEL)
-
-# File handler (optional, could be enabled by config or another env var)
-# For now, let's set it up but make it easy to disable/enable
-ENABLE_FILE_LOGGING = os.environ.get("ENABLE_FILE_LOGGING", "false").lower() == "true"
-LOG_FILE_PATH = "app.log"
-
-# Create formatter and add it to handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s')
 console_handler.setFormatter(formatter)
-
-# Add console handler to logger
-logger.addHandler(console_handler)
+output_handlers = [console_handler]
 
 if ENABLE_FILE_LOGGING:
     # Rotate logs, 1MB per file, keep 5 backup files
     file_handler = RotatingFileHandler(LOG_FILE_PATH, maxBytes=1024*1024, backupCount=5)
     file_handler.setLevel(LOG_LEVEL)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    logger.info(f"File logging enabled. Logging to {LOG_FILE_PATH}")
+    output_handlers.append(file_handler)
+
+async_logging = None
+if LOG_ASYNC:
+    async_logging = _AsyncLogging(output_handlers)
+    async_logging.queue_handler.addFilter(ContextFilter())
+    logger.addHandler(async_logging.queue_handler)
+else:
+    for handler in output_handlers:
+        handler.addFilter(ContextFilter())
+        logger.addHandler(handler)
+
+if ENABLE_FILE_LOGGING:
+    logger.info("File logging enabled. Logging to %s", LOG_FILE_PATH)
 else:
     logger.info("File logging is disabled. Logging to console only.")
 
+
+def dropped_records():
+    """Records dropped because the log queue was full (this process)."""
+    return async_logging.queue_handler.dropped if async_logging is not None else 0
+
 # Example usage:
 # from utils.logger import logger
 # logger.info("This is an info message.")
-# logger.error("This is an error message.")
+# logger.error("Could not save %s: %s", path, error)
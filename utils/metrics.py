@@ -0,0 +1,295 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition, served at /metrics.
+
+    from utils.metrics import stage_timer, AUDIO_SECONDS
+
+    with stage_timer("transcribe", model="base") as timer:
+        ...
+    timer.seconds # elapsed time, also recorded in neuronote_stage_seconds
+
+Recording a sample is a lock, a bisect and two additions (about a microsecond), so
+instrumentation stays on in production.
+
+Each gunicorn worker keeps its own registry. With METRICS_MULTIPROCESS_DIR set, every
+process writes its samples to that directory every few seconds, and /metrics adds up all
+the files, so any worker can answer for the whole server. Files of exited workers are
+kept, so counters never go backwards. Clear the directory when the server restarts.
+"""
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+
+from utils.logger import dropped_records
+
+# Attempt to import config, handle if it's not found
+try:
+    from config import (
+        ENABLE_METRICS as DEFAULT_ENABLE_METRICS,
+        METRICS_MULTIPROCESS_DIR as DEFAULT_METRICS_MULTIPROCESS_DIR,
+    )
+except ImportError:
+    DEFAULT_ENABLE_METRICS = True
+    DEFAULT_METRICS_MULTIPROCESS_DIR = None
+
+ENABLE_METRICS = os.environ.get("ENABLE_METRICS", str(DEFAULT_ENABLE_METRICS)).lower() in ['true', '1', 't', 'yes']
+METRICS_MULTIPROCESS_DIR = os.environ.get("METRICS_MULTIPROCESS_DIR", DEFAULT_METRICS_MULTIPROCESS_DIR or "") or None
+METRICS_FLUSH_SECONDS = 5
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers cache hits (ms) up to long-recording transcriptions (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *label_values):
+        if not ENABLE_METRICS:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    @staticmethod
+    def merge(total, other):
+        return total + other
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, json.loads(key))} {_format_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose value is read from a callback at scrape time (per process, never merged)."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def render_local(self):
+        return self.header() + [f"{self.name} {_format_number(self.callback())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        if not ENABLE_METRICS:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    @staticmethod
+    def merge(total, other):
+        return [[a + b for a, b in zip(total[0], other[0])], total[1] + other[1], total[2] + other[2]]
+
+    def render(self, values):
+        lines = self.header()
+        for key, (counts, total, count) in sorted(values.items()):
+            label_values = json.loads(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, multiprocess_dir=METRICS_MULTIPROCESS_DIR):
+        self.multiprocess_dir = multiprocess_dir
+        self._metrics = []
+        self._gauges = []
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, callback):
+        metric = Gauge(name, documentation, callback)
+        self._gauges.append(metric)
+        return metric
+
+    # --- Multi-process aggregation ---
+
+    def _snapshot_path(self):
+        return os.path.join(self.multiprocess_dir, f"metrics_{os.getpid()}.json")
+
+    def write_snapshot(self):
+        """Writes this process's samples to the multi-process directory (atomically)."""
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        path = self._snapshot_path()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({metric.name: metric.snapshot() for metric in self._metrics}, f)
+        os.replace(temp_path, path)
+
+    def ensure_flusher(self):
+        """Starts the periodic snapshot thread for this process (after a fork, a new one)."""
+        if not self.multiprocess_dir or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+            atexit.register(self.write_snapshot)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                self.write_snapshot()
+            except OSError:
+                pass # Next flush retries; metrics must never break the app
+
+    def _collect(self):
+        """Samples per metric: this process's live values, plus other processes' snapshot files."""
+        collected = {metric.name: metric.snapshot() for metric in self._metrics}
+        if not self.multiprocess_dir or not os.path.isdir(self.multiprocess_dir):
+            return collected
+        own = os.path.basename(self._snapshot_path())
+        for filename in os.listdir(self.multiprocess_dir):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(self.multiprocess_dir, filename), encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in self._metrics:
+                values = collected[metric.name]
+                for key, value in snapshot.get(metric.name, {}).items():
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return collected
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        collected = self._collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(collected[metric.name]))
+        for gauge in self._gauges:
+            try:
+                lines.extend(gauge.render_local())
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "neuronote_stage_seconds", "Duration of pipeline stages (upload_read, decode, queue_wait, transcribe, insights, gemini_call, save, ...).",
+    labels=("stage", "model"))
+REQUEST_SECONDS = metrics.histogram(
+    "neuronote_http_request_seconds", "HTTP request latency by route and status.", labels=("route", "method", "status"))
+AUDIO_SECONDS = metrics.counter(
+    "neuronote_audio_seconds_total", "Seconds of audio transcribed.", labels=("model",))
+REALTIME_FACTOR = metrics.histogram(
+    "neuronote_transcription_realtime_factor", "Transcription time divided by audio duration.", labels=("model",), buckets=RTF_BUCKETS)
+GEMINI_TOKENS = metrics.counter(
+    "neuronote_gemini_tokens_total", "Gemini tokens used, by kind (prompt or output).", labels=("model", "kind"))
+CACHE_LOOKUPS = metrics.counter(
+    "neuronote_cache_lookups_total", "Result cache lookups by cache and result (hit or miss).", labels=("cache", "result"))
+metrics.gauge("neuronote_log_records_dropped", "Log records dropped in this process because the log queue was full.", dropped_records)
+
+
+class StageTimer:
+    """Context manager behind stage_timer(); .seconds holds the elapsed time after the block."""
+    __slots__ = ("stage", "model", "start", "seconds")
+
+    def __init__(self, stage, model=""):
+        self.stage = stage
+        self.model = model # May be set inside the block, e.g. once a fallback model is known
+        self.seconds = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(self.seconds, self.stage, self.model or "")
+        return False
+
+
+def stage_timer(stage, model=""):
+    """Times a block as pipeline stage `stage` (failed runs are recorded too)."""
+    return StageTimer(stage, model)
+
+
+def record_transcription(model, audio_seconds, processing_seconds):
+    """Records audio seconds transcribed and the real-time factor for one transcription."""
+    if not audio_seconds:
+        return
+    AUDIO_SECONDS.inc(audio_seconds, model)
+    REALTIME_FACTOR.observe(processing_seconds / audio_seconds, model)
@@ -1,15 +1,27 @@
 # This file is intended for use with WSGI servers like Gunicorn.
 # It imports the Flask application instance from neuronote.py.
+import os
 
 from neuronote import app # Assuming your Flask app instance is named 'app' in neuronote.py
 from utils.logger import logger # Optional: if you want to log WSGI server related info
+from services.model_registry import model_registry
+
+try:
+    from config import PRELOAD_MODELS as DEFAULT_PRELOAD_MODELS
+except ImportError:
+    DEFAULT_PRELOAD_MODELS = True
 
 # The WSGI server will look for the 'app' object in this file.
 # Example Gunicorn command: gunicorn --bind 0.0.0.0:5000 wsgi:app
+# With `gunicorn -c gunicorn.conf.py wsgi:app` (preload_app = True) this module is imported
+# once in the master process, so the preloaded Whisper weights are shared copy-on-write
+# by all forked workers instead of being loaded again in each one.
 
 # No __main__ block is typically needed here for Gunicorn.
 # neuronote.py's __main__ block handles development server execution.
-# If this file is executed directly, it won't do anything by itself unless
-# the app import itself triggers actions (which it shouldn't in a well-structured app).
+
+if os.environ.get("PRELOAD_MODELS", str(DEFAULT_PRELOAD_MODELS)).lower() in ['true', '1', 't']:
+    logger.info("Preloading models before serving requests...")
+    model_registry.preload()
 
 logger.info("wsgi.py loaded. Flask 'app' object is now available for WSGI server.")